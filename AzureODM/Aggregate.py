@@ -0,0 +1,137 @@
+"""
+    AzureTableODM.Aggregate
+
+    Client side aggregations folded while the pages of a query arrive
+"""
+__all__ = ['Aggregation']
+
+_COUNT, _SUM, _MIN, _MAX, _AVG = range(5)
+
+
+class Aggregation:
+
+    """fold the rows of :func:`Entity.iterate_values` into
+    ``count`` / ``sum`` / ``min`` / ``max`` / ``avg`` of some fields,
+    optionally grouped by other fields, only the state of each group is
+    kept
+
+    ``None`` values are skipped, the result of a field without any value is
+    None (``0`` for ``count``)
+
+    the result keys are ``<field>__<operation>``, e.g.
+    ``{'bytes__sum': 10, 'latency__max': 2.5}``
+
+    created by :func:`Entity.aggregate` / :func:`QuerySet.aggregate`
+    """
+
+    #: ``{name: code}`` of the supported operations
+    OPERATIONS = {'count': _COUNT, 'sum': _SUM, 'min': _MIN, 'max': _MAX,
+                  'avg': _AVG}
+    #: the field types ``sum`` and ``avg`` accept
+    NUMERIC_TYPES = (int, float)
+
+    def __init__(self, entity, aggregations, group_by=None):
+        """
+
+        :param type entity: subclass of :class:`Entity`
+        :param dict aggregations: ``{operation: field or list of fields}``
+        :param group_by: None, a field name or a list of field names
+        :raises ValueError: if an operation is not supported
+        :raises ValueError: if aggregations is empty
+        :raises KeyError: if a field is not defined
+        :raises TypeError: if a field of ``sum`` or ``avg`` is not numeric
+        """
+        if len(aggregations) == 0:
+            raise ValueError('aggregations cannot be empty')
+        if group_by is None:
+            group_by = ()
+        elif isinstance(group_by, str):
+            group_by = (group_by,)
+        #: the group by field names
+        self.group_by = tuple(group_by)
+        fields = list(self.group_by)
+        #: ``[(result key, operation code, row index)]``
+        self.specs = []
+        for operation, names in aggregations.items():
+            if operation not in self.OPERATIONS:
+                raise ValueError(
+                    'unknown aggregation, {}'.format(operation))
+            code = self.OPERATIONS[operation]
+            if isinstance(names, str):
+                names = [names]
+            for name in names:
+                if name not in entity._f:
+                    raise KeyError('field is not defined, {}'.format(name))
+                if code in (_SUM, _AVG) and not (
+                        entity._f[name]._type in self.NUMERIC_TYPES):
+                    raise TypeError('{} of {} is not numeric'.format(
+                        operation, name))
+                if name not in fields:
+                    fields.append(name)
+                self.specs.append(('{}__{}'.format(name, operation), code,
+                                   fields.index(name)))
+        for name in self.group_by:
+            if name not in entity._f:
+                raise KeyError('field is not defined, {}'.format(name))
+        #: the fields to project, the group by fields first
+        self.fields = tuple(fields)
+        #: ``{group key: (counts, values)}``
+        self._groups = {}
+
+    def add(self, rows):
+        """fold the rows (tuples of :attr:`fields`)"""
+        groups = self._groups
+        specs = self.specs
+        size = len(specs)
+        group_size = len(self.group_by)
+        for row in rows:
+            if group_size == 0:
+                key = None
+            elif group_size == 1:
+                key = row[0]
+            else:
+                key = row[:group_size]
+            state = groups.get(key)
+            if state is None:
+                state = groups[key] = ([0] * size, [None] * size)
+            counts, values = state
+            for i, (_, code, index) in enumerate(specs):
+                value = row[index]
+                if value is None:
+                    continue
+                counts[i] += 1
+                current = values[i]
+                if current is None:
+                    values[i] = value
+                elif code == _SUM or code == _AVG:
+                    values[i] = current + value
+                elif code == _MIN:
+                    if value < current:
+                        values[i] = value
+                elif code == _MAX:
+                    if value > current:
+                        values[i] = value
+
+    def _result(self, counts, values):
+        result = {}
+        for i, (key, code, _) in enumerate(self.specs):
+            if code == _COUNT:
+                result[key] = counts[i]
+            elif code == _AVG and counts[i] > 0:
+                result[key] = values[i] / counts[i]
+            else:
+                result[key] = values[i]
+        return result
+
+    def result(self):
+        """
+        :returns: ``dict`` of the results if there is no group by
+        :returns: ``{group key: dict of the results}`` if grouped, the
+            group key is a tuple if grouped by more than one field
+        """
+        if len(self.group_by) == 0:
+            counts, values = self._groups.get(
+                None, ([0] * len(self.specs), [None] * len(self.specs)))
+            return self._result(counts, values)
+        return {key: self._result(counts, values)
+                for key, (counts, values) in self._groups.items()}
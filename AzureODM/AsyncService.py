@@ -0,0 +1,270 @@
+"""
+    AsyncService
+
+    asyncio transport for :class:`azure.storage.TableService`
+"""
+import asyncio
+import ssl
+from copy import copy
+from weakref import WeakKeyDictionary
+from azure import (
+    _USER_AGENT_STRING,
+    _convert_response_to_feeds,
+    _parse_response_for_dict_filter)
+from azure.http import HTTPError, HTTPResponse
+from azure.storage import (
+    _convert_response_to_entity,
+    _convert_xml_to_entity,
+    _sign_storage_table_request,
+    _storage_error_handler)
+__all__ = ['AsyncTableService']
+
+
+class _CapturedRequest(Exception):
+
+    """raised by :func:`_capture` to take the built request out of the SDK"""
+
+    def __init__(self, request):
+        self.request = request
+        super().__init__('request captured')
+
+
+def _capture(request):
+    """the ``_filter`` of the request builder, replacing
+    :func:`TableService._perform_request_worker`"""
+    raise _CapturedRequest(request)
+
+
+class AsyncTableService:
+
+    """non-blocking counterpart of :class:`azure.storage.TableService`
+
+    the requests are built, signed and parsed by the SDK, only the HTTP
+    round trip is performed with asyncio streams over a keep-alive
+    connection pool, so a single event loop can have many requests in
+    flight without any thread.
+
+    only the entity operations used by :class:`Entity` are supported,
+    proxies are not supported
+    """
+
+    def __init__(self, ts, max_connections=100):
+        """
+
+        :param azure.storage.TableService ts: provides the account, the
+            protocol and the request building
+        :param int max_connections: max concurrent connections per event
+            loop
+        """
+        self.ts = ts
+        self.max_connections = max_connections
+        # a copy of ``ts`` which builds the request without sending it
+        self._builder = copy(ts)
+        self._builder._batchclient = None
+        self._builder._filter = _capture
+        #: ``{loop: (semaphore,
+        #: {(host, port, protocol): [(reader, writer)]})}``
+        self._pools = WeakKeyDictionary()
+
+    async def get_entity(self, **kwargs):
+        """see :func:`azure.storage.TableService.get_entity`"""
+        response = await self._perform('get_entity', kwargs)
+        return _convert_response_to_entity(response)
+
+    async def query_entities(self, **kwargs):
+        """see :func:`azure.storage.TableService.query_entities`"""
+        response = await self._perform('query_entities', kwargs)
+        return _convert_response_to_feeds(response, _convert_xml_to_entity)
+
+    async def insert_entity(self, **kwargs):
+        """see :func:`azure.storage.TableService.insert_entity`"""
+        response = await self._perform('insert_entity', kwargs)
+        return _convert_response_to_entity(response)
+
+    async def update_entity(self, **kwargs):
+        """see :func:`azure.storage.TableService.update_entity`"""
+        response = await self._perform('update_entity', kwargs)
+        return _parse_response_for_dict_filter(response, filter=['etag'])
+
+    async def merge_entity(self, **kwargs):
+        """see :func:`azure.storage.TableService.merge_entity`"""
+        response = await self._perform('merge_entity', kwargs)
+        return _parse_response_for_dict_filter(response, filter=['etag'])
+
+    async def insert_or_replace_entity(self, **kwargs):
+        """see :func:`azure.storage.TableService.insert_or_replace_entity`"""
+        response = await self._perform('insert_or_replace_entity', kwargs)
+        return _parse_response_for_dict_filter(response, filter=['etag'])
+
+    async def insert_or_merge_entity(self, **kwargs):
+        """see :func:`azure.storage.TableService.insert_or_merge_entity`"""
+        response = await self._perform('insert_or_merge_entity', kwargs)
+        return _parse_response_for_dict_filter(response, filter=['etag'])
+
+    async def delete_entity(self, **kwargs):
+        """see :func:`azure.storage.TableService.delete_entity`"""
+        await self._perform('delete_entity', kwargs)
+
+    async def close(self):
+        """close the idle connections of the running event loop"""
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is None:
+            return
+        for connections in pool[1].values():
+            for _, writer in connections:
+                writer.close()
+
+    def _build_request(self, name, kwargs):
+        """let the SDK build the request of ``name``, then sign it
+
+        :returns: :class:`azure.http.HTTPRequest`
+        """
+        try:
+            getattr(self._builder, name)(**kwargs)
+        except _CapturedRequest as e:
+            request = e.request
+        else:
+            raise Exception('{} did not perform a request'.format(name))
+        request.headers.append(('Authorization', _sign_storage_table_request(
+            request, self.ts.account_name, self.ts.account_key)))
+        return request
+
+    async def _perform(self, name, kwargs):
+        """the async version of :func:`TableService._perform_request`
+
+        :raises azure.WindowsAzureError: same as the SDK
+        """
+        request = self._build_request(name, kwargs)
+        try:
+            return await self._send(request)
+        except HTTPError as e:
+            _storage_error_handler(e)
+
+    def _get_pool(self):
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = (asyncio.Semaphore(self.max_connections), {})
+            self._pools[loop] = pool
+        return pool
+
+    async def _send(self, request):
+        """send the request and read the response, a stale keep-alive
+        connection will be retried once with a new connection
+
+        :raises azure.http.HTTPError: if status >= 300
+        :returns: :class:`azure.http.HTTPResponse`
+        """
+        protocol = request.protocol_override \
+            if request.protocol_override else self.ts.protocol
+        host = request.host
+        port = 80 if protocol == 'http' else 443
+        if ':' in host:
+            host, _, port = host.rpartition(':')
+            port = int(port)
+        key = (host, port, protocol)
+        semaphore, idle = self._get_pool()
+        payload = _encode_request(request)
+        async with semaphore:
+            for retry in (True, False):
+                reader, writer, reused = await _connect(idle, key)
+                pooled = False
+                try:
+                    writer.write(payload)
+                    await writer.drain()
+                    response, keep_alive = await _read_response(
+                        reader, request.method)
+                    if keep_alive:
+                        idle.setdefault(key, []).append((reader, writer))
+                        pooled = True
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if reused and retry:
+                        continue
+                    raise
+                finally:
+                    # also on cancellation, a half used connection can't
+                    # be reused
+                    if not pooled:
+                        writer.close()
+                break
+        if response.status >= 300:
+            raise HTTPError(response.status, response.message,
+                            response.headers, response.body)
+        return response
+
+
+async def _connect(idle, key):
+    """reuse an idle connection or open a new one
+
+    :returns: ``(reader, writer, reused)``
+    """
+    connections = idle.get(key, [])
+    while len(connections) > 0:
+        reader, writer = connections.pop()
+        if not reader.at_eof() and not writer.is_closing():
+            return reader, writer, True
+        writer.close()
+    host, port, protocol = key
+    ssl_context = ssl.create_default_context() if protocol == 'https' \
+        else None
+    reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+    return reader, writer, False
+
+
+def _encode_request(request):
+    """serialize :class:`azure.http.HTTPRequest` the way
+    :class:`azure.http.httpclient._HTTPClient` sends it"""
+    lines = ['{} {} HTTP/1.1'.format(request.method, request.path),
+             'Host: {}'.format(request.host),
+             'Accept-Encoding: identity']
+    for name, value in request.headers:
+        if value:
+            lines.append('{}: {}'.format(name, value))
+    lines.append('User-Agent: {}'.format(_USER_AGENT_STRING))
+    body = request.body or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def _read_response(reader, method):
+    """read one HTTP/1.1 response
+
+    :returns: ``(HTTPResponse, keep_alive)``, header names are lower cased
+        and an empty body is ``None`` like the SDK
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('connection closed by server')
+    parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+    version, status = parts[0], int(parts[1])
+    message = parts[2] if len(parts) > 2 else ''
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers.append((name.strip().lower(), value.strip()))
+    header_dict = dict(headers)
+    keep_alive = version == 'HTTP/1.1' and \
+        header_dict.get('connection', '').lower() != 'close'
+    if method == 'HEAD' or status in (204, 304):
+        body = b''
+    elif header_dict.get('transfer-encoding', '').lower() == 'chunked':
+        body = b''
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # skip the trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+    elif 'content-length' in header_dict:
+        body = await reader.readexactly(int(header_dict['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return HTTPResponse(status, message, headers, body or None), keep_alive
@@ -0,0 +1,221 @@
+"""
+    AzureTableODM.Batch
+
+    Entity group transactions
+"""
+from copy import copy
+from re import compile as re_compile
+from azure import (
+    WindowsAzureError,
+    WindowsAzureConflictError,
+    WindowsAzureMissingResourceError)
+from azure.http import HTTPError
+from .Service import get_table_service
+
+#: Azure allows at most 100 operations in one entity group transaction
+MAX_BATCH_SIZE = 100
+
+_status_re = re_compile(r'^HTTP/1\.1 (?P<status>\d{3})')
+_etag_re = re_compile(r'^ETag: (?P<etag>.+)$')
+_failed_index_re = re_compile(r'<message[^>]*>(?P<index>\d+):(?P<msg>[^<]*)')
+
+
+def _parse_batch_response(body):
+    """parse the multipart body returned by
+    :func:`azure.storage.batchclient._BatchClient.commit_batch_requests`
+
+    :param body: ``bytes`` or ``str``
+    :returns: a list of ``(status, etag, message)``, one per operation
+        if the changeset succeed, if it failed, a single item will be
+        returned with ``message`` prefixed by the index of the failed
+        operation (e.g. ``'0:The specified entity already exists.'``)
+    """
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    responses = []
+    for line in body.splitlines():
+        line = line.strip()
+        m = _status_re.match(line)
+        if m is not None:
+            responses.append([int(m.group('status')), None, None])
+            continue
+        if len(responses) == 0:
+            continue
+        m = _etag_re.match(line)
+        if m is not None:
+            responses[-1][1] = m.group('etag')
+            continue
+        m = _failed_index_re.search(line)
+        if m is not None:
+            responses[-1][2] = m.group('index') + ':' + m.group('msg')
+    return [tuple(r) for r in responses]
+
+
+def _status_to_error(status, message):
+    """mimic :func:`azure._general_error_handler`"""
+    if status == 409:
+        return WindowsAzureConflictError(message)
+    elif status == 404:
+        return WindowsAzureMissingResourceError(message)
+    return WindowsAzureError(message)
+
+
+class BatchError(WindowsAzureError):
+
+    """raised by :class:`BatchWriter` when any of the entity group
+    transactions failed
+
+    :attr:`failures` is a list of ``(entity, error)``, every entity in the
+    failed transaction is included since the transaction is atomic.
+    :attr:`results` is the same as the return of :func:`Entity.save_many`
+    """
+
+    def __init__(self, failures, results=None):
+        self.failures = failures
+        self.results = results
+        super().__init__('{} entities failed to save in batch'.format(
+            len(failures)))
+
+
+class BatchWriter:
+
+    """group :class:`Entity` saves into entity group transactions
+
+    entities are grouped by ``table_name`` and ``PartitionKey``, each group
+    will be committed when it has :data:`MAX_BATCH_SIZE` operations or
+    when the writer is flushed (or exits the ``with`` block)::
+
+        with BatchWriter() as writer:
+            for post in posts:
+                writer.save(post)
+
+    the operation of each entity is decided by :func:`Entity._save_operation`
+    the same way :func:`Entity.save` does, unless ``mode`` is given.
+    """
+
+    def __init__(self, mode=None, force_replace=False,
+                 force_merge=False, force_save=False, ts=None):
+        """
+
+        :param str mode: force all entities using one of
+            :attr:`Entity.SAVE_OPERATIONS`, default ``None``
+        :param bool force_replace: same as :func:`Entity.save`
+        :param bool force_merge: same as :func:`Entity.save`
+        :param bool force_save: same as :func:`Entity.save`
+        :param azure.storage.TableService ts:
+        :raises ValueError: if ``mode`` is not None or one of
+            :attr:`Entity.SAVE_OPERATIONS`
+        """
+        from .Entity import Entity
+        if mode is not None and mode not in Entity.SAVE_OPERATIONS:
+            raise ValueError('invalid mode, {}'.format(mode))
+        self.mode = mode
+        self.force_replace = force_replace
+        self.force_merge = force_merge
+        self.force_save = force_save
+        self._ts = ts
+        #: pending operations,
+        #: ``{(table_name, PartitionKey): [(entity, op, entity_dict)]}``
+        self._pending = {}
+        #: ``(entity, error)`` of the failed operations
+        self.failures = []
+
+    @property
+    def ts(self):
+        if self._ts is None:
+            self._ts = get_table_service()
+        return self._ts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._pending = {}
+            return False
+        self.flush()
+        if len(self.failures) > 0:
+            raise BatchError(failures=self.failures)
+        return False
+
+    def save(self, entity):
+        """validate and serialize the entity and queue it, the values at
+        this time are committed
+
+        :param Entity entity:
+        :returns: False if nothing need to be saved (same as
+            :func:`Entity.save`)
+        :returns: True if queued
+        """
+        entity_dict = entity._pre_save()
+        if self.mode is not None:
+            operation = self.mode
+        else:
+            operation = entity._save_operation(
+                force_replace=self.force_replace,
+                force_merge=self.force_merge,
+                force_save=self.force_save)
+        if operation is None:
+            return False
+        key = (entity.metas['table_name'], entity.PartitionKey)
+        group = self._pending.setdefault(key, [])
+        # one RowKey can only appear once in a transaction
+        if any(e.RowKey == entity.RowKey for e, _, _ in group):
+            self._commit(key)
+            group = self._pending.setdefault(key, [])
+        group.append((entity, operation, entity_dict))
+        if len(group) >= MAX_BATCH_SIZE:
+            self._commit(key)
+        return True
+
+    def flush(self):
+        """commit all the pending groups"""
+        for key in list(self._pending.keys()):
+            self._commit(key)
+
+    def _batch_service(self):
+        """a copy of :attr:`ts` to run one transaction on
+
+        the requests of a :class:`azure.storage.TableService` are queued
+        whenever its batch is started, so a batch on the shared service
+        would capture the requests of other threads
+        """
+        ts = copy(self.ts)
+        ts._batchclient = None
+        return ts
+
+    def _commit(self, key):
+        """commit one pending group as an entity group transaction, then
+        call :func:`Entity._after_save` of each entity with its new etag
+        """
+        group = self._pending.pop(key, [])
+        if len(group) == 0:
+            return
+        ts = self._batch_service()
+        ts.begin_batch()
+        try:
+            for entity, operation, entity_dict in group:
+                getattr(entity, 'save_' + operation)(
+                    ts=ts, entity_dict=entity_dict)
+        except Exception:
+            ts.cancel_batch()
+            raise
+        # TableService.commit_batch drops the response body
+        batchclient, ts._batchclient = ts._batchclient, None
+        try:
+            responses = _parse_batch_response(
+                batchclient.commit_batch_requests() or b'')
+        except HTTPError as e:
+            error = _status_to_error(e.status, str(e))
+            self.failures += [(entity, error) for entity, _, _ in group]
+            return
+        failed = [r for r in responses if r[0] >= 300]
+        if len(failed) > 0 or len(responses) != len(group):
+            status, _, message = failed[0] if len(failed) > 0 \
+                else (500, None, 'unexpected batch response')
+            error = _status_to_error(
+                status, 'batch rolled back, {}'.format(message))
+            self.failures += [(entity, error) for entity, _, _ in group]
+            return
+        for (entity, _, _), (_, etag, _) in zip(group, responses):
+            entity._after_save(saved_entity_dict={'etag': etag})
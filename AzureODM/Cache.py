@@ -0,0 +1,127 @@
+"""
+    AzureTableODM.Cache
+
+    In-memory cache of entities read by :func:`Entity.findOne`
+"""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+__all__ = ['EntityCache']
+
+
+class EntityCache:
+
+    """a thread safe LRU cache with an optional TTL
+
+    values are the raw entity dicts (as returned by ``get_entity``, with
+    ``etag``), so every hit hydrates a new :class:`Entity` instance. If
+    :attr:`negative_ttl` is set, the keys not found are remembered as
+    ``None`` too.
+
+    configured per class with ``metas['cache']``, see
+    :func:`Entity._get_cache`, any object with the same ``get``, ``set``,
+    ``set_missing``, ``touch``, ``evict`` and ``clear`` methods can be
+    plugged in instead.
+    """
+
+    def __init__(self, max_size=1024, ttl=None, revalidate=False,
+                 negative_ttl=None, clock=monotonic):
+        """
+
+        :param int max_size: max number of entities, the least recently
+            used is evicted first
+        :param float ttl: seconds an entity is fresh, ``None`` for ever
+        :param bool revalidate: if True, an expired entity is kept and
+            :func:`Entity.findOne` revalidates it by its etag instead of
+            reading it again
+        :param float negative_ttl: seconds a key not found is remembered,
+            ``None`` (default) to not remember them
+        :param clock: returns the current time in seconds
+        :raises TypeError: if max_size is not int
+        :raises ValueError: if max_size < 1
+        :raises TypeError: if ttl is not None or int or float
+        :raises TypeError: if negative_ttl is not None or int or float
+        """
+        if not isinstance(max_size, int):
+            raise TypeError('max_size is not an int, {}'.format(max_size))
+        if max_size < 1:
+            raise ValueError('max_size has to be >= 1, {}'.format(max_size))
+        if ttl is not None and not isinstance(ttl, (int, float)):
+            raise TypeError(
+                'ttl has to be None or int or float, {}'.format(ttl))
+        if negative_ttl is not None and \
+                not isinstance(negative_ttl, (int, float)):
+            raise TypeError('negative_ttl has to be None or int or float, {}'
+                            .format(negative_ttl))
+        self.max_size = max_size
+        self.ttl = ttl
+        self.revalidate = revalidate
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._lock = Lock()
+        #: ``{key: (raw_entity, expires_at)}``, least recently used first,
+        #: ``raw_entity`` is None if the key is not found
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        an expired entity is evicted unless :attr:`revalidate` is True, an
+        expired not found key is always evicted
+
+        :returns: None if not cached
+        :returns: ``(raw_entity, expired)``, ``raw_entity`` is None if the
+            key is not found
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            raw_entity, expires_at = entry
+            expired = expires_at is not None and self.clock() >= expires_at
+            if expired and (raw_entity is None or not self.revalidate):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return raw_entity, expired
+
+    def set(self, key, raw_entity):
+        """cache ``raw_entity`` (a dict with ``etag``) for :attr:`ttl`"""
+        self._set(key, raw_entity, self._expires_at())
+
+    def set_missing(self, key):
+        """remember ``key`` is not found for :attr:`negative_ttl`, does
+        nothing if :attr:`negative_ttl` is None"""
+        if self.negative_ttl is None:
+            return
+        self._set(key, None, self.clock() + self.negative_ttl)
+
+    def _set(self, key, raw_entity, expires_at):
+        with self._lock:
+            self._entries[key] = (raw_entity, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def touch(self, key):
+        """mark the entity of ``key`` fresh again after revalidation"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None:
+                self._entries[key] = (entry[0], self._expires_at())
+                self._entries.move_to_end(key)
+
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _expires_at(self):
+        if self.ttl is None:
+            return None
+        return self.clock() + self.ttl
@@ -0,0 +1,177 @@
+"""
+    AzureTableODM.Columns
+
+    Columnar results of a query, without creating :class:`Entity` instances
+"""
+from array import array
+from datetime import datetime, timezone, timedelta
+from sys import intern
+from azure.storage import Entity as AzureTableEntity
+from .Compiler import _TYPE_ERROR, _DESERIALIZE_ERROR, _type_name
+__all__ = ['EntityColumns']
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _to_microseconds(value):
+    """microseconds since the epoch, a naive ``datetime`` is in UTC (the
+    same as :func:`Entity._populate_with_dict`)"""
+    if value.tzinfo is None:
+        return (value - _NAIVE_EPOCH) // _MICROSECOND
+    return (value - _EPOCH) // _MICROSECOND
+
+
+class EntityColumns:
+
+    """the rows of a query stored column by column
+
+    * ``FloatField``: ``array('d')``
+    * ``IntField``: ``array('q')``
+    * ``BooleanField``: ``array('b')``
+    * ``DateField``: ``array('q')`` of microseconds since the epoch (UTC)
+    * ``StringField`` / ``KeyField``: ``list`` of interned ``str``
+    * other fields: ``list`` of (deserialized) values
+
+    a missing or ``None`` value is stored as ``0`` (``None`` in the lists)
+    and marked in the :func:`validity` mask of its column
+
+    created by :func:`Entity.columns` / :func:`QuerySet.to_columns`
+    """
+
+    #: ``(type, array typecode, default, convert)``, the first matched type
+    #: decides the storage of a field
+    ARRAY_TYPES = (
+        (bool, 'b', 0, None),
+        (int, 'q', 0, None),
+        (float, 'd', 0.0, None),
+        (datetime, 'q', 0, _to_microseconds),
+    )
+    #: the numpy dtypes of the array columns
+    NUMPY_DTYPES = {'b': 'bool', 'd': 'float64', 'q': 'int64'}
+
+    def __init__(self, entity, fields=None):
+        """
+
+        :param type entity: subclass of :class:`Entity`
+        :param list fields: the field names, default all the fields
+        :raises KeyError: if a field is not defined
+        """
+        if fields is None:
+            fields = list(entity._f)
+        for name in fields:
+            if name not in entity._f:
+                raise KeyError('field is not defined, {}'.format(name))
+        self.entity = entity
+        #: the field names, in order
+        self.fields = tuple(fields)
+        #: ``{name: array or list}``
+        self.columns = {}
+        #: ``{name: bytearray}``, 1 if the value is not None
+        self.masks = {}
+        self._length = 0
+        #: ``(name, type, column, mask, default, convert)``
+        self._columns = []
+        for name in self.fields:
+            field = entity._f[name]
+            column, default, convert = self._new_column(field)
+            mask = bytearray()
+            self.columns[name] = column
+            self.masks[name] = mask
+            if field.require_serializing:
+                _type = field.serialized_type
+            else:
+                _type = field._type
+            self._columns.append(
+                (name, _type, column, mask, default, convert))
+
+    def _new_column(self, field):
+        """:returns: ``(column, default, convert)``"""
+        if field.require_serializing:
+            return [], None, field.deserialize
+        if field._type is str:
+            return [], None, intern
+        for _type, typecode, default, convert in self.ARRAY_TYPES:
+            if field._type is _type:
+                return array(typecode), default, convert
+        return [], None, None
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name):
+        """the column of field ``name``"""
+        return self.columns[name]
+
+    def validity(self, name):
+        """the mask of field ``name``, 1 if the value is not None"""
+        return self.masks[name]
+
+    def extend(self, raw_entities):
+        """append a page of raw entities, the values are type checked and
+        deserialized the same as :func:`Entity._populate_with_dict`
+
+        :param raw_entities: iterable of ``dict`` or ``azure.storage.Entity``
+        :raises TypeError: if a raw entity is not a dict
+        :raises TypeError: if a value doesn't match the field type
+        """
+        rows = []
+        for raw_entity in raw_entities:
+            if isinstance(raw_entity, AzureTableEntity):
+                raw_entity = raw_entity.__dict__
+            elif not isinstance(raw_entity, dict):
+                raise TypeError('dic is not a dict, {}'.format(raw_entity))
+            rows.append(raw_entity)
+        # a whole column of the page at a time
+        for name, _type, column, mask, default, convert in self._columns:
+            values = [row.get(name) for row in rows]
+            valid = [value is not None for value in values]
+            if not all(isinstance(value, _type)
+                       for value, is_valid in zip(values, valid) if is_valid):
+                self._raise_type_error(name, _type, values)
+            mask.extend(valid)
+            if convert is not None:
+                values = [default if value is None else convert(value)
+                          for value in values]
+            elif default is not None and not all(valid):
+                values = [default if value is None else value
+                          for value in values]
+            column.extend(values)
+        self._length += len(rows)
+
+    def _raise_type_error(self, name, _type, values):
+        field = self.entity._f[name]
+        for value in values:
+            if value is None or isinstance(value, _type):
+                continue
+            if field.require_serializing:
+                raise TypeError(_DESERIALIZE_ERROR.format(
+                    _type_name(_type), value))
+            raise TypeError(_TYPE_ERROR.format(
+                _type_name(_type), name, value.__class__.__name__))
+
+    def to_numpy(self, name, masked=False):
+        """a numpy view of the column of field ``name``, the array columns
+        are not copied, ``DateField`` is ``datetime64[us]``, the list
+        columns are copied into ``object`` arrays, :func:`extend` raises
+        ``BufferError`` while a view of an array column is alive
+
+        :param bool masked: return a ``numpy.ma.MaskedArray`` masking the
+            None values
+        :raises ImportError: if numpy is not installed
+        """
+        import numpy
+        column = self.columns[name]
+        if isinstance(column, array):
+            view = numpy.frombuffer(
+                column, dtype=self.NUMPY_DTYPES[column.typecode])
+            if self.entity._f[name]._type is datetime:
+                view = view.view('datetime64[us]')
+        else:
+            view = numpy.empty(len(column), dtype=object)
+            view[:] = column
+        if masked:
+            valid = numpy.frombuffer(self.masks[name], dtype='bool')
+            return numpy.ma.MaskedArray(view, mask=~valid)
+        return view
@@ -0,0 +1,424 @@
+"""
+    AzureTableODM.Compiler
+
+    Code generation of the per class hot paths of :class:`Entity`
+"""
+from collections import namedtuple
+from datetime import datetime, timezone
+from azure.storage import Entity as AzureTableEntity
+__all__ = ['compile_populator', 'compile_serializer', 'compile_projector']
+
+#: the value of the fields not in the raw entity
+_MISSING = object()
+
+_TYPE_ERROR = 'expect {} for key {}, but got {}'
+_DESERIALIZE_ERROR = 'expect value to be {} for deserialization, but got {}'
+
+
+def _type_name(_type):
+    if isinstance(_type, tuple):
+        return '({})'.format(', '.join(t.__name__ for t in _type))
+    return _type.__name__
+
+
+def _may_be_datetime(_type):
+    """whether a value of ``_type`` can be a ``datetime``"""
+    types = _type if isinstance(_type, tuple) else (_type,)
+    return any(issubclass(datetime, t) for t in types)
+
+
+def _ref(name, compact):
+    """the expression of the attribute ``name`` of ``entity`` in the
+    generated code, ``d`` is the ``__dict__`` of ``entity``
+
+    :param bool compact: the attributes are ``__slots__`` (see
+        :func:`Entity._make_compact_class`), there is no ``d``
+    """
+    if compact:
+        return 'entity.' + name
+    return 'd[{!r}]'.format(name)
+
+
+def _value_lines(i, name, field, namespace):
+    """check the type of ``value``, the raw value of the ``i`` th field
+    ``name``, and deserialize it in place
+
+    :param GenericField field:
+    :param dict namespace: the globals of the generated code, the types and
+        the deserializer of the field are added
+    :returns: list of lines
+    """
+    if field.require_serializing:
+        namespace['serialized_type_{}'.format(i)] = field.serialized_type
+        namespace['deserialize_{}'.format(i)] = field.deserialize
+        return [
+            'if not isinstance(value, serialized_type_{}):'.format(i),
+            '    raise TypeError('
+            'DESERIALIZE_ERROR.format({!r}, value))'.format(
+                _type_name(field.serialized_type)),
+            'value = deserialize_{}(value)'.format(i),
+        ]
+    namespace['type_{}'.format(i)] = field._type
+    lines = [
+        'if not isinstance(value, type_{}):'.format(i),
+        '    raise TypeError(TYPE_ERROR.format({!r}, {!r}, '
+        'value.__class__.__name__))'.format(_type_name(field._type), name),
+    ]
+    if _may_be_datetime(field._type):
+        # ``combine`` is several times faster than ``replace(tzinfo=...)``
+        lines += [
+            'if value.tzinfo is None:' if field._type is datetime else
+            'if isinstance(value, datetime) and value.tzinfo is None:',
+            '    value = combine(value, value.time(), utc)',
+        ]
+    return lines
+
+
+def _populate_lines(fields, bulk, tracking=True, compact=False):
+    """the body populating ``d`` (the ``__dict__`` of ``entity``) with
+    ``raw_entity``, the same as the loop of
+    :func:`Entity._populate_with_dict`
+
+    :param dict fields: :attr:`Entity._f`
+    :param bool bulk: ``entity`` is a new instance, the saved copy is built
+        inline instead of calling :func:`Entity._copy_into_saved`
+    :param bool tracking: False to skip the saved copy and the change
+        detection, for read only entities
+    :param bool compact: see :func:`_ref`
+    :returns: ``(lines, namespace)``
+    """
+    namespace = {}
+    lines = [
+        'if raw_entity.__class__ is not dict:',
+        '    if isinstance(raw_entity, AzureTableEntity):',
+        '        raw_entity = raw_entity.__dict__',
+        '    elif not isinstance(raw_entity, dict):',
+        "        raise TypeError('dic is not a dict, {}'.format(raw_entity))",
+        'get = raw_entity.get',
+        'count = 0',
+    ]
+    for i, (name, field) in enumerate(fields.items()):
+        lines += [
+            'value = get({!r}, MISSING)'.format(name),
+            'if value is not MISSING:',
+        ]
+        lines += ['    ' + line
+                  for line in _value_lines(i, name, field, namespace)]
+        lines.append('    {} = value'.format(_ref(name, compact)))
+        if not field.require_serializing:
+            lines.append('    count += 1')
+    lines += [
+        '{} = False if count == {} else is_partial'.format(
+            _ref('_is_partial', compact), len(fields)),
+        "etag = get('etag', MISSING)",
+    ]
+    if not tracking:
+        lines += [
+            'if etag is not MISSING:',
+            '    {} = etag'.format(_ref('_saved_etag', compact)),
+            '    {} = False'.format(_ref('_is_new', compact)),
+        ]
+        return lines, namespace
+    lines.append('if etag is MISSING:')
+    if not compact:
+        # the fields written without an etag are changes to be saved, they
+        # have to be in :attr:`Entity._dirty` for :func:`_prepare_lines`
+        lines += [
+            '    written = {{name for name in {!r} if name in raw_entity}}'
+            .format(tuple(fields)),
+            '    if written:',
+            "        if d['_dirty'] is None:",
+            "            d['_dirty'] = written",
+            '        else:',
+            "            d['_dirty'] |= written",
+        ]
+    lines += [
+        '    {} = entity._check_chagned()'.format(
+            _ref('_is_changed', compact)),
+        'else:',
+        '    {} = etag'.format(_ref('_saved_etag', compact)),
+        '    {} = False'.format(_ref('_is_new', compact)),
+        '    {} = False'.format(_ref('_is_changed', compact)),
+    ]
+    if bulk:
+        lines.append('    {} = {{'.format(_ref('_saved_copy', compact)) +
+                     ', '.join('{!r}: {}'.format(name, _ref(name, compact))
+                               for name in fields) + '}')
+    else:
+        lines.append('    entity._copy_into_saved()')
+    return lines, namespace
+
+
+def compile_populator(entity, fast_init=True):
+    """generate the hydration functions of an :class:`Entity` class, with
+    its fields, types and deserializers baked in
+
+    * ``populate(entity, raw_entity, is_partial)`` is
+      :func:`Entity._populate_with_dict`
+    * ``hydrate_many(raw_entities, is_partial)`` creates a populated
+      instance of each raw entity, see :func:`Entity._hydrate_many`
+    * ``hydrate_many_read_only(raw_entities, is_partial)`` is
+      ``hydrate_many`` without the saved copy, the instances are read only
+
+    if the class is compact (:attr:`Entity._compact_class`), the instances
+    are created from the compact class and the attributes are set directly
+    instead of through the ``__dict__``
+
+    :param type entity: subclass of :class:`Entity`
+    :param bool fast_init: create the instances without calling
+        ``__init__`` (only the ``__dict__`` is initialized with
+        :attr:`Entity._defaults`), must be False if ``__init__`` is
+        overridden
+    :returns: ``(populate, hydrate_many, hydrate_many_read_only)``
+    """
+    compact = entity._compact_class is not None
+    body, namespace = _populate_lines(entity._f, bulk=False, compact=compact)
+    bulk_body, bulk_namespace = _populate_lines(
+        entity._f, bulk=True, compact=compact)
+    read_only_body, read_only_namespace = _populate_lines(
+        entity._f, bulk=True, tracking=False, compact=compact)
+    namespace.update(bulk_namespace)
+    namespace.update(read_only_namespace)
+    namespace.update({
+        'AzureTableEntity': AzureTableEntity,
+        'MISSING': _MISSING,
+        'TYPE_ERROR': _TYPE_ERROR,
+        'DESERIALIZE_ERROR': _DESERIALIZE_ERROR,
+        'datetime': datetime,
+        'combine': datetime.combine,
+        'utc': timezone.utc,
+        'cls': entity._compact_class or entity,
+        'defaults': entity._defaults,
+        'new': object.__new__,
+    })
+    if compact and fast_init:
+        create = ['entity = new(cls)'] + [
+            '{} = {!r}'.format(_ref(name, compact), value)
+            for name, value in entity._defaults.items()]
+    elif compact:
+        create = ['entity = cls()']
+    elif fast_init:
+        create = [
+            'entity = new(cls)',
+            'd = entity.__dict__',
+            'd.update(defaults)',
+        ]
+    else:
+        create = [
+            'entity = cls()',
+            'd = entity.__dict__',
+        ]
+    lines = ['def populate(entity, raw_entity, is_partial):']
+    if not compact:
+        lines.append('    d = entity.__dict__')
+    lines += ['    ' + line for line in body]
+    tracked = []
+    if fast_init:
+        tracked = ['{} = {{}}'.format(_ref('_saved_copy', compact))]
+        if compact:
+            tracked.append('{} = False'.format(_ref('_read_only', compact)))
+    read_only = ['{} = None'.format(_ref('_saved_copy', compact)),
+                 '{} = True'.format(_ref('_read_only', compact))]
+    for name, populate_body in [
+            ('hydrate_many', create + tracked + bulk_body),
+            ('hydrate_many_read_only', create + read_only + read_only_body)]:
+        lines += ['def {}(raw_entities, is_partial):'.format(name),
+                  '    entities = []',
+                  '    append = entities.append',
+                  '    for raw_entity in raw_entities:']
+        lines += ['        ' + line for line in populate_body]
+        lines += ['        append(entity)',
+                  '    return entities']
+    source = '\n'.join(lines) + '\n'
+    exec(compile(source, '<{} populator>'.format(entity.__name__), 'exec'),
+         namespace)
+    return (namespace['populate'], namespace['hydrate_many'],
+            namespace['hydrate_many_read_only'])
+
+
+def _prepare_lines(fields, compact=False):
+    """the body of ``prepare``, :func:`Entity._validate`,
+    :func:`Entity._check_chagned` and :func:`Entity._to_dict` in one pass,
+    only the assigned fields are compared if the saved copy is complete
+    (compact entities do not track the assignments, every field is
+    compared)
+
+    :param dict fields: :attr:`Entity._f`
+    :param bool compact: see :func:`_ref`
+    :returns: ``(lines, namespace)``
+    """
+    namespace = {}
+    lines = [] if compact else ['d = entity.__dict__']
+    lines.append('partial = {}'.format(_ref('_is_partial', compact)))
+    values = []
+    for i, (name, field) in enumerate(fields.items()):
+        namespace['type_{}'.format(i)] = field._type
+        lines += [
+            'v{} = {}'.format(i, _ref(name, compact)),
+            'if v{} is None:'.format(i),
+        ]
+        if field.required is True:
+            error = "    raise ValueError('{} is required')".format(name)
+            if name in ('PartitionKey', 'RowKey'):
+                lines.append(error)
+            else:
+                lines += ['    if partial is False:', '    ' + error]
+        else:
+            lines.append('    pass')
+        lines += [
+            'elif not isinstance(v{0}, type_{0}):'.format(i),
+            "    raise TypeError({!r})".format('{} is not type: {}'.format(
+                name, _type_name(field._type))),
+        ]
+        if field.require_serializing:
+            namespace['serialize_{}'.format(i)] = field.serialize
+            values.append('serialize_{0}(v{0})'.format(i))
+        else:
+            values.append('v{}'.format(i))
+    # compare every field with the saved copy
+    compare = ['saved_get = saved.get']
+    for i, name in enumerate(fields):
+        compare += [
+            'if not changed:',
+            '    old = saved_get({!r}, MISSING)'.format(name),
+            '    if old is MISSING or old != v{}:'.format(i),
+            '        changed = True',
+        ]
+    lines += [
+        'saved = {}'.format(_ref('_saved_copy', compact)),
+        'changed = False',
+    ]
+    if compact:
+        lines += compare
+    else:
+        # once :attr:`Entity._saved_copy` is complete, only the assigned
+        # fields (:attr:`Entity._dirty`) can be changed
+        lines += [
+            'if len(saved) == {}:'.format(len(fields)),
+            "    dirty = d['_dirty']",
+            '    if dirty:',
+            '        saved_get = saved.get',
+            '        for name in dirty:',
+            '            old = saved_get(name, MISSING)',
+            '            if old is not MISSING and old != d[name]:',
+            '                changed = True',
+            '                break',
+            'else:',
+        ]
+        lines += ['    ' + line for line in compare]
+    lines.append('return {' + ', '.join(
+        '{!r}: {}'.format(name, value)
+        for name, value in zip(fields, values)) + '}, changed')
+    return lines, namespace
+
+
+def compile_serializer(entity):
+    """generate the serialization functions of an :class:`Entity` class
+
+    * ``prepare(entity)`` validates the entity (same as
+      :func:`Entity._validate`), serializes it (same as
+      :func:`Entity._to_dict`) and checks the changes (same as
+      :func:`Entity._check_chagned`) in one pass, returns
+      ``(entity_dict, changed)``
+    * ``to_dict(entity)`` is :func:`Entity._to_dict`
+
+    the ``dict`` literals are compiled with a constant key tuple
+
+    :param type entity: subclass of :class:`Entity`
+    :returns: ``(prepare, to_dict)``
+    """
+    compact = entity._compact_class is not None
+    body, namespace = _prepare_lines(entity._f, compact=compact)
+    namespace['MISSING'] = _MISSING
+    lines = ['def prepare(entity):']
+    lines += ['    ' + line for line in body]
+    lines.append('def to_dict(entity):')
+    if not compact:
+        lines.append('    d = entity.__dict__')
+    lines.append('    return {' + ', '.join(
+        '{!r}: serialize_{}({})'.format(name, i, _ref(name, compact))
+        if field.require_serializing
+        else '{!r}: {}'.format(name, _ref(name, compact))
+        for i, (name, field) in enumerate(entity._f.items())) + '}')
+    source = '\n'.join(lines) + '\n'
+    exec(compile(source, '<{} serializer>'.format(entity.__name__), 'exec'),
+         namespace)
+    return namespace['prepare'], namespace['to_dict']
+
+
+def compile_projector(entity, fields, kind='dict'):
+    """generate ``project(raw_entities)`` of an :class:`Entity` class,
+    returns the values of ``fields`` of each raw entity without creating
+    any :class:`Entity`, only the types and deserializers of ``fields`` are
+    applied (the same as :func:`Entity._populate_with_dict`), a missing
+    value is None
+
+    :param type entity: subclass of :class:`Entity`
+    :param tuple fields: the field names
+    :param str kind: the type of the rows
+
+        * ``'dict'``: ``{name: value}``
+        * ``'tuple'``: ``(value, ...)``
+        * ``'named'``: a ``namedtuple`` of ``fields``
+        * ``'flat'``: the value of the only field
+    :raises KeyError: if a field is not defined
+    :raises ValueError: if kind is ``'flat'`` and there is not exactly
+        one field
+    :returns: ``project``, a function returning a list of rows
+    """
+    if kind not in ('dict', 'tuple', 'named', 'flat'):
+        raise ValueError('invalid kind, {}'.format(kind))
+    if kind == 'flat' and len(fields) != 1:
+        raise ValueError(
+            'flat has to be used with exactly one field, {}'.format(fields))
+    namespace = {
+        'AzureTableEntity': AzureTableEntity,
+        'MISSING': _MISSING,
+        'TYPE_ERROR': _TYPE_ERROR,
+        'DESERIALIZE_ERROR': _DESERIALIZE_ERROR,
+        'datetime': datetime,
+        'combine': datetime.combine,
+        'utc': timezone.utc,
+    }
+    lines = [
+        'def project(raw_entities):',
+        '    rows = []',
+        '    append = rows.append',
+        '    for raw_entity in raw_entities:',
+        '        if raw_entity.__class__ is not dict:',
+        '            if isinstance(raw_entity, AzureTableEntity):',
+        '                raw_entity = raw_entity.__dict__',
+        '            elif not isinstance(raw_entity, dict):',
+        "                raise TypeError("
+        "'dic is not a dict, {}'.format(raw_entity))",
+        '        get = raw_entity.get',
+    ]
+    for i, name in enumerate(fields):
+        if name not in entity._f:
+            raise KeyError('field is not defined, {}'.format(name))
+        lines += [
+            '        value = get({!r}, MISSING)'.format(name),
+            '        if value is MISSING:',
+            '            v{} = None'.format(i),
+            '        else:',
+        ]
+        lines += ['            ' + line for line in _value_lines(
+            i, name, entity._f[name], namespace)]
+        lines.append('            v{} = value'.format(i))
+    values = ', '.join('v{}'.format(i) for i in range(len(fields)))
+    if kind == 'dict':
+        row = '{' + ', '.join('{!r}: v{}'.format(name, i)
+                              for i, name in enumerate(fields)) + '}'
+    elif kind == 'tuple':
+        row = '(' + values + ',)'
+    elif kind == 'named':
+        namespace['Row'] = namedtuple('Row', fields)
+        row = 'Row(' + values + ')'
+    else:
+        row = 'v0'
+    lines += ['        append({})'.format(row),
+              '    return rows']
+    source = '\n'.join(lines) + '\n'
+    exec(compile(source, '<{} projector>'.format(entity.__name__), 'exec'),
+         namespace)
+    return namespace['project']
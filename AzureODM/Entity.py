@@ -4,14 +4,123 @@
     The table entity superclass
 """
 from .Fields import GenericField
-from .QuerySet import QuerySet
+from .QuerySet import QuerySet, Q, obj_to_query_value
+from .Batch import BatchWriter, BatchError
+from .Loader import FindOneLoader, SingleFlight
+from .Cache import EntityCache
+from .Columns import EntityColumns
+from .Aggregate import Aggregation
+from .Parallel import (
+    key_ranges, range_filter, sample_splits, scan_segments, merge_segments)
+from .Compiler import (
+    compile_populator, compile_serializer, compile_projector)
 from re import compile as re_compile
 from re import IGNORECASE as re_IGNORECASE
-from functools import wraps
-from .Service import get_table_service
+from functools import wraps, partial
+from itertools import islice
+from .Service import get_table_service, get_async_table_service
 from azure.storage import Entity as AzureTableEntity
 from azure import WindowsAzureMissingResourceError, WindowsAzureConflictError
-from datetime import datetime, timezone
+from queue import Queue, Full
+from threading import Thread, Event
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+
+def _prefetch(iterable, size):
+    """consume ``iterable`` in a background thread, at most ``size`` items
+    are buffered ahead of the caller
+
+    exceptions raised by ``iterable`` are re-raised to the caller, the
+    thread will stop when the returned generator is closed
+
+    :param iterable:
+    :param int size:
+    :returns: generator
+    """
+    buffer = Queue(maxsize=size)
+    stopped = Event()
+    done = object()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((done, e))
+        else:
+            put((done, None))
+
+    thread = Thread(target=worker, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def _select_with_keys(select):
+    """add ``PartitionKey`` and ``RowKey`` to a select string if it's not
+    ``'*'``, the same as :func:`QuerySet.select`"""
+    if select is None or select == '*':
+        return '*'
+    fields = [field.strip() for field in select.split(',')]
+    if not 'PartitionKey' in fields:
+        fields.append('PartitionKey')
+    if not 'RowKey' in fields:
+        fields.append('RowKey')
+    return ','.join(fields)
+
+
+def _raw_key(raw_entity):
+    """``(PartitionKey, RowKey)`` of a raw entity"""
+    if isinstance(raw_entity, AzureTableEntity):
+        raw_entity = raw_entity.__dict__
+    return raw_entity['PartitionKey'], raw_entity['RowKey']
+
+
+def _raw_etag(raw_entity):
+    """``etag`` of a raw entity"""
+    if isinstance(raw_entity, AzureTableEntity):
+        raw_entity = raw_entity.__dict__
+    return raw_entity.get('etag')
+
+
+def _continuation_keys(page):
+    """get the continuation token of a page returned by
+    :func:`azure.storage.TableService.query_entities`
+
+    :returns: ``(NextPartitionKey, NextRowKey)``, ``(None, None)`` if this is
+        the last page
+    """
+    continuation = getattr(page, 'x_ms_continuation', None)
+    if not continuation:
+        return None, None
+    try:
+        next_partition_key = continuation['NextPartitionKey']
+    except KeyError:
+        return None, None
+    try:
+        next_row_key = continuation['NextRowKey']
+    except KeyError:
+        next_row_key = None
+    return next_partition_key, next_row_key
 
 
 class Entity:
@@ -24,63 +133,257 @@ class Entity:
     }
     _table_name_re = re_compile('^[a-z][a-z|0-9]*$', re_IGNORECASE)
     _created_table = False
+    #: the operations :func:`save` can perform, each maps to ``save_<op>``
+    SAVE_OPERATIONS = ('insert', 'insert_or_replace', 'insert_or_merge',
+                       'merge', 'replace')
+    #: the max number of entities Azure returns in one page
+    MAX_PAGE_SIZE = 1000
+    #: Azure allows at most 15 discrete comparisons in one ``$filter``
+    MAX_FILTER_COMPARISONS = 15
+    #: the max length of a generated ``$filter``, to keep the URL short
+    MAX_FILTER_LENGTH = 2000
+    #: True for the entities queried with ``tracking=False``, which have no
+    #: :attr:`_saved_copy` and cannot be saved
+    _read_only = False
+    #: the class generated by :func:`_make_compact_class` if
+    #: ``metas['compact']`` is True, instantiated instead of this class
+    _compact_class = None
+
+    def __new__(self, *args, **kwargs):
+        return object.__new__(self._compact_class or self)
 
     def __init__(self, *args, **kwargs):
-        """
+        """the schema is checked once by :func:`_compile_schema` when the
+        class is defined, the error is raised here
 
         :raises AttributeError: if ``table_name`` not in :attr:`metas`
         :raises ValueError: if :attr:`metas.table_name` not alphnum and starts
             with [a-z]
+        :raises AttributeError: if ``PartitionKey`` or ``RowKey`` is not a
+            ``str`` field
         :raises KeyError: if ``kwargs`` has undefined key
         """
+        if self._schema_error is not None:
+            error = self._schema_error
+            raise error.__class__(*error.args)
+        if self._compact_class is None:
+            # the status attributes and every field set to None
+            self.__dict__.update(self._defaults)
+        else:
+            for name, value in self._defaults.items():
+                setattr(self, name, value)
+            self._read_only = False
+        #: when populate the entity, the original copy is saved here
+        self._saved_copy = {}
+        if kwargs:
+            # if there are keys in ``kwargs`` not match the field
+            if not self._f.keys() >= kwargs.keys():
+                raise KeyError(
+                    'param not matches the schema: {}'.format(kwargs))
+            if self._compact_class is None:
+                self.__dict__.update(kwargs)
+            else:
+                for name, value in kwargs.items():
+                    setattr(self, name, value)
+
+    def __init_subclass__(self, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_entity_class' not in self.__dict__:
+            # not generated by :func:`_make_compact_class`
+            self._compile_schema()
+
+    @classmethod
+    def _compile_schema(self):
+        """collect the fields (:class:`GenericField` attributes defined in
+        the class and its bases) into :attr:`_f` and precompute the per
+        class attributes used by :func:`__init__`
+
+        the table name, ``PartitionKey`` and ``RowKey`` are validated here,
+        the error is kept in :attr:`_schema_error` and raised when the class
+        is instantiated, so abstract classes can still be defined
+        """
+        if self.__dict__.get('_entity_class', self) is not self:
+            # the compact class compiles the schema of its base
+            return self._entity_class._compile_schema()
+        #: the class owning the schema, the compact class points to its base
+        self._entity_class = self
+        self._f = {}
+        # the bases first, a field can be overridden or hidden by a subclass
+        for klass in reversed(self.__mro__):
+            for name, value in klass.__dict__.items():
+                if isinstance(value, GenericField):
+                    self._f[name] = value
+                else:
+                    self._f.pop(name, None)
+        for name, field in self._f.items():
+            # also for the fields set after the class is defined
+            field.name = name
+        #: the field names, in definition order
+        self._field_names = tuple(self._f)
+        #: the initial ``__dict__`` of an instance
+        self._defaults = dict.fromkeys(self._field_names)
+        self._defaults.update({
+            # indicate whether the entity is new (haven't been saved to Azure)
+            '_is_new': True,
+            # whether any attributes changed comparing to :attr:`_saved_copy`
+            '_is_changed': False,
+            # whether the document contains only a subset of fileds
+            # (select used)
+            '_is_partial': False,
+            # saved_etag, store the etag meta from the server
+            '_saved_etag': None,
+            # the fields assigned since :func:`_copy_into_saved`
+            '_dirty': None,
+        })
+        #: compiled by :func:`_get_populators` when first used
+        self._populators = None
+        #: compiled by :func:`_get_serializers` when first used
+        self._serializers = None
+        #: ``{(fields, kind): project}``, see :func:`_get_projector`
+        self._projectors = {}
+        try:
+            self._validate_schema()
+        except (AttributeError, ValueError) as e:
+            self._schema_error = e
+            self._compact_class = None
+        else:
+            self._schema_error = None
+            self._compact_class = None
+            if self.metas.get('compact') is True:
+                self._compact_class = self._make_compact_class()
+
+    @classmethod
+    def _make_compact_class(self):
+        """generate the compact subclass of this class, the fields and the
+        status attributes of its instances are stored in ``__slots__``
+        instead of the instance ``__dict__``, which is never created
+
+        it has the same name and schema, :func:`__new__` creates it instead
+        of this class so ``isinstance`` and attribute access work as usual,
+        but ``type(entity)`` is the compact class. The assignments are not
+        tracked (:attr:`_dirty`), every field is compared when saving
+
+        its ``__qualname__`` is ``<class>._compact_class``, so ``pickle``
+        finds it through this class
+
+        :returns: subclass of this class
+        """
+        compact = type(self.__name__, (self,), {
+            '__slots__': tuple(self._defaults) + ('_saved_copy',
+                                                  '_read_only'),
+            '__module__': self.__module__,
+            '__qualname__': self.__qualname__ + '._compact_class',
+            '__doc__': self.__doc__,
+            '_entity_class': self,
+        })
+        compact._compact_class = compact
+        return compact
+
+    @classmethod
+    def _get_populators(self):
+        """the hydration functions generated for this class by
+        :func:`AzureODM.Compiler.compile_populator`
+
+        :returns: ``(populate, hydrate_many, hydrate_many_read_only)``
+        """
+        if self._entity_class is not self:
+            return self._entity_class._get_populators()
+        if self._populators is None:
+            if self._schema_error is not None:
+                error = self._schema_error
+                raise error.__class__(*error.args)
+            self._populators = compile_populator(
+                self, fast_init=self.__init__ is Entity.__init__)
+        return self._populators
+
+    @classmethod
+    def _get_serializers(self):
+        """the serialization functions generated for this class by
+        :func:`AzureODM.Compiler.compile_serializer`, if :func:`_validate`,
+        :func:`_check_chagned` or :func:`_to_dict` is overridden,
+        ``prepare`` calls them instead
+
+        :returns: ``(prepare, to_dict)``
+        """
+        if self._entity_class is not self:
+            return self._entity_class._get_serializers()
+        if self._serializers is None:
+            prepare, to_dict = compile_serializer(self)
+            if self._validate is not Entity._validate or \
+                    self._check_chagned is not Entity._check_chagned or \
+                    self._to_dict is not Entity._to_dict:
+                prepare = Entity._prepare
+            self._serializers = (prepare, to_dict)
+        return self._serializers
 
+    @classmethod
+    def _get_projector(self, fields, kind):
+        """the projection function generated for ``fields`` by
+        :func:`AzureODM.Compiler.compile_projector`, compiled once for each
+        ``fields`` and ``kind``
+
+        :param tuple fields:
+        :param str kind:
+        :returns: ``project(raw_entities)``
+        """
+        if self._entity_class is not self:
+            return self._entity_class._get_projector(fields, kind)
+        project = self._projectors.get((fields, kind))
+        if project is None:
+            project = compile_projector(self, fields, kind)
+            self._projectors[(fields, kind)] = project
+        return project
+
+    def _prepare(self):
+        """the uncompiled ``prepare``, see :func:`_get_serializers`"""
+        self._validate()
+        changed = self._check_chagned()
+        return self._to_dict(), changed
+
+    @classmethod
+    def _validate_schema(self):
+        """
+        :raises AttributeError: if ``table_name`` not in :attr:`metas`
+        :raises ValueError: if :attr:`metas.table_name` not alphnum and starts
+            with [a-z]
+        :raises AttributeError: if ``PartitionKey`` or ``RowKey`` is not a
+            ``str`` field
+        :raises ValueError: if a field name is not an identifier and
+            ``metas['compact']`` is True
+        """
         if not isinstance(self.metas['table_name'], str):
             raise AttributeError('no table_name meta provided')
         if not self._table_name_re.search(self.metas['table_name']):
             raise ValueError('table_name is not in valid format, {}'.format(
                 self.metas['table_name']))
-
-        #: indicate whether the entity is new (haven't been saved to Azure)
-        self._is_new = True
-        #: whether any attributes changed comparing to :attr:`_saved_copy`
-        self._is_changed = False
-        #: whether the document contains only a subset of fileds (select used)
-        self._is_partial = False
-        #: when populate the entity, the original copy is saved here
-        self._saved_copy = {}
-        #: saved_etag, store the etag meta from the server
-        self._saved_etag = None
-
-        self._cache_fields()
-        # taking values from ``kwargs``
-        k_copy = kwargs.copy()
-        for field in self._f:
-            if field in k_copy.keys():
-                self.__dict__[field] = k_copy[field]
-                del k_copy[field]
-
-        # if there are keys in ``kwargs`` not match the field
-        if len(k_copy) > 0:
-            raise KeyError('param not matches the schema: {}'.format(kwargs))
+        # require ``PartitionKey`` and ``RowKey``
+        if 'PartitionKey' not in self._f or \
+                self._f['PartitionKey']._type.__name__ != 'str':
+            raise AttributeError('a StringField PartitionKey is required')
+        if 'RowKey' not in self._f or \
+                self._f['RowKey']._type.__name__ != 'str':
+            raise AttributeError('a StringField RowKey is required')
+        if self.metas.get('compact') is True:
+            for name in self._f:
+                if not name.isidentifier():
+                    raise ValueError('field name of a compact entity has '
+                                     'to be an identifier, {}'.format(name))
 
     def _cache_fields(self, re_cache=False):
-        """create instance attribute """
-        if getattr(self.__class__, '_f', None) is None or re_cache is True:
-            setattr(self.__class__, '_f', {})
-            for field in filter(
-                lambda x:  isinstance(
-                    self.__class__.__dict__[x], GenericField),
-                    self.__class__.__dict__):
-                self.__class__._f[field] = self.__class__.__dict__[field]
-            # require ``PartitionKey`` and ``RowKey``
-            if 'PartitionKey' not in self.__class__._f or \
-                    self.__class__._f['PartitionKey']._type.__name__ != 'str':
-                raise AttributeError('a StringField PartitionKey is required')
-            if 'RowKey' not in self.__class__._f or \
-                    self.__class__._f['RowKey']._type.__name__ != 'str':
-                raise AttributeError('a StringField RowKey is required')
-        for field in self.__class__._f:
-            self.__dict__[field] = None
+        """set every field of this instance to None
+
+        :param bool re_cache: compile the schema of the class again first,
+            e.g. a field is added after the class is defined
+        """
+        if re_cache is True:
+            self._compile_schema()
+            if self._schema_error is not None:
+                raise self._schema_error
+        if self._compact_class is None:
+            self.__dict__.update(dict.fromkeys(self._field_names))
+        else:
+            for name in self._field_names:
+                setattr(self, name, None)
 
     def _validate(self):
         """
@@ -90,13 +393,14 @@ class Entity:
         :raises TypeError: if field value doesn't match the type
         """
         for field in self._f:
-            if self.__dict__[field] is None:
-                if (self.__class__.__dict__[field].required is True):
+            value = getattr(self, field)
+            if value is None:
+                if (self._f[field].required is True):
                     if self._is_partial is False or \
                             field in ['PartitionKey', 'RowKey']:
                         raise ValueError('{} is required'.format(field))
             else:
-                if not isinstance(self.__dict__[field], self._f[field]._type):
+                if not isinstance(value, self._f[field]._type):
                     raise TypeError('{} is not type: {}'.format(
                         field, self._f[field]._type.__name__))
 
@@ -111,7 +415,30 @@ class Entity:
         """
         #self._saved_copy = {}
         for field in self._f:
-            self._saved_copy[field] = self.__dict__[field]
+            self._saved_copy[field] = getattr(self, field)
+        self._dirty = None
+
+    def _changed_fields(self):
+        """the fields assigned (tracked by :class:`GenericField`) since
+        :func:`_copy_into_saved` and different from :attr:`_saved_copy`,
+        only the assigned fields are compared (every field if the entity is
+        compact, see :func:`_make_compact_class`)
+
+        :returns: None if :attr:`_saved_copy` is not complete (the entity
+            was never saved or populated with an etag)
+        :returns: list of field names
+        """
+        saved = self._saved_copy
+        if len(saved) != len(self._f):
+            return None
+        if self._compact_class is not None:
+            return [name for name in self._f
+                    if saved[name] != getattr(self, name)]
+        if not self._dirty:
+            return []
+        d = self.__dict__
+        return [name for name in self._dirty
+                if name in saved and saved[name] != d[name]]
 
     def _check_chagned(self):
         """
@@ -122,7 +449,7 @@ class Entity:
         """
         for field in self._f:
             if not field in self._saved_copy \
-                    or self._saved_copy[field] != self.__dict__[field]:
+                    or self._saved_copy[field] != getattr(self, field):
                 return True
         return False
 
@@ -134,6 +461,8 @@ class Entity:
 
         will convert datetime object to UTC aware ``datetime``
 
+        the loop is generated per class, see :func:`_get_populators`
+
         :param dict dic: can also be :class:`AzureTableEntity`
         :param bool is_partial: whether the ``dic`` is only a partial of
             the entity (return by using ``select``) default is ``False``,
@@ -145,51 +474,7 @@ class Entity:
         :raises TypeError: if the ``key`` in dict doesn't match the type
             of ``field`` 's type
         """
-        if not isinstance(dic, (dict, AzureTableEntity)):
-            raise TypeError('dic is not a dict, {}'.format(dic))
-        if isinstance(dic, AzureTableEntity):
-            dic = dic.__dict__
-        valid_fields_count = 0
-        etagged = False
-        for key, value in dic.items():
-            if key in self._f:
-                # handle require_serializing
-                if self._f[key].require_serializing:
-                    if isinstance(value, self._f[key].serialized_type):
-                        self.__dict__[key] = self._f[key].deserialize(value)
-                    else:
-                        msg = 'expect value to be {} for deserialization,' +\
-                            ' but got {}'
-                        raise TypeError(
-                            msg.format(self._f[key].serialized_type.__name__,
-                                       value)
-                        )
-                else:
-                    if not isinstance(value, self._f[key]._type):
-                        raise TypeError('expect {} for key {}, but got {}'
-                                        .format(
-                                        self._f[key]._type.__name__,
-                                        key,
-                                        value.__class__.__name__))
-                    if isinstance(value, datetime) and value.tzinfo is None:
-                        value = value.replace(tzinfo=timezone.utc)
-                    self.__dict__[key] = value
-                    valid_fields_count += 1
-            elif key == 'etag':
-                # save etag to :attr:`_saved_etag`
-                self._saved_etag = value
-                etagged = True
-        if valid_fields_count == len(self._f):
-            self._is_partial = False
-        else:
-            self._is_partial = is_partial
-
-        if etagged is False:
-            self._is_changed = self._check_chagned()
-        else:
-            self._is_new = False
-            self._is_changed = False
-            self._copy_into_saved()
+        self._get_populators()[0](self, dic, is_partial)
 
     def _to_dict(self):
         """
@@ -197,15 +482,7 @@ class Entity:
 
         :rtype: :class:`dict`
         """
-        dic = {}
-        for name, field in self._f.items():
-            if field.require_serializing:
-                dic[name] = field.serialize(self.__dict__[name])
-                assert dic[name] is None \
-                    or isinstance(dic[name], field.serialized_type)
-            else:
-                dic[name] = self.__dict__[name]
-        return dic
+        return self._get_serializers()[1](self)
 
     #@staticmethod
     def inject_table_service(f):
@@ -223,6 +500,22 @@ class Entity:
                 ' inject_table_service'
         return wrapper
 
+    def inject_async_table_service(f):
+        """same as :func:`inject_table_service`, but inject
+        :func:`get_async_table_service`
+        """
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # will only inject if ``ts`` not in ``kwargs``
+            if not 'ts' in kwargs or kwargs['ts'] is None:
+                ts = get_async_table_service()
+                kwargs['ts'] = ts
+            return f(*args, **kwargs)
+        if hasattr(wrapper, '__doc__') and isinstance(wrapper.__doc__, str):
+            wrapper.__doc__ += '\n        .. py:decoratormethod::' + \
+                ' inject_async_table_service'
+        return wrapper
+
     @classmethod
     def _create_table(self, ts=None):
         if self._created_table is False:
@@ -236,6 +529,8 @@ class Entity:
     def findOne(self, partition_key, row_key, select='*', ts=None):
         """a wrapper around :func:`azure.storage.TableService.get_entity`
 
+        served from :func:`_get_cache` if ``metas['cache']`` is set
+
         :param str partition_key:
         :param str row_key:
         :param str select:
@@ -246,16 +541,233 @@ class Entity:
         """
         if not isinstance(select, str):
             raise TypeError('select is not a string, {}'.format(select))
-        try:
-            raw_entity = ts.get_entity(table_name=self.metas['table_name'],
-                                       partition_key=partition_key,
-                                       row_key=row_key,
-                                       select=select)
-        except WindowsAzureMissingResourceError:
+        cache = self._get_cache() if select == '*' else None
+        if cache is not None:
+            hit, raw_entity = self._cached_raw(
+                cache, partition_key, row_key, ts)
+            if hit:
+                return None if raw_entity is None else self._from_point_read(
+                    raw_entity, partition_key=partition_key,
+                    row_key=row_key, select=select)
+        loader = self._get_find_one_loader()
+        if loader is not None:
+            entity = loader.load(partition_key, row_key, select=select, ts=ts)
+        else:
+            raw_entity = self._get_raw(partition_key, row_key, select, ts)
+            entity = None if raw_entity is None else self._from_point_read(
+                raw_entity, partition_key=partition_key, row_key=row_key,
+                select=select)
+        if cache is not None:
+            self._cache_result(cache, (partition_key, row_key), entity)
+        return entity
+
+    @classmethod
+    def _get_raw(self, partition_key, row_key, select, ts):
+        """call ``get_entity``
+
+        :returns: None if not found
+        """
+        def get_entity():
+            try:
+                return ts.get_entity(table_name=self.metas['table_name'],
+                                     partition_key=partition_key,
+                                     row_key=row_key,
+                                     select=select)
+            except WindowsAzureMissingResourceError:
+                return None
+        return self._coalesce(
+            ('get_entity', partition_key, row_key, select), ts, get_entity)
+
+    @classmethod
+    async def _aget_raw(self, partition_key, row_key, select, ts):
+        """the async version of :func:`_get_raw`"""
+        async def get_entity():
+            try:
+                return await ts.get_entity(
+                    table_name=self.metas['table_name'],
+                    partition_key=partition_key,
+                    row_key=row_key,
+                    select=select)
+            except WindowsAzureMissingResourceError:
+                return None
+        return await self._acoalesce(
+            ('get_entity', partition_key, row_key, select), ts, get_entity)
+
+    @classmethod
+    def _get_find_one_loader(self):
+        """the :class:`AzureODM.Loader.FindOneLoader` of this class, if
+        ``metas['find_one_batch_window']`` (seconds) is set, concurrent
+        :func:`findOne` / :func:`afindOne` calls will be batched
+
+        :returns: None if batching is not enabled
+        """
+        if self._entity_class is not self:
+            return self._entity_class._get_find_one_loader()
+        window = self.metas.get('find_one_batch_window')
+        if window is None:
+            return None
+        loader = self.__dict__.get('_find_one_loader')
+        if loader is None or loader.window != window:
+            loader = FindOneLoader(self, window=window)
+            self._find_one_loader = loader
+        return loader
+
+    @classmethod
+    def _get_single_flight(self):
+        """the :class:`AzureODM.Loader.SingleFlight` of this class if
+        ``metas['coalesce_reads']`` is True, identical concurrent reads
+        (``get_entity`` of :func:`findOne`, and each page of ``query_entities``
+        of :func:`find` / :func:`iterate`) will share one request
+
+        :returns: None if coalescing is not enabled
+        """
+        if self._entity_class is not self:
+            return self._entity_class._get_single_flight()
+        if self.metas.get('coalesce_reads') is not True:
             return None
+        single_flight = self.__dict__.get('_single_flight')
+        if single_flight is None:
+            single_flight = SingleFlight()
+            self._single_flight = single_flight
+        return single_flight
+
+    @classmethod
+    def _coalesce(self, key, ts, fn):
+        """call ``fn()`` through :func:`_get_single_flight` if enabled
+
+        :param tuple key: identify the request, ``ts`` will be added
+        """
+        single_flight = self._get_single_flight()
+        if single_flight is None:
+            return fn()
+        return single_flight.do(key + (id(ts),), fn)
+
+    @classmethod
+    async def _acoalesce(self, key, ts, coroutine_fn):
+        """the async version of :func:`_coalesce`"""
+        single_flight = self._get_single_flight()
+        if single_flight is None:
+            return await coroutine_fn()
+        return await single_flight.ado(key + (id(ts),), coroutine_fn)
+
+    @classmethod
+    def _get_cache(self):
+        """the cache of :func:`findOne` (``select='*'`` only) of this class,
+        configured by ``metas['cache']``:
+
+        * a dict of the kwargs of :class:`AzureODM.Cache.EntityCache`, e.g.
+          ``{'max_size': 1000, 'ttl': 60, 'revalidate': True,
+          'negative_ttl': 5}``
+        * or a cache object with the same interface
+
+        the cached copy is updated by :func:`_after_save` and evicted by
+        :func:`delete`, a cached not found key is evicted by
+        :func:`save_insert`, :func:`save_insert_or_replace` and
+        :func:`save_insert_or_merge`
+
+        :returns: None if caching is not enabled
+        """
+        if self._entity_class is not self:
+            return self._entity_class._get_cache()
+        config = self.metas.get('cache')
+        if config is None:
+            return None
+        if not isinstance(config, dict):
+            return config
+        cache = self.__dict__.get('_cache')
+        if cache is None:
+            cache = EntityCache(**config)
+            self._cache = cache
+        return cache
+
+    @classmethod
+    def _cached_raw(self, cache, partition_key, row_key, ts):
+        """get the cached raw entity, an expired one (only kept if the cache
+        revalidates) is revalidated by reading only its etag
+
+        :returns: ``(False, None)`` if not cached, expired or changed
+        :returns: ``(True, None)`` if the key is known not found
+        :returns: ``(True, raw_entity)``
+        """
+        key = (partition_key, row_key)
+        cached = cache.get(key)
+        if cached is None:
+            return False, None
+        raw_entity, expired = cached
+        if not expired:
+            return True, raw_entity
+        current = self._get_raw(partition_key, row_key, 'PartitionKey', ts)
+        return self._revalidated(cache, key, raw_entity, current)
+
+    @classmethod
+    async def _acached_raw(self, cache, partition_key, row_key, ts):
+        """the async version of :func:`_cached_raw`"""
+        key = (partition_key, row_key)
+        cached = cache.get(key)
+        if cached is None:
+            return False, None
+        raw_entity, expired = cached
+        if not expired:
+            return True, raw_entity
+        current = await self._aget_raw(
+            partition_key, row_key, 'PartitionKey', ts)
+        return self._revalidated(cache, key, raw_entity, current)
+
+    @staticmethod
+    def _revalidated(cache, key, raw_entity, current):
+        """keep ``raw_entity`` if ``current`` has the same etag, see
+        :func:`_cached_raw` for the returns"""
+        if current is None:
+            cache.evict(key)
+            cache.set_missing(key)
+            return True, None
+        if _raw_etag(current) == raw_entity['etag']:
+            cache.touch(key)
+            return True, raw_entity
+        cache.evict(key)
+        return False, None
+
+    @staticmethod
+    def _cache_result(cache, key, entity):
+        """cache the result of :func:`findOne`"""
+        if entity is None:
+            cache.set_missing(key)
+        else:
+            cache.set(key, entity._cache_copy())
+
+    def _cache_copy(self):
+        """the raw entity dict cached by :func:`_get_cache`, None values
+        are left out like Azure does"""
+        dic = {k: v for k, v in self._to_dict().items() if v is not None}
+        dic['etag'] = self._saved_etag
+        return dic
+
+    def _update_cache(self):
+        """update the cached copy after a save, the copy is evicted if this
+        entity may not hold all the stored values (it's partial or has None
+        fields, which are not written by a merge)
+        """
+        cache = self._get_cache()
+        if cache is None:
+            return
+        key = (self.PartitionKey, self.RowKey)
+        if self._is_partial or \
+                any(value is None for value in self._to_dict().values()):
+            cache.evict(key)
+        else:
+            cache.set(key, self._cache_copy())
+
+    def _evict_cache(self):
+        cache = self._get_cache()
+        if cache is not None:
+            cache.evict((self.PartitionKey, self.RowKey))
+
+    @classmethod
+    def _from_point_read(self, raw_entity, partition_key, row_key, select):
+        """hydrate the result of ``get_entity``, ``PartitionKey`` and
+        ``RowKey`` are filled in if they are not selected"""
         is_partial = (select is not None and select != '*')
-        new_entity = self()
-        new_entity._populate_with_dict(dic=raw_entity, is_partial=is_partial)
+        new_entity = self._hydrate(raw_entity, is_partial=is_partial)
         if not 'PartitionKey' in select:
             new_entity.PartitionKey = partition_key
         if not 'RowKey' in select:
@@ -264,38 +776,749 @@ class Entity:
 
     @classmethod
     @inject_table_service
-    def find(self, filter=None, select=None, limit=None, ts=None):
+    def findMany(self, keys, select='*', max_workers=None, ts=None):
+        """get many entities by their keys
+
+        keys of the same partition are packed into
+        ``PartitionKey eq .. and (RowKey eq .. or RowKey eq ..)`` queries
+        (see :func:`_multi_get_filters`), the queries are performed
+        concurrently
+
+        :param list keys: list of ``(partition_key, row_key)``
+        :param str select: ``PartitionKey`` and ``RowKey`` will be added
+        :param int max_workers: max number of concurrent queries, ``None``
+            for the default of ``ThreadPoolExecutor``
+        :param azure.storage.TableService ts:
+        :raises TypeError: if select is not a string
+        :returns: list of :class:`Entity` in the same order as ``keys``,
+            None if not found (same as :func:`findOne`), the same key
+            will get the same instance
+        """
+        if not isinstance(select, str):
+            raise TypeError('select is not a string, {}'.format(select))
+        keys = [tuple(key) for key in keys]
+        found = self._find_many_raw(keys, select=select,
+                                    max_workers=max_workers, ts=ts)
+        entities = dict(
+            (key, self._from_point_read(raw_entity,
+                                        partition_key=key[0],
+                                        row_key=key[1],
+                                        select=select))
+            for key, raw_entity in found.items())
+        return [entities.get(key) for key in keys]
+
+    @classmethod
+    def _find_many_raw(self, keys, select='*', max_workers=None, ts=None):
+        """get the raw entities of ``keys``, a single key will be read with
+        ``get_entity``, otherwise the keys are packed by
+        :func:`_multi_get_filters` and queried concurrently
+
+        :returns: ``{(partition_key, row_key): raw_entity}`` of the found
+        """
+        keys = list(dict.fromkeys(keys))
+        if len(keys) == 1:
+            raw_entity = self._get_raw(keys[0][0], keys[0][1], select, ts)
+            return {} if raw_entity is None else {keys[0]: raw_entity}
+        select = _select_with_keys(select)
+        filters = self._multi_get_filters(keys)
+
+        def fetch(filter):
+            return [raw_entity
+                    for page in self._query_pages(filter=filter,
+                                                  select=select,
+                                                  ts=ts)
+                    for raw_entity in page]
+        if len(filters) <= 1 or max_workers == 1:
+            pages = [fetch(filter) for filter in filters]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pages = list(executor.map(fetch, filters))
+        return dict((_raw_key(raw_entity), raw_entity)
+                    for page in pages for raw_entity in page)
+
+    @classmethod
+    async def _afind_many_raw(self, keys, select='*', ts=None):
+        """the async version of :func:`_find_many_raw`"""
+        keys = list(dict.fromkeys(keys))
+        if len(keys) == 1:
+            raw_entity = await self._aget_raw(
+                keys[0][0], keys[0][1], select, ts)
+            return {} if raw_entity is None else {keys[0]: raw_entity}
+        select = _select_with_keys(select)
+
+        async def fetch(filter):
+            return [raw_entity
+                    async for page in self._afetch_pages(
+                        filter, select, None, None, ts)
+                    for raw_entity in page]
+        pages = await asyncio.gather(
+            *[fetch(filter) for filter in self._multi_get_filters(keys)])
+        return dict((_raw_key(raw_entity), raw_entity)
+                    for page in pages for raw_entity in page)
+
+    @classmethod
+    @inject_table_service
+    def _find_keys(self, keys, select=None, limit=None, tracking=True,
+                   ts=None):
+        """the entities of ``keys`` in ``(PartitionKey, RowKey)`` order, the
+        same as querying them, used for the multi-point queries of
+        :func:`QuerySet.go`
+
+        :param list keys: list of ``(partition_key, row_key)``
+        :returns: list of :class:`Entity`, the missing keys are skipped
+        """
+        found = self._find_many_raw(keys, select=select or '*', ts=ts)
+        return self._hydrate_keys(found, select, limit, tracking)
+
+    @classmethod
+    @inject_async_table_service
+    async def _afind_keys(self, keys, select=None, limit=None,
+                          tracking=True, ts=None):
+        """the async version of :func:`_find_keys`"""
+        found = await self._afind_many_raw(keys, select=select or '*', ts=ts)
+        return self._hydrate_keys(found, select, limit, tracking)
+
+    @classmethod
+    def _hydrate_keys(self, found, select, limit, tracking):
+        """hydrate ``{key: raw_entity}`` in key order"""
+        keys = sorted(found)[:limit]
+        is_partial = (select is not None and select != '*')
+        entities = self._hydrate_many([found[key] for key in keys],
+                                      is_partial=is_partial,
+                                      tracking=tracking)
+        if is_partial and not ('PartitionKey' in select and
+                               'RowKey' in select):
+            # a single key is read by ``get_entity`` with ``select``, the
+            # same as :func:`_from_point_read`
+            for (partition_key, row_key), entity in zip(keys, entities):
+                entity.PartitionKey = partition_key
+                entity.RowKey = row_key
+        return entities
+
+    @classmethod
+    def _multi_get_filters(self, keys):
+        """pack keys into as few filters as possible, each filter targets
+        one partition and respects :attr:`MAX_FILTER_COMPARISONS` and
+        :attr:`MAX_FILTER_LENGTH`
+
+        :param list keys: list of ``(partition_key, row_key)``
+        :returns: list of filter strings
+        """
+        partitions = {}
+        for partition_key, row_key in keys:
+            row_keys = partitions.setdefault(partition_key, [])
+            if row_key not in row_keys:
+                row_keys.append(row_key)
+        filters = []
+        for partition_key, row_keys in partitions.items():
+            # ``(PartitionKey eq '..' and (`` and the closing ``))``
+            base_length = len('(PartitionKey eq  and ())') + \
+                len(obj_to_query_value(partition_key))
+            chunk = []
+            length = base_length
+            for row_key in row_keys:
+                # `` or `` + ``RowKey eq '..'``
+                row_key_length = len(' or RowKey eq ') + \
+                    len(obj_to_query_value(row_key))
+                if len(chunk) > 0 and (
+                        len(chunk) + 1 >= self.MAX_FILTER_COMPARISONS or
+                        length + row_key_length > self.MAX_FILTER_LENGTH):
+                    filters.append(self._partition_filter(
+                        partition_key, chunk))
+                    chunk = []
+                    length = base_length
+                chunk.append(row_key)
+                length += row_key_length
+            filters.append(self._partition_filter(partition_key, chunk))
+        return filters
+
+    @classmethod
+    def _partition_filter(self, partition_key, row_keys):
+        """``(PartitionKey eq '..' and (RowKey eq '..' or ..))``"""
+        q = Q(PartitionKey=partition_key) & Q(RowKey__in=list(row_keys))
+        return q.compile(entity=self)
+
+    @classmethod
+    @inject_table_service
+    def find(self, filter=None, select=None, limit=None, prefetch=None,
+             tracking=True, ts=None):
         """a wrapper around :func:`azure.storage.TableService.query_entity`
 
+        will follow the continuation tokens until ``limit`` is reached,
+        see :func:`iterate` for the streaming version
+
         :param str filter:
         :param str select:
         :param int limit: alias for ``top``
+        :param int prefetch: see :func:`iterate`
+        :param bool tracking: see :func:`iterate`
         :raises TypeError: if filter is not None or str
         :raises TypeError: if select is not None or str
         :raises TypeError: if limit is not None or int
         :returns: empty list if nothing
         :returns: list of :class:`Entity`
         """
+        return list(self.iterate(filter=filter,
+                                 select=select,
+                                 limit=limit,
+                                 prefetch=prefetch,
+                                 tracking=tracking,
+                                 ts=ts))
+
+    @classmethod
+    @inject_table_service
+    def iterate(self, filter=None, select=None, limit=None, page_size=None,
+                prefetch=None, tracking=True, ts=None):
+        """the streaming version of :func:`find`, will follow the
+        continuation tokens and yield :class:`Entity` one page at a time
+
+        :param str filter:
+        :param str select:
+        :param int limit: total number of entities, ``None`` for all
+        :param int page_size: ``top`` of each request, up to
+            :attr:`MAX_PAGE_SIZE`
+        :param int prefetch: fetch up to ``prefetch`` pages in a background
+            thread while the current page is consumed, ``None`` or ``0``
+            to fetch the next page only when needed
+        :param bool tracking: False to get read only entities without
+            :attr:`_saved_copy` (half the memory of each entity), their
+            changes are not tracked and they cannot be saved
+        :raises TypeError: if filter is not None or str
+        :raises TypeError: if select is not None or str
+        :raises TypeError: if limit is not None or int
+        :raises TypeError: if page_size is not None or int
+        :raises TypeError: if prefetch is not None or int
+        :returns: generator of :class:`Entity`
+        """
+        if prefetch is not None and not isinstance(prefetch, int):
+            raise TypeError(
+                'prefetch has to be None or int, {}'.format(prefetch))
+        is_partial = (select is not None and select != '*')
+        pages = self._query_pages(filter=filter,
+                                  select=select,
+                                  limit=limit,
+                                  page_size=page_size,
+                                  ts=ts)
+        if prefetch:
+            pages = _prefetch(pages, size=prefetch)
+        return (entity for page in pages
+                for entity in self._hydrate_many(
+                    page, is_partial=is_partial, tracking=tracking))
+
+    @classmethod
+    @inject_table_service
+    def iterate_parallel(self, filter=None, select=None, limit=None,
+                         page_size=None, workers=4, splits=None,
+                         ordered=False, key='PartitionKey', tracking=True,
+                         ts=None):
+        """the parallel version of :func:`iterate`, the ``key`` space is
+        split into ranges (see :func:`AzureODM.Parallel.key_ranges`) and each
+        range is queried on its own worker by ANDing
+        ``<key> ge .. and <key> lt ..`` onto ``filter``, each range follows
+        its own continuation tokens
+
+        use ``key='RowKey'`` to split a single hot partition, ``filter``
+        should target that partition (e.g. ``PartitionKey eq 'tenant'``)
+
+        :param str filter:
+        :param str select:
+        :param int limit: total number of entities, ``None`` for all
+        :param int page_size: ``top`` of each request
+        :param int workers: the number of concurrent ranges
+        :param splits: a list of ``key`` boundaries, or the number of
+            ranges to discover with :func:`AzureODM.Parallel.sample_splits`,
+            default ``workers``
+        :param bool ordered: merge the ranges into ``(PartitionKey,
+            RowKey)`` order (see :func:`AzureODM.Parallel.merge_segments`),
+            the same order as :func:`iterate`, otherwise the pages are
+            yielded as they arrive, the ``RowKey`` ranges are all merged at
+            once, each one on its own worker
+        :param str key: ``PartitionKey`` or ``RowKey``
+        :param bool tracking: see :func:`iterate`
+        :raises TypeError: if workers is not an int
+        :raises ValueError: if workers is less than 1
+        :raises ValueError: if key is not ``PartitionKey`` or ``RowKey``
+        :raises TypeError: if splits is not None, int or list
+        :returns: generator of :class:`Entity`
+        """
+        self._validate_query_args(filter=filter,
+                                  select=select,
+                                  limit=limit,
+                                  page_size=page_size)
+        if not isinstance(workers, int):
+            raise TypeError('workers is not an int, {}'.format(workers))
+        if workers < 1:
+            raise ValueError('workers has to be at least 1, {}'.format(
+                workers))
+        if key not in ('PartitionKey', 'RowKey'):
+            raise ValueError(
+                'key has to be PartitionKey or RowKey, {}'.format(key))
+        if splits is None:
+            splits = workers
+        if isinstance(splits, int):
+            splits = sample_splits(self, splits, filter=filter, key=key,
+                                   workers=workers, ts=ts)
+        elif not isinstance(splits, (list, tuple)):
+            raise TypeError(
+                'splits has to be None, int or list, {}'.format(splits))
+        is_partial = (select is not None and select != '*')
+        if ordered:
+            # the keys are needed to merge
+            select = _select_with_keys(select)
+
+        def segment(lower, upper):
+            pages = self._fetch_pages(
+                range_filter(filter, key, lower, upper),
+                select, limit, page_size, ts)
+            return (self._hydrate_many(page, is_partial=is_partial,
+                                       tracking=tracking)
+                    for page in pages)
+        ranges = key_ranges(splits)
+        segments = [partial(segment, lower, upper)
+                    for lower, upper in ranges]
+        if ordered:
+            starts = None
+            if key == 'PartitionKey':
+                # the ranges are disjoint in the merged order
+                starts = [() if lower is None else (lower,)
+                          for lower, _ in ranges]
+            entities = merge_segments(
+                segments,
+                key=lambda entity: (entity.PartitionKey, entity.RowKey),
+                workers=workers,
+                starts=starts)
+        else:
+            entities = (entity
+                        for page in scan_segments(segments, workers=workers)
+                        for entity in page)
+        if limit is not None:
+            return islice(entities, limit)
+        return entities
+
+    @classmethod
+    def _hydrate(self, raw_entity, is_partial=False):
+        """create an :class:`Entity` populated by a raw entity
+
+        :param raw_entity: ``dict`` or ``azure.storage.Entity``
+        :param bool is_partial:
+        """
+        return self._get_populators()[1]((raw_entity,), is_partial)[0]
+
+    @classmethod
+    def _hydrate_many(self, raw_entities, is_partial=False, tracking=True):
+        """the bulk version of :func:`_hydrate`, used for each page of a
+        query
+
+        the saved copy of the raw entities with ``etag`` is built inline
+        instead of calling :func:`_copy_into_saved`
+
+        :param raw_entities: iterable of ``dict`` or ``azure.storage.Entity``
+        :param bool is_partial:
+        :param bool tracking: False to skip the saved copy, the entities
+            are :attr:`_read_only`
+        :returns: list of :class:`Entity`
+        """
+        populators = self._get_populators()
+        if tracking is False:
+            return populators[2](raw_entities, is_partial)
+        return populators[1](raw_entities, is_partial)
+
+    @classmethod
+    def _query_pages(self, filter=None, select=None, limit=None,
+                     page_size=None, ts=None):
+        """call :func:`azure.storage.TableService.query_entities` and follow
+        ``x-ms-continuation-NextPartitionKey/NextRowKey``
+
+        arguments are validated when called, the pages are fetched lazily
+
+        :returns: generator of raw entity lists
+        """
+        self._validate_query_args(filter=filter,
+                                  select=select,
+                                  limit=limit,
+                                  page_size=page_size)
+        return self._fetch_pages(filter, select, limit, page_size, ts)
+
+    @staticmethod
+    def _validate_query_args(filter, select, limit, page_size):
+        """
+        :raises TypeError: if filter is not None or str
+        :raises TypeError: if select is not None or str
+        :raises TypeError: if limit is not None or int
+        :raises TypeError: if page_size is not None or int
+        """
         if filter is not None and not isinstance(filter, str):
             raise TypeError('filter has to be None or str, {}'.format(filter))
         if select is not None and not isinstance(select, str):
             raise TypeError('select has to be None or str, {}'.format(select))
         if limit is not None and not isinstance(limit, int):
             raise TypeError('limit has to be None or int, {}'.format(limit))
-        raw_entities = ts.query_entities(
-            table_name=self.metas['table_name'],
-            filter=filter,
-            select=select,
-            top=limit,
-        )
+        if page_size is not None and not isinstance(page_size, int):
+            raise TypeError(
+                'page_size has to be None or int, {}'.format(page_size))
+
+    @classmethod
+    def _page_request(self, filter, select, remaining, page_size,
+                      next_partition_key, next_row_key):
+        """the kwargs of ``query_entities`` for the next page
+
+        ``top`` is the smaller one of ``remaining`` and ``page_size``, up to
+        :attr:`MAX_PAGE_SIZE`
+        """
+        top = page_size
+        if remaining is not None and (top is None or remaining < top):
+            top = remaining
+        if top is not None and top > self.MAX_PAGE_SIZE:
+            top = self.MAX_PAGE_SIZE
+        return {
+            'table_name': self.metas['table_name'],
+            'filter': filter,
+            'select': select,
+            'top': top,
+            'next_partition_key': next_partition_key,
+            'next_row_key': next_row_key,
+        }
+
+    @classmethod
+    def _fetch_pages(self, filter, select, limit, page_size, ts):
+        """the generator behind :func:`_query_pages`"""
+        next_partition_key = None
+        next_row_key = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            kwargs = self._page_request(filter, select, remaining, page_size,
+                                        next_partition_key, next_row_key)
+            page = self._coalesce(
+                ('query_entities',) + tuple(sorted(kwargs.items())),
+                ts, lambda: ts.query_entities(**kwargs))
+            if remaining is not None:
+                remaining -= len(page)
+            next_partition_key, next_row_key = _continuation_keys(page)
+            yield page
+            if next_partition_key is None:
+                break
+
+    @classmethod
+    async def _afetch_pages(self, filter, select, limit, page_size, ts):
+        """the async version of :func:`_fetch_pages`"""
+        next_partition_key = None
+        next_row_key = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            kwargs = self._page_request(filter, select, remaining, page_size,
+                                        next_partition_key, next_row_key)
+            page = await self._acoalesce(
+                ('query_entities',) + tuple(sorted(kwargs.items())),
+                ts, lambda: ts.query_entities(**kwargs))
+            if remaining is not None:
+                remaining -= len(page)
+            next_partition_key, next_row_key = _continuation_keys(page)
+            yield page
+            if next_partition_key is None:
+                break
+
+    # asyncio
+
+    @classmethod
+    @inject_async_table_service
+    async def afindOne(self, partition_key, row_key, select='*', ts=None):
+        """the async version of :func:`findOne`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        :raises TypeError: if select is not a string
+        :returns: None if not found
+        :returns: an instance of :class:`Entity` if found
+        """
+        if not isinstance(select, str):
+            raise TypeError('select is not a string, {}'.format(select))
+        cache = self._get_cache() if select == '*' else None
+        if cache is not None:
+            hit, raw_entity = await self._acached_raw(
+                cache, partition_key, row_key, ts)
+            if hit:
+                return None if raw_entity is None else self._from_point_read(
+                    raw_entity, partition_key=partition_key,
+                    row_key=row_key, select=select)
+        loader = self._get_find_one_loader()
+        if loader is not None:
+            entity = await loader.aload(partition_key, row_key,
+                                        select=select, ts=ts)
+        else:
+            raw_entity = await self._aget_raw(
+                partition_key, row_key, select, ts)
+            entity = None if raw_entity is None else self._from_point_read(
+                raw_entity, partition_key=partition_key, row_key=row_key,
+                select=select)
+        if cache is not None:
+            self._cache_result(cache, (partition_key, row_key), entity)
+        return entity
+
+    @classmethod
+    @inject_async_table_service
+    async def afind(self, filter=None, select=None, limit=None,
+                    tracking=True, ts=None):
+        """the async version of :func:`find`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        :returns: list of :class:`Entity`
+        """
+        return [entity async for entity in self.aiterate(
+            filter=filter, select=select, limit=limit, tracking=tracking,
+            ts=ts)]
+
+    @classmethod
+    @inject_async_table_service
+    def aiterate(self, filter=None, select=None, limit=None, page_size=None,
+                 tracking=True, ts=None):
+        """the async version of :func:`iterate`, use it with ``async for``
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        :returns: async generator of :class:`Entity`
+        """
+        self._validate_query_args(filter=filter,
+                                  select=select,
+                                  limit=limit,
+                                  page_size=page_size)
         is_partial = (select is not None and select != '*')
-        entities = []
-        for raw_entity in raw_entities:
-            new_entity = self()
-            new_entity._populate_with_dict(
-                dic=raw_entity, is_partial=is_partial)
-            entities.append(new_entity)
-        return entities
+        pages = self._afetch_pages(filter, select, limit, page_size, ts)
+        return (entity async for page in pages
+                for entity in self._hydrate_many(
+                    page, is_partial=is_partial, tracking=tracking))
+
+    @staticmethod
+    def _validate_fields(fields):
+        """
+        :raises TypeError: if fields is not a list or tuple of str
+        :raises ValueError: if fields is empty
+        :returns: tuple of field names
+        """
+        if not isinstance(fields, (list, tuple)) or \
+                not all(isinstance(field, str) for field in fields):
+            raise TypeError(
+                'fields has to be a list or tuple of str, {}'.format(fields))
+        if len(fields) == 0:
+            raise ValueError('fields cannot be empty')
+        return tuple(fields)
+
+    @classmethod
+    @inject_table_service
+    def iterate_values(self, fields, kind='dict', filter=None, limit=None,
+                       page_size=None, prefetch=None, ts=None):
+        """the projection version of :func:`iterate`, only ``fields`` are
+        selected and each raw entity is yielded as a dict or tuple of their
+        values without creating any :class:`Entity`, see
+        :func:`AzureODM.Compiler.compile_projector`
+
+        :param list fields: the field names
+        :param str kind: ``'dict'``, ``'tuple'``, ``'named'`` or ``'flat'``
+        :raises TypeError: if fields is not a list or tuple of str
+        :raises KeyError: if a field is not defined
+        :raises ValueError: if kind is not valid
+        :returns: generator of rows
+        """
+        if prefetch is not None and not isinstance(prefetch, int):
+            raise TypeError(
+                'prefetch has to be None or int, {}'.format(prefetch))
+        fields = self._validate_fields(fields)
+        project = self._get_projector(fields, kind)
+        pages = self._query_pages(filter=filter,
+                                  select=','.join(fields),
+                                  limit=limit,
+                                  page_size=page_size,
+                                  ts=ts)
+        if prefetch:
+            pages = _prefetch(pages, size=prefetch)
+        return (row for page in pages for row in project(page))
+
+    @classmethod
+    @inject_async_table_service
+    def aiterate_values(self, fields, kind='dict', filter=None, limit=None,
+                        page_size=None, ts=None):
+        """the async version of :func:`iterate_values`, use it with
+        ``async for``
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        :returns: async generator of rows
+        """
+        fields = self._validate_fields(fields)
+        project = self._get_projector(fields, kind)
+        select = ','.join(fields)
+        self._validate_query_args(filter=filter,
+                                  select=select,
+                                  limit=limit,
+                                  page_size=page_size)
+        pages = self._afetch_pages(filter, select, limit, page_size, ts)
+        return (row async for page in pages for row in project(page))
+
+    @classmethod
+    @inject_table_service
+    def aggregate(self, aggregations, group_by=None, filter=None, limit=None,
+                  page_size=None, prefetch=None, ts=None):
+        """aggregate the entities matching ``filter`` on the client, only
+        the needed fields are selected (see :func:`iterate_values`) and
+        folded page by page into an :class:`AzureODM.Aggregate.Aggregation`
+
+        :param dict aggregations: ``{operation: field or list of fields}``,
+            operation is one of ``count``, ``sum``, ``min``, ``max`` and
+            ``avg``
+        :param group_by: None, a field name or a list of field names
+        :returns: see :func:`AzureODM.Aggregate.Aggregation.result`
+        """
+        aggregation = Aggregation(self, aggregations, group_by=group_by)
+        aggregation.add(self.iterate_values(list(aggregation.fields),
+                                            kind='tuple',
+                                            filter=filter,
+                                            limit=limit,
+                                            page_size=page_size,
+                                            prefetch=prefetch,
+                                            ts=ts))
+        return aggregation.result()
+
+    @classmethod
+    @inject_async_table_service
+    async def aaggregate(self, aggregations, group_by=None, filter=None,
+                         limit=None, page_size=None, ts=None):
+        """the async version of :func:`aggregate`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        """
+        aggregation = Aggregation(self, aggregations, group_by=group_by)
+        async for row in self.aiterate_values(list(aggregation.fields),
+                                              kind='tuple',
+                                              filter=filter,
+                                              limit=limit,
+                                              page_size=page_size,
+                                              ts=ts):
+            aggregation.add((row,))
+        return aggregation.result()
+
+    @classmethod
+    @inject_table_service
+    def count_entities(self, filter=None, limit=None, ts=None):
+        """count the entities matching ``filter``, only ``PartitionKey`` is
+        selected and the pages are not hydrated
+
+        :param str filter:
+        :param int limit: stop counting at ``limit``
+        :raises TypeError: if filter is not None or str
+        :raises TypeError: if limit is not None or int
+        :returns: int
+        """
+        pages = self._query_pages(filter=filter,
+                                  select='PartitionKey',
+                                  limit=limit,
+                                  ts=ts)
+        return sum(len(page) for page in pages)
+
+    @classmethod
+    @inject_table_service
+    def has_entities(self, filter=None, ts=None):
+        """whether any entity matches ``filter``, requests ``top=1`` with
+        only ``PartitionKey`` selected, an empty page with a continuation
+        token (e.g. a partition boundary) is followed
+
+        :param str filter:
+        :raises TypeError: if filter is not None or str
+        :returns: bool
+        """
+        pages = self._query_pages(filter=filter,
+                                  select='PartitionKey',
+                                  limit=1,
+                                  ts=ts)
+        return any(len(page) > 0 for page in pages)
+
+    @classmethod
+    @inject_async_table_service
+    async def acount_entities(self, filter=None, limit=None, ts=None):
+        """the async version of :func:`count_entities`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        """
+        self._validate_query_args(filter=filter,
+                                  select=None,
+                                  limit=limit,
+                                  page_size=None)
+        count = 0
+        async for page in self._afetch_pages(
+                filter, 'PartitionKey', limit, None, ts):
+            count += len(page)
+        return count
+
+    @classmethod
+    @inject_async_table_service
+    async def ahas_entities(self, filter=None, ts=None):
+        """the async version of :func:`has_entities`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        """
+        self._validate_query_args(filter=filter,
+                                  select=None,
+                                  limit=None,
+                                  page_size=None)
+        pages = self._afetch_pages(filter, 'PartitionKey', 1, None, ts)
+        try:
+            async for page in pages:
+                if len(page) > 0:
+                    return True
+        finally:
+            await pages.aclose()
+        return False
+
+    @classmethod
+    def _new_columns(self, select):
+        """an empty :class:`AzureODM.Columns.EntityColumns` of the fields
+        in ``select``, all the fields if ``select`` is None or ``'*'``"""
+        fields = None
+        if select is not None and select != '*':
+            fields = [field.strip() for field in select.split(',')]
+        return EntityColumns(self, fields=fields)
+
+    @classmethod
+    @inject_table_service
+    def columns(self, filter=None, select=None, limit=None, page_size=None,
+                prefetch=None, ts=None):
+        """the columnar version of :func:`find`, the pages are appended to
+        an :class:`AzureODM.Columns.EntityColumns` without creating any
+        :class:`Entity`
+
+        the arguments are the same as :func:`iterate`
+
+        :raises KeyError: if a field in ``select`` is not defined
+        :returns: :class:`AzureODM.Columns.EntityColumns`
+        """
+        if prefetch is not None and not isinstance(prefetch, int):
+            raise TypeError(
+                'prefetch has to be None or int, {}'.format(prefetch))
+        pages = self._query_pages(filter=filter,
+                                  select=select,
+                                  limit=limit,
+                                  page_size=page_size,
+                                  ts=ts)
+        columns = self._new_columns(select)
+        if prefetch:
+            pages = _prefetch(pages, size=prefetch)
+        for page in pages:
+            columns.extend(page)
+        return columns
+
+    @classmethod
+    @inject_async_table_service
+    async def acolumns(self, filter=None, select=None, limit=None,
+                       page_size=None, ts=None):
+        """the async version of :func:`columns`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        :returns: :class:`AzureODM.Columns.EntityColumns`
+        """
+        self._validate_query_args(filter=filter,
+                                  select=select,
+                                  limit=limit,
+                                  page_size=page_size)
+        columns = self._new_columns(select)
+        async for page in self._afetch_pages(
+                filter, select, limit, page_size, ts):
+            columns.extend(page)
+        return columns
 
     @classmethod
     def select(self, fields=None):
@@ -308,60 +1531,104 @@ class Entity:
         """perform presave operations, maybe can provide pre_save hooks
         in the future
 
-        * check if the entity is valid
+        * check if the entity is valid (:func:`_validate`)
         * check if :func:`_check_chagned` and change :attr:`_is_changed`
+        * serialize the entity (:func:`_to_dict`)
+
+        in one pass by the ``prepare`` of :func:`_get_serializers`
+
+        :raises Exception: if the entity is :attr:`_read_only`
+        :returns: the ``dict`` for Azure SDK, to be passed to the ``save_*``
+            wrappers as ``entity_dict``
         """
-        self._validate()
-        self._is_changed = self._check_chagned()
+        self._check_writable()
+        entity_dict, self._is_changed = self._get_serializers()[0](self)
+        return entity_dict
+
+    def _check_writable(self):
+        """
+        :raises Exception: if the entity is :attr:`_read_only`
+        """
+        if self._read_only is True:
+            raise Exception(
+                'trying to save a read only entity,' +
+                ' please query it with tracking=True')
+
+    def _save_request(self, operation, entity_dict=None):
+        """the ``TableService`` method name and kwargs of ``operation``
+
+        shared by the ``save_*`` wrappers and :func:`asave`
+
+        :param str operation: one of :attr:`SAVE_OPERATIONS`
+        :param dict entity_dict: returned by :func:`_pre_save`, default
+            :func:`_to_dict`, a merge of a saved entity only sends the keys
+            and :func:`_changed_fields`
+        :raises Exception: if the entity is :attr:`_read_only`
+        :returns: ``(method_name, kwargs)``
+        """
+        self._check_writable()
+        if entity_dict is None:
+            entity_dict = self._to_dict()
+        if operation in ('merge', 'insert_or_merge') and \
+                self._is_new is False:
+            # only send the keys and the changed fields
+            changed = self._changed_fields()
+            if changed is not None:
+                entity_dict = dict(
+                    (name, entity_dict[name])
+                    for name in ['PartitionKey', 'RowKey'] + changed)
+        kwargs = {
+            'table_name': self.metas['table_name'],
+            'entity': entity_dict
+        }
+        if operation == 'insert':
+            return 'insert_entity', kwargs
+        kwargs['partition_key'] = self.PartitionKey
+        kwargs['row_key'] = self.RowKey
+        if operation == 'replace':
+            return 'update_entity', kwargs
+        return operation + '_entity', kwargs
 
     @inject_table_service
-    def save_insert(self, ts=None):
+    def save_insert(self, ts=None, entity_dict=None):
         """a wrapper around Azure's :func:`insert_entity`
 
         """
-        table_name = self.metas['table_name']
-        entity = self._to_dict()
-        return ts.insert_entity(table_name=table_name, entity=entity)
+        method, kwargs = self._save_request('insert', entity_dict)
+        try:
+            return getattr(ts, method)(**kwargs)
+        finally:
+            self._evict_cache()
 
     @inject_table_service
-    def save_insert_or_replace(self, ts=None):
+    def save_insert_or_replace(self, ts=None, entity_dict=None):
         """a wrapper around Azure's :func:`insert_or_replace_entity`"""
-        table_name = self.metas['table_name']
-        entity = self._to_dict()
-        return ts.insert_or_replace_entity(table_name=table_name,
-                                           partition_key=self.PartitionKey,
-                                           row_key=self.RowKey,
-                                           entity=entity)
+        method, kwargs = self._save_request('insert_or_replace', entity_dict)
+        try:
+            return getattr(ts, method)(**kwargs)
+        finally:
+            self._evict_cache()
 
     @inject_table_service
-    def save_insert_or_merge(self, ts=None):
+    def save_insert_or_merge(self, ts=None, entity_dict=None):
         """a wrapper around Azure's :func:`insert_or_merge_entity`"""
-        table_name = self.metas['table_name']
-        entity = self._to_dict()
-        return ts.insert_or_merge_entity(table_name=table_name,
-                                         partition_key=self.PartitionKey,
-                                         row_key=self.RowKey,
-                                         entity=entity)
+        method, kwargs = self._save_request('insert_or_merge', entity_dict)
+        try:
+            return getattr(ts, method)(**kwargs)
+        finally:
+            self._evict_cache()
 
     @inject_table_service
-    def save_merge(self, ts=None):
+    def save_merge(self, ts=None, entity_dict=None):
         """a wrapper around Azure's :func:`merge_entity`"""
-        table_name = self.metas['table_name']
-        entity = self._to_dict()
-        return ts.merge_entity(table_name=table_name,
-                               partition_key=self.PartitionKey,
-                               row_key=self.RowKey,
-                               entity=entity)
+        method, kwargs = self._save_request('merge', entity_dict)
+        return getattr(ts, method)(**kwargs)
 
     @inject_table_service
-    def save_replace(self, ts=None):
+    def save_replace(self, ts=None, entity_dict=None):
         """a wrapper around Azure's :func:`update_entity`"""
-        table_name = self.metas['table_name']
-        entity = self._to_dict()
-        return ts.update_entity(table_name=table_name,
-                                partition_key=self.PartitionKey,
-                                row_key=self.RowKey,
-                                entity=entity)
+        method, kwargs = self._save_request('replace', entity_dict)
+        return getattr(ts, method)(**kwargs)
 
     def save(self, force_replace=False,
              force_merge=False, force_save=False,
@@ -410,35 +1677,114 @@ class Entity:
         :param bool force_merge: default = False
         :param bool force_save: default = False
         """
-        self._pre_save()
-        result = None
+        entity_dict = self._pre_save()
+        operation = self._save_operation(force_replace=force_replace,
+                                         force_merge=force_merge,
+                                         force_save=force_save)
+        if operation is None:
+            return False
+        if operation == 'insert':
+            try:
+                result = self.save_insert(entity_dict=entity_dict)
+            except WindowsAzureConflictError as e:
+                if ignore_conflict is False:
+                    raise WindowsAzureConflictError(e)
+                else:
+                    return False
+        else:
+            result = getattr(self, 'save_' + operation)(
+                entity_dict=entity_dict)
+        return self._after_save(saved_entity_dict=result)
+
+    @inject_async_table_service
+    async def asave(self, force_replace=False,
+                    force_merge=False, force_save=False,
+                    ignore_conflict=False, ts=None):
+        """the async version of :func:`save`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        """
+        entity_dict = self._pre_save()
+        operation = self._save_operation(force_replace=force_replace,
+                                         force_merge=force_merge,
+                                         force_save=force_save)
+        if operation is None:
+            return False
+        method, kwargs = self._save_request(operation, entity_dict)
+        try:
+            result = await getattr(ts, method)(**kwargs)
+        except WindowsAzureConflictError:
+            if operation != 'insert' or ignore_conflict is False:
+                raise
+            return False
+        finally:
+            if operation.startswith('insert'):
+                # same as the ``save_insert*`` wrappers
+                self._evict_cache()
+        return self._after_save(saved_entity_dict=result)
+
+    def _save_operation(self, force_replace=False,
+                        force_merge=False, force_save=False):
+        """decide which ``save_*`` wrapper :func:`save` should call, the
+        rules are documented in :func:`save`
+
+        should be called after :func:`_pre_save`
+
+        :returns: None if the entity is not changed and not ``force_save``
+        :returns: one of :attr:`SAVE_OPERATIONS`
+        """
         if self._is_new:
             if force_merge is True:
-                result = self.save_insert_or_merge()
+                return 'insert_or_merge'
             elif force_replace is True:
-                result = self.save_insert_or_replace()
-            else:
-                try:
-                    result = self.save_insert()
-                except WindowsAzureConflictError as e:
-                    if ignore_conflict is False:
-                        raise WindowsAzureConflictError(e)
-                    else:
-                        return False
-        else:
-            if self._is_changed is False and force_save is False:
-                return False
-            if self._is_partial is True:
-                if force_replace is True:
-                    result = self.save_replace()
-                else:
-                    result = self.save_merge()
-            else:
-                if force_merge is True:
-                    result = self.save_merge()
-                else:
-                    result = self.save_replace()
-        return self._after_save(saved_entity_dict=result)
+                return 'insert_or_replace'
+            return 'insert'
+        if self._is_changed is False and force_save is False:
+            return None
+        if self._is_partial is True:
+            if force_replace is True:
+                return 'replace'
+            return 'merge'
+        if force_merge is True:
+            return 'merge'
+        return 'replace'
+
+    @classmethod
+    @inject_table_service
+    def save_many(self, entities, mode=None, force_replace=False,
+                  force_merge=False, force_save=False, ts=None):
+        """save entities with entity group transactions, see
+        :class:`AzureODM.Batch.BatchWriter`
+
+        entities are grouped by ``PartitionKey`` and committed in chunks of
+        up to 100 operations, the operation of each entity is the same as
+        :func:`save` unless ``mode`` is given
+
+        :param list entities: list of :class:`Entity`
+        :param str mode: one of :attr:`SAVE_OPERATIONS`, default ``None``
+        :param bool force_replace: default = False
+        :param bool force_merge: default = False
+        :param bool force_save: default = False
+        :param azure.storage.TableService ts:
+        :raises AzureODM.Batch.BatchError: if any transaction failed,
+            with ``failures`` and ``results``
+        :returns: list of bool in the same order as ``entities``,
+            False if the entity is not changed (same as :func:`save`)
+        """
+        entities = list(entities)
+        writer = BatchWriter(mode=mode,
+                             force_replace=force_replace,
+                             force_merge=force_merge,
+                             force_save=force_save,
+                             ts=ts)
+        results = [writer.save(entity) for entity in entities]
+        writer.flush()
+        if len(writer.failures) > 0:
+            failed = set(id(entity) for entity, _ in writer.failures)
+            results = [result and id(entity) not in failed
+                       for entity, result in zip(entities, results)]
+            raise BatchError(failures=writer.failures, results=results)
+        return results
 
     def _after_save(self, saved_entity_dict):
         """called after save function, if successful
@@ -481,6 +1827,7 @@ class Entity:
         else:
             self._populate_with_dict(
                 dic=saved_entity_dict, is_partial=self._is_partial)
+        self._update_cache()
         return True
 
     @inject_table_service
@@ -494,6 +1841,29 @@ class Entity:
         :raises TypeError: if :attr:`PartitionKey` is not a string
         :raises TypeError: if :attr:`RowKey`: is not a string
         """
+        request = self._delete_request(force_delete=force_delete)
+        try:
+            ts.delete_entity(**request)
+        finally:
+            self._evict_cache()
+
+    @inject_async_table_service
+    async def adelete(self, force_delete=False, ts=None):
+        """the async version of :func:`delete`
+
+        :param AzureODM.AsyncService.AsyncTableService ts:
+        """
+        request = self._delete_request(force_delete=force_delete)
+        try:
+            await ts.delete_entity(**request)
+        finally:
+            self._evict_cache()
+
+    def _delete_request(self, force_delete=False):
+        """check the entity can be deleted
+
+        :returns: the kwargs of ``delete_entity``
+        """
         if not isinstance(self.PartitionKey, self._f['PartitionKey']._type):
             raise TypeError(
                 'PartitionKey is not a string, {}'.format(self.PartitionKey))
@@ -504,10 +1874,11 @@ class Entity:
             raise Exception(
                 'trying to delete a none saved entity,' +
                 ' please use force_delete=True')
-        ts.delete_entity(
-            table_name=self.metas['table_name'],
-            partition_key=self.PartitionKey,
-            row_key=self.RowKey)
+        return {
+            'table_name': self.metas['table_name'],
+            'partition_key': self.PartitionKey,
+            'row_key': self.RowKey
+        }
 
     @classmethod
     @inject_table_service
@@ -518,3 +1889,7 @@ class Entity:
         ts.delete_table(
             table_name=self.metas['table_name'],
             fail_not_exist=fail_not_exist)
+
+
+# ``__init_subclass__`` is only called for the subclasses
+Entity._compile_schema()
@@ -5,9 +5,35 @@ from datetime import datetime
 import simplejson as json
 from . import _datetime_json_encoder, _datetime_json_object_hook
 
+# ``json.loads`` with ``object_hook`` (and ``json.dumps`` with ``default``)
+# creates a new decoder (encoder) for every call
+_json_decoder = json.JSONDecoder(object_hook=_datetime_json_object_hook)
+_json_encoder = json.JSONEncoder(default=_datetime_json_encoder)
+
 
 class GenericField(object):
 
+    """a data descriptor without ``__get__``: reading a field is a plain
+    lookup of the instance ``__dict__``, assigning it also records the field
+    name in the instance ``_dirty`` set (see :func:`Entity._changed_fields`)
+    """
+
+    #: the attribute name, set by :func:`__set_name__` or
+    #: :func:`Entity._compile_schema`
+    name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __set__(self, instance, value):
+        d = instance.__dict__
+        d[self.name] = value
+        dirty = d.get('_dirty')
+        if dirty is None:
+            d['_dirty'] = {self.name}
+        else:
+            dirty.add(self.name)
+
     def __init__(self,
                  _type,
                  required=False,
@@ -128,12 +154,12 @@ class JSONField(GenericField):
     def serialize(self, value):
         if value is None and self.keep_Null is False:
             return None
-        return json.dumps(value, default=_datetime_json_encoder)
+        return _json_encoder.encode(value)
 
     @classmethod
     def deserialize(self, value):
         if self.keep_Null is False and value is None:
             return None
-        result = json.loads(value, object_hook=_datetime_json_object_hook)
+        result = _json_decoder.decode(value)
         assert result is None or isinstance(result, self._type)
         return result
@@ -0,0 +1,209 @@
+"""
+    AzureTableODM.Loader
+
+    Batching and coalescing of concurrent reads
+"""
+import asyncio
+from concurrent.futures import Future
+from functools import partial
+from threading import Lock, Timer
+from weakref import WeakKeyDictionary
+
+
+class FindOneLoader:
+
+    """collect the point lookups of one :class:`Entity` class arriving within
+    a short window and resolve them with a few partition scoped queries
+    (see :func:`Entity._find_many_raw`)
+
+    * :func:`load` (threads) waits for ``window`` seconds after the first
+      lookup of a batch
+    * :func:`aload` (asyncio) waits for one iteration of the event loop
+
+    a batch is dispatched at once when it has ``max_batch_size`` lookups,
+    lookups are only batched together if they use the same ``select`` and
+    table service. Every caller gets its own :class:`Entity` instance.
+
+    enabled by ``metas['find_one_batch_window']``, see
+    :func:`Entity._get_find_one_loader`
+    """
+
+    def __init__(self, entity, window=0.002, max_batch_size=100):
+        """
+
+        :param type entity: subclass of :class:`Entity`
+        :param float window: seconds to wait for more lookups
+        :param int max_batch_size:
+        """
+        self.entity = entity
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._lock = Lock()
+        #: ``{(select, id(ts)): (ts, [(key, future)])}``
+        self._pending = {}
+        self._timer = None
+        #: ``{loop: {(select, id(ts)): (ts, [(key, future)])}}``
+        self._async_pending = {}
+
+    def load(self, partition_key, row_key, select='*', ts=None):
+        """queue a lookup and wait for its batch
+
+        :returns: None if not found, or an instance of :attr:`entity`
+        """
+        future = Future()
+        ready = None
+        with self._lock:
+            batch_key = (select, id(ts))
+            _, lookups = self._pending.setdefault(batch_key, (ts, []))
+            lookups.append(((partition_key, row_key), future))
+            if len(lookups) >= self.max_batch_size:
+                ready = self._pending.pop(batch_key)
+            elif self._timer is None:
+                self._timer = Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if ready is not None:
+            self._dispatch(select, *ready)
+        return future.result()
+
+    def flush(self):
+        """dispatch all the pending lookups"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._timer = None
+        for (select, _), (ts, lookups) in pending.items():
+            self._dispatch(select, ts, lookups)
+
+    def _dispatch(self, select, ts, lookups):
+        keys = [key for key, _ in lookups]
+        try:
+            found = self.entity._find_many_raw(keys, select=select, ts=ts)
+        except Exception as e:
+            for _, future in lookups:
+                future.set_exception(e)
+            return
+        for key, future in lookups:
+            self._resolve(future, found, key, select)
+
+    async def aload(self, partition_key, row_key, select='*', ts=None):
+        """the async version of :func:`load`, the lookups made in the same
+        iteration of the event loop are batched together
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._async_pending.get(loop)
+        if pending is None:
+            pending = self._async_pending[loop] = {}
+            loop.call_soon(self._aflush, loop)
+        batch_key = (select, id(ts))
+        _, lookups = pending.setdefault(batch_key, (ts, []))
+        lookups.append(((partition_key, row_key), future))
+        if len(lookups) >= self.max_batch_size:
+            loop.create_task(
+                self._adispatch(select, *pending.pop(batch_key)))
+        return await future
+
+    def _aflush(self, loop):
+        pending = self._async_pending.pop(loop, {})
+        for (select, _), (ts, lookups) in pending.items():
+            loop.create_task(self._adispatch(select, ts, lookups))
+
+    async def _adispatch(self, select, ts, lookups):
+        keys = [key for key, _ in lookups]
+        try:
+            found = await self.entity._afind_many_raw(
+                keys, select=select, ts=ts)
+        except Exception as e:
+            for _, future in lookups:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in lookups:
+            if not future.done():
+                self._resolve(future, found, key, select)
+
+    def _resolve(self, future, found, key, select):
+        """hydrate one lookup into its future, a failed hydration only
+        fails that lookup, so every future of the batch is resolved"""
+        try:
+            entity = self._hydrate(found, key, select)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(entity)
+
+    def _hydrate(self, found, key, select):
+        if key not in found:
+            return None
+        return self.entity._from_point_read(
+            found[key], partition_key=key[0], row_key=key[1], select=select)
+
+
+class SingleFlight:
+
+    """share one in-flight call between the concurrent callers of the same
+    ``key``, the result is not cached after the call finished
+
+    used by :class:`Entity` to coalesce identical ``get_entity`` and
+    ``query_entities`` requests when ``metas['coalesce_reads']`` is True,
+    see :func:`Entity._coalesce`. The raw result is shared, so the callers
+    have to hydrate their own :class:`Entity`
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        #: ``{key: Future}``
+        self._calls = {}
+        #: ``{loop: {key: asyncio.Task}}``
+        self._async_calls = WeakKeyDictionary()
+
+    def do(self, key, fn):
+        """call ``fn()`` or wait for the in-flight call of ``key``
+
+        :param key: hashable
+        :param fn: callable without arguments
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    async def ado(self, key, coroutine_fn):
+        """the async version of :func:`do`, the call runs in its own task
+        so cancelling any caller (the first one included) doesn't cancel
+        it for the others
+
+        :param coroutine_fn: async function without arguments
+        """
+        loop = asyncio.get_running_loop()
+        calls = self._async_calls.setdefault(loop, {})
+        task = calls.get(key)
+        if task is None:
+            task = calls[key] = loop.create_task(coroutine_fn())
+            task.add_done_callback(partial(self._afinish, calls, key))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _afinish(calls, key, task):
+        if calls.get(key) is task:
+            del calls[key]
+        if not task.cancelled():
+            # mark it as retrieved in case every caller was cancelled
+            task.exception()
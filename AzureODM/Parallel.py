@@ -0,0 +1,356 @@
+"""
+    AzureTableODM.Parallel
+
+    Scan the key ranges of a query concurrently
+"""
+from sys import maxunicode
+from queue import Queue, Full
+from heapq import heappush, heappop
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
+from azure.storage import Entity as AzureTableEntity
+from .QuerySet import obj_to_query_value
+__all__ = ['key_ranges', 'range_filter', 'sample_splits', 'scan_segments',
+           'merge_segments']
+
+#: the characters used to interpolate the probe keys, printable ASCII
+_FIRST_CHAR = 0x20
+_LAST_CHAR = 0x7e
+#: the number of characters interpolated after the common prefix
+_DIGITS = 3
+#: stop looking for the last key after this many characters
+_MAX_KEY_LENGTH = 64
+
+_DONE = object()
+
+
+def key_ranges(boundaries):
+    """the ranges between sorted boundaries, the first range has no lower
+    bound and the last one has no upper bound
+
+    ``key_ranges(['b', 'd'])`` -> ``[(None, 'b'), ('b', 'd'), ('d', None)]``
+
+    :param list boundaries: list of str, duplicates are removed
+    :raises TypeError: if a boundary is not a str
+    :returns: list of ``(lower, upper)``
+    """
+    for boundary in boundaries:
+        if not isinstance(boundary, str):
+            raise TypeError('boundary is not a str, {}'.format(boundary))
+    bounds = [None] + sorted(set(boundaries)) + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def range_filter(filter, key='PartitionKey', lower=None, upper=None):
+    """AND ``key ge lower`` and ``key lt upper`` onto ``filter``, the
+    original filter is wrapped in parentheses
+
+    :param str filter: None or ``''`` for no filter
+    :param str key: ``PartitionKey`` or ``RowKey``
+    :param str lower: inclusive, None for no lower bound
+    :param str upper: exclusive, None for no upper bound
+    :returns: str, None if there is no condition at all
+    """
+    conditions = []
+    if filter:
+        conditions.append('({})'.format(filter))
+    if lower is not None:
+        conditions.append('{} ge {}'.format(key, obj_to_query_value(lower)))
+    if upper is not None:
+        conditions.append('{} lt {}'.format(key, obj_to_query_value(upper)))
+    if len(conditions) == 0:
+        return None
+    return ' and '.join(conditions)
+
+
+def _first_key(entity, filter, key, lower, ts):
+    """the smallest ``key`` not less than ``lower`` matching ``filter``,
+    only ``key`` is selected with ``top=1``
+
+    :returns: str, None if not found
+    """
+    pages = entity._query_pages(filter=range_filter(filter, key, lower),
+                                select=key,
+                                limit=1,
+                                ts=ts)
+    for page in pages:
+        if len(page) > 0:
+            raw_entity = page[0]
+            if isinstance(raw_entity, AzureTableEntity):
+                raw_entity = raw_entity.__dict__
+            return raw_entity[key]
+    return None
+
+
+def _clamp(char):
+    return min(max(ord(char), _FIRST_CHAR), _LAST_CHAR)
+
+
+def _common_prefix(entity, filter, key, first, ts):
+    """the length of the longest prefix of ``first`` shared by every key,
+    binary searched over the length, a key without the prefix is not less
+    than the prefix with its last character incremented
+
+    :returns: int
+    """
+    low = 0
+    high = min(len(first), _MAX_KEY_LENGTH)
+    while low < high:
+        middle = (low + high + 1) // 2
+        prefix = first[:middle]
+        if ord(prefix[-1]) < maxunicode and _first_key(
+                entity, filter, key,
+                prefix[:-1] + chr(ord(prefix[-1]) + 1), ts) is None:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _last_prefix(entity, filter, key, first, ts):
+    """the largest prefix of the keys, the common prefix with ``first`` is
+    found by :func:`_common_prefix`, then the next :data:`_DIGITS`
+    characters are binary searched one character at a time
+
+    :returns: str
+    """
+    common = _common_prefix(entity, filter, key, first, ts)
+    prefix = first[:common]
+    while len(prefix) < min(common + _DIGITS, _MAX_KEY_LENGTH):
+        if _first_key(entity, filter, key, prefix + chr(_FIRST_CHAR),
+                      ts) is None:
+            # prefix itself is the last key
+            break
+        if prefix == first[:len(prefix)] and len(prefix) < len(first):
+            low = _clamp(first[len(prefix)])
+        else:
+            low = _FIRST_CHAR
+        high = _LAST_CHAR
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _first_key(entity, filter, key, prefix + chr(middle),
+                          ts) is None:
+                high = middle - 1
+            else:
+                low = middle
+        prefix += chr(low)
+        if prefix == first[:len(prefix)]:
+            common = len(prefix)
+    return prefix
+
+
+def _to_number(key, low, base):
+    """the first :data:`_DIGITS` characters of ``key`` as a number, each
+    character is a digit from ``chr(low)`` in ``base``"""
+    number = 0
+    for i in range(_DIGITS):
+        digit = _clamp(key[i]) if i < len(key) else low
+        number = number * base + min(max(digit - low, 0), base - 1)
+    return number
+
+
+def _from_number(number, low, base):
+    """the inverse of :func:`_to_number`"""
+    chars = []
+    for _ in range(_DIGITS):
+        number, digit = divmod(number, base)
+        chars.append(chr(digit + low))
+    return ''.join(reversed(chars)).rstrip(chr(low))
+
+
+def sample_splits(entity, count, filter=None, key='PartitionKey',
+                  workers=None, ts=None):
+    """discover the boundaries splitting the keys matching ``filter`` into
+    about ``count`` ranges with keys only ``top=1`` probes, nothing else is
+    read
+
+    the first key and the largest key prefix are probed, ``count - 1``
+    probe keys are interpolated in between (over the characters seen in
+    the two keys) and each one is snapped to the first existing key after
+    it, the ranges are even in the key space, not necessarily in the number
+    of entities
+
+    the probes before the snapping are sequential: one for the first key,
+    about ``log2(len(first key))`` for the common prefix of the keys and
+    up to 8 for each of the :data:`_DIGITS` characters after it, about 30
+    round trips whatever the length of the shared prefix, the ``count - 1``
+    snapping probes run concurrently on ``workers`` threads
+
+    :param type entity: subclass of :class:`Entity`
+    :param int count: the number of ranges
+    :param str filter:
+    :param str key: ``PartitionKey``, or ``RowKey`` if ``filter`` targets
+        a single partition
+    :param int workers: the number of concurrent probes
+    :param azure.storage.TableService ts:
+    :raises TypeError: if count is not an int
+    :raises ValueError: if count is less than 1
+    :returns: sorted list of boundaries, at most ``count - 1``
+    """
+    if not isinstance(count, int):
+        raise TypeError('count is not an int, {}'.format(count))
+    if count < 1:
+        raise ValueError('count has to be at least 1, {}'.format(count))
+    if count == 1:
+        return []
+    first = _first_key(entity, filter, key, None, ts)
+    if first is None:
+        return []
+    last = _last_prefix(entity, filter, key, first, ts)
+    common = 0
+    while common < min(len(first), len(last)) and \
+            first[common] == last[common]:
+        common += 1
+    prefix = first[:common]
+    # the digits only span the characters seen after the prefix
+    chars = [_clamp(char) for char in
+             first[common:common + _DIGITS] + last[common:common + _DIGITS]]
+    if len(chars) == 0:
+        return []
+    low_char = min(chars)
+    base = max(chars) - low_char + 1
+    low = _to_number(first[common:], low_char, base)
+    high = _to_number(last[common:], low_char, base)
+    probes = set()
+    for i in range(1, count):
+        probe = prefix + _from_number(low + (high - low) * i // count,
+                                      low_char, base)
+        if probe > first:
+            probes.add(probe)
+
+    def snap(probe):
+        return _first_key(entity, filter, key, probe, ts)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        found = set(executor.map(snap, sorted(probes)))
+    return sorted(boundary for boundary in found
+                  if boundary is not None and boundary != first)
+
+
+def _start(segments, workers, queue_of, stopped):
+    """run each segment on a thread pool, the items of segment ``i`` are
+    put into ``queue_of(i)`` as ``(i, item, None)`` followed by
+    ``(i, _DONE, error)``, a segment stops once ``stopped`` is set"""
+    def put(queue, item):
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def run(index, segment):
+        if stopped.is_set():
+            return
+        queue = queue_of(index)
+        try:
+            for item in segment():
+                if not put(queue, (index, item, None)):
+                    return
+        except BaseException as e:
+            put(queue, (index, _DONE, e))
+        else:
+            put(queue, (index, _DONE, None))
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    for index, segment in enumerate(segments):
+        executor.submit(run, index, segment)
+    executor.shutdown(wait=False)
+
+
+def scan_segments(segments, workers=None, buffer_size=2):
+    """run the segments concurrently, each one on a worker of a thread
+    pool, and yield their items as they arrive
+
+    exceptions raised by a segment are re-raised to the caller, the
+    workers will stop when the returned generator is closed
+
+    :param list segments: zero-argument callables returning iterables,
+        e.g. the pages of a key range
+    :param int workers: the size of the thread pool
+    :param int buffer_size: the number of items buffered ahead for each
+        segment
+    :returns: generator
+    """
+    segments = list(segments)
+    stopped = Event()
+    queue = Queue(maxsize=buffer_size * max(len(segments), 1))
+    _start(segments, workers, lambda index: queue, stopped)
+    remaining = len(segments)
+    try:
+        while remaining > 0:
+            _, item, error = queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        stopped.set()
+
+
+def _segment_items(queue):
+    """the items of the pages a segment put into ``queue``"""
+    while True:
+        _, page, error = queue.get()
+        if page is _DONE:
+            if error is not None:
+                raise error
+            return
+        yield from page
+
+
+def merge_segments(segments, key, workers=None, buffer_size=2,
+                   starts=None):
+    """run the segments concurrently and merge their items into ``key``
+    order with a heap, each segment has to be sorted by ``key`` (e.g.
+    ``(PartitionKey, RowKey)``, the order Azure returns)
+
+    at most ``buffer_size`` pages of each segment are buffered, the
+    exceptions and closing are the same as :func:`scan_segments`
+
+    :param list segments: zero-argument callables returning iterables of
+        pages (lists of items)
+    :param key: function returning the sort key of an item
+    :param int workers: the size of the thread pool, only used with
+        ``starts``, otherwise every segment runs on its own worker
+    :param int buffer_size: the number of pages buffered ahead for each
+        segment
+    :param list starts: the lower bound (in the ``key`` space) of each
+        segment in ascending order, a segment is not waited for until the
+        merged output reaches its lower bound, so the disjoint key ranges
+        can share fewer workers, None to wait for the first item of every
+        segment
+    :returns: generator of items
+    """
+    segments = list(segments)
+    if starts is None:
+        workers = max(len(segments), 1)
+    elif len(starts) != len(segments):
+        raise ValueError('starts and segments have different lengths')
+    stopped = Event()
+    queues = [Queue(maxsize=buffer_size) for _ in segments]
+    iterators = [_segment_items(queue) for queue in queues]
+    heap = []
+
+    def advance(index):
+        item = next(iterators[index], _DONE)
+        if item is not _DONE:
+            heappush(heap, (key(item), index, item))
+
+    _start(segments, workers, queues.__getitem__, stopped)
+    try:
+        for index in range(len(segments)):
+            if starts is None:
+                advance(index)
+            else:
+                # the segment is loaded when its lower bound is popped
+                heappush(heap, (starts[index], index, _DONE))
+        while len(heap) > 0:
+            _, index, item = heappop(heap)
+            if item is not _DONE:
+                yield item
+            advance(index)
+    finally:
+        stopped.set()
@@ -0,0 +1,253 @@
+"""
+    AzureTableODM.Planner
+
+    Classify a query by its ``PartitionKey`` / ``RowKey`` conditions
+"""
+from itertools import product
+from logging import getLogger
+from warnings import warn
+from .QuerySet import Q, QCombination, AndOperator, OrOperator
+__all__ = ['QueryPlan', 'plan_query', 'check_full_scan', 'FullScanWarning',
+           'FullScanError', 'POINT', 'MULTI_POINT', 'PARTITION', 'RANGE',
+           'SCAN', 'UNKNOWN']
+
+logger = getLogger(__name__)
+
+#: ``PartitionKey eq .. and RowKey eq ..``, served by ``get_entity``
+POINT = 'point'
+#: a finite set of keys, e.g. ``in`` on both keys, served by multi-get
+MULTI_POINT = 'multi_point'
+#: a single partition
+PARTITION = 'partition'
+#: a range or a finite set of partitions
+RANGE = 'range'
+#: no condition on ``PartitionKey``, the whole table is scanned
+SCAN = 'scan'
+#: the query can't be classified, but it has conditions on ``PartitionKey``
+UNKNOWN = 'unknown'
+
+#: the scan class of each kind reported by :func:`QuerySet.explain`
+SCAN_CLASSES = {POINT: 'point', MULTI_POINT: 'point',
+                PARTITION: 'partition', RANGE: 'range', SCAN: 'full',
+                UNKNOWN: 'unknown'}
+#: the values of ``metas['full_scan']``, see :func:`check_full_scan`
+FULL_SCAN_POLICIES = ('allow', 'warn', 'log', 'reject')
+
+_KEYS = ('PartitionKey', 'RowKey')
+_BOUNDS = ('gt', 'ge', 'lt', 'le')
+#: the query is not classified if it expands into more terms
+_MAX_TERMS = 1000
+
+
+class QueryPlan:
+
+    """the result of :func:`plan_query`"""
+
+    def __init__(self, kind, keys=None, partition_keys=None):
+        #: one of :data:`POINT`, :data:`MULTI_POINT`, :data:`PARTITION`,
+        #: :data:`RANGE`, :data:`SCAN` and :data:`UNKNOWN`
+        self.kind = kind
+        #: sorted ``(PartitionKey, RowKey)`` of :data:`POINT` and
+        #: :data:`MULTI_POINT`, otherwise None
+        self.keys = keys
+        #: sorted ``PartitionKey`` s the query can touch, None if unknown
+        self.partition_keys = partition_keys
+
+    def __repr__(self):
+        return '<QueryPlan {} keys={} partition_keys={}>'.format(
+            self.kind, self.keys, self.partition_keys)
+
+
+def _condition(q):
+    """``(field, operator, value)`` of a :class:`Q`, the operator of
+    ``field=value`` is ``eq``, None if it's not a valid query"""
+    m = q.cmp_re.match(q.k)
+    if m is None:
+        return None
+    return m.group('field'), m.group('operator') or 'eq', q.v
+
+
+def _terms(node):
+    """the ORed terms of a node, each term is a list of ANDed conditions,
+    ``and`` binds tighter than ``or`` (the same as Azure), None if the node
+    can't be reduced"""
+    if isinstance(node, Q):
+        condition = _condition(node)
+        return None if condition is None else [[condition]]
+    if not isinstance(node, QCombination):
+        return None
+    terms = [[]]
+    for i, query in enumerate(node.subquires):
+        if i % 2 == 1:
+            if query is OrOperator:
+                terms.append([])
+            elif query is not AndOperator:
+                return None
+            continue
+        condition = _condition(query) if isinstance(query, Q) else None
+        if condition is None:
+            return None
+        terms[-1].append(condition)
+    return terms
+
+
+def _query_terms(nodes):
+    """the ORed terms of the whole query, ``orWhere`` starts a new group of
+    terms and ``andWhere`` distributes over the terms of the last group,
+    None if a node can't be reduced, the query has ``notWhere`` or it has
+    more than :data:`_MAX_TERMS` terms"""
+    if len(nodes) == 0:
+        return [[]]
+    groups = []
+    for method, node in nodes:
+        terms = _terms(node)
+        if terms is None or method not in ('where', 'andWhere', 'orWhere'):
+            return None
+        if method == 'andWhere' and len(groups) > 0:
+            if len(groups[-1]) * len(terms) > _MAX_TERMS:
+                return None
+            groups[-1] = [a + b for a in groups[-1] for b in terms]
+        else:
+            groups.append(terms)
+    return [term for group in groups for term in group]
+
+
+def _has_partition_key(node):
+    """whether any condition of a node is on ``PartitionKey``"""
+    if isinstance(node, Q):
+        queries = [node]
+    elif isinstance(node, QCombination):
+        queries = [q for q in node.subquires if isinstance(q, Q)]
+    else:
+        return True
+    for q in queries:
+        condition = _condition(q)
+        if condition is None or condition[0] == 'PartitionKey':
+            return True
+    return False
+
+
+def _plan_term(conditions):
+    """classify ANDed conditions, see :func:`plan_query`"""
+    values = {'PartitionKey': None, 'RowKey': None}
+    bounded = {'PartitionKey': False, 'RowKey': False}
+    other = False
+    for field, operator, value in conditions:
+        if field not in _KEYS:
+            other = True
+        elif operator in _BOUNDS:
+            bounded[field] = True
+        elif operator in ('eq', 'in'):
+            value = set(value) if operator == 'in' else {value}
+            if not all(isinstance(v, str) for v in value):
+                other = True
+            elif values[field] is None:
+                values[field] = value
+            else:
+                values[field] &= value
+        else:
+            other = True
+    partition_keys = values['PartitionKey']
+    if partition_keys is None:
+        if bounded['PartitionKey']:
+            return QueryPlan(RANGE)
+        return QueryPlan(SCAN)
+    partition_keys = sorted(partition_keys)
+    if values['RowKey'] is not None and not other and \
+            not bounded['PartitionKey'] and not bounded['RowKey']:
+        keys = sorted(product(partition_keys, values['RowKey']))
+        kind = POINT if len(keys) == 1 else MULTI_POINT
+        return QueryPlan(kind, keys=keys, partition_keys=partition_keys)
+    if len(partition_keys) == 1:
+        return QueryPlan(PARTITION, partition_keys=partition_keys)
+    return QueryPlan(RANGE, partition_keys=partition_keys)
+
+
+def plan_query(nodes):
+    """classify a query by its nodes
+
+    the query is expanded into ORed terms of ANDed conditions, each term is
+    classified on its own and the terms are merged:
+
+    * a term without ``eq``, ``in`` or a bound on ``PartitionKey`` makes
+      the query a :data:`SCAN`
+    * the terms of :data:`POINT` or :data:`MULTI_POINT` are merged into
+      a :data:`POINT` or :data:`MULTI_POINT` query
+    * otherwise the query is a :data:`PARTITION` or :data:`RANGE` query
+      over the partitions of all the terms
+
+    the conditions on other fields don't change the class except that a
+    :data:`POINT` or :data:`MULTI_POINT` term with them is a
+    :data:`PARTITION` or :data:`RANGE` term (the other conditions have to
+    be evaluated by Azure), a query that can't be expanded (e.g. with
+    ``notWhere``) is :data:`UNKNOWN`, or a :data:`SCAN` if it has no
+    condition on ``PartitionKey`` at all
+
+    :param list nodes: ``[(method name, Q or QCombination)]`` recorded by
+        :class:`QuerySet`
+    :returns: :class:`QueryPlan`
+    """
+    terms = _query_terms(nodes)
+    if terms is None:
+        if any(_has_partition_key(node) for _, node in nodes):
+            return QueryPlan(UNKNOWN)
+        return QueryPlan(SCAN)
+    plans = [_plan_term(term) for term in terms]
+    if len(plans) == 1:
+        return plans[0]
+    kinds = set(plan.kind for plan in plans)
+    if SCAN in kinds:
+        return QueryPlan(SCAN)
+    if kinds <= {POINT, MULTI_POINT}:
+        keys = sorted(set(key for plan in plans for key in plan.keys))
+        kind = POINT if len(keys) == 1 else MULTI_POINT
+        return QueryPlan(kind, keys=keys, partition_keys=sorted(set(
+            partition_key for partition_key, _ in keys)))
+    if any(plan.partition_keys is None for plan in plans):
+        return QueryPlan(RANGE)
+    partition_keys = sorted(set(
+        key for plan in plans for key in plan.partition_keys))
+    if len(partition_keys) == 1:
+        return QueryPlan(PARTITION, partition_keys=partition_keys)
+    return QueryPlan(RANGE, partition_keys=partition_keys)
+
+
+class FullScanWarning(UserWarning):
+
+    """a query scans the whole table, see :func:`check_full_scan`"""
+
+
+class FullScanError(Exception):
+
+    """a full table scan is rejected, see :func:`check_full_scan`"""
+
+
+def check_full_scan(entity, plan, filter=None):
+    """apply ``metas['full_scan']`` of ``entity`` to a :data:`SCAN` plan
+
+    * ``'allow'`` (default): nothing
+    * ``'warn'``: :class:`FullScanWarning`
+    * ``'log'``: a warning of the ``AzureODM.Planner`` logger
+    * ``'reject'``: raise :class:`FullScanError`
+
+    :param type entity: subclass of :class:`Entity`
+    :param QueryPlan plan:
+    :param str filter: included in the message
+    :raises ValueError: if the policy is not in :data:`FULL_SCAN_POLICIES`
+    :raises FullScanError: if the policy is ``'reject'``
+    """
+    policy = entity.metas.get('full_scan', 'allow')
+    if policy not in FULL_SCAN_POLICIES:
+        raise ValueError('full_scan has to be one of {}, {}'.format(
+            FULL_SCAN_POLICIES, policy))
+    if plan.kind != SCAN or policy == 'allow':
+        return
+    message = 'full table scan of {}, filter: {}'.format(
+        entity.metas['table_name'], filter or None)
+    if policy == 'warn':
+        # point at the caller of :func:`QuerySet.go`
+        warn(message, FullScanWarning, stacklevel=4)
+    elif policy == 'log':
+        logger.warning(message)
+    else:
+        raise FullScanError(message)
@@ -12,14 +12,14 @@ dt_format = '%Y-%m-%dT%H:%M:%S'
 def obj_to_query_value(obj):
     """convert obj to query value
 
-    * str: 'value'
+    * str: 'value', single quotes are escaped as ``''``
     * int: value
     * float: value
     * bool: true or false
     * datetime: datetime'2008-07-10T00:00:00Z'
     """
     if isinstance(obj, str):
-        return "'{}'".format(obj)
+        return "'{}'".format(obj.replace("'", "''"))
     if isinstance(obj, bool):
         if obj is True:
             return 'true'
@@ -109,7 +109,7 @@ class Q(QNode):
             raise ValueError(
                 '{}={} is not a valid query'.format(self.k, self.v))
         query_string = m.group('field')
-        if not query_string in entity.__dict__:
+        if not query_string in entity._f:
             raise KeyError('field is not defined, {}'.format(query_string))
         if m.group('operator') is None:
             query_string += ' eq'
@@ -120,8 +120,8 @@ class Q(QNode):
                 raise ValueError('no empty list after in operator')
             in_query_format = "{} eq {}"
             query_string = '(' + in_query_format.format(
-                m.group('field'), obj_to_query_value(self.v.pop(0)))
-            for val in self.v:
+                m.group('field'), obj_to_query_value(self.v[0]))
+            for val in self.v[1:]:
                 query_string += ' or ' + \
                     in_query_format.format(
                         m.group('field'), obj_to_query_value(val))
@@ -220,6 +220,10 @@ class QuerySet:
         self._select = None
         self.filter = ''
         self._limit = None
+        self._tracking = True
+        #: ``[(method name, Q or QCombination)]`` of the where queries, see
+        #: :func:`plan`
+        self._nodes = []
 
     def query_parser(f):
         """
@@ -243,7 +247,9 @@ class QuerySet:
                     raise Exception('please call select before using query')
                 q = Q(**kwargs)
                 query_string = q.compile(entity=self._targeted_entity)
-            return f(self, query_string=query_string)
+            result = f(self, query_string=query_string)
+            self._nodes.append((f.__name__, q))
+            return result
         if hasattr(wrapper, '__doc__') and isinstance(wrapper.__doc__, str):
             wrapper.__doc__ += '\n        .. py:decoratormethod::' + \
                 ' query_parser'
@@ -329,16 +335,440 @@ class QuerySet:
         self._limit = limit
         return self
 
+    def read_only(self):
+        """query the entities without change tracking, see ``tracking`` of
+        :func:`Entity.iterate`, the entities cannot be saved
+        """
+        self._tracking = False
+        return self
+
+    def plan(self):
+        """classify the query by its ``PartitionKey`` / ``RowKey``
+        conditions, see :func:`AzureODM.Planner.plan_query`
+
+        :returns: :class:`AzureODM.Planner.QueryPlan`
+        """
+        from .Planner import plan_query
+        return plan_query(self._nodes)
+
+    def _route(self, plan):
+        """the execution path of :func:`go` for ``plan``, ``findOne``,
+        ``multi_get``, ``parallel`` or ``query``"""
+        from .Planner import POINT, MULTI_POINT, SCAN
+        if plan.kind == POINT and self._tracking:
+            return 'findOne'
+        if plan.kind in (POINT, MULTI_POINT):
+            return 'multi_get'
+        if plan.kind == SCAN and \
+                self._targeted_entity.metas.get('parallel_scan'):
+            return 'parallel'
+        return 'query'
+
+    def _check_full_scan(self):
+        """apply ``metas['full_scan']``, see
+        :func:`AzureODM.Planner.check_full_scan`
+
+        :returns: :class:`AzureODM.Planner.QueryPlan`
+        """
+        from .Planner import check_full_scan
+        plan = self.plan()
+        check_full_scan(self._targeted_entity, plan, self.filter)
+        return plan
+
+    def explain(self):
+        """describe how :func:`go` will execute the query without querying
+
+        * ``filter``: the compiled ``$filter``, None if there is no filter
+        * ``scan``: ``'point'``, ``'partition'``, ``'range'``, ``'full'``
+          or ``'unknown'``
+        * ``plan``: the kind of :class:`AzureODM.Planner.QueryPlan`
+        * ``route``: ``'findOne'``, ``'multi_get'``, ``'parallel'`` or
+          ``'query'``
+        * ``partitions``: the estimated number of partitions touched, None
+          if unknown (up to the whole table)
+        * ``keys``: the number of point reads, None if not a point query
+        * ``fields``: the projected field names
+
+        :returns: dict
+        """
+        from .Planner import SCAN_CLASSES
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call explain')
+        plan = self.plan()
+        if self._select is None or self._select == '*':
+            fields = list(self._targeted_entity._f)
+        else:
+            fields = self._select.split(',')
+        return {
+            'filter': self.filter or None,
+            'scan': SCAN_CLASSES[plan.kind],
+            'plan': plan.kind,
+            'route': self._route(plan),
+            'partitions': None if plan.partition_keys is None else len(
+                plan.partition_keys),
+            'keys': None if plan.keys is None else len(plan.keys),
+            'fields': fields,
+        }
+
     def go(self):
         """will call :attr:`_targeted_entity` 's :func:`Entity.find`
 
         this will pass :attr:`_select` to :func:`Entity.find` and pass
         :attr:`filter` (query string) with the limit
+
+        the query is routed by :func:`plan` first (see :func:`explain`):
+
+        * point: :func:`Entity.findOne` (``get_entity``)
+        * multi-point: the packed multi-get queries of
+          :func:`Entity.findMany`
+        * scan: :func:`Entity.iterate_parallel` (ordered) if
+          ``metas['parallel_scan']`` is the number of workers
+
+        a full scan is warned, logged or rejected according to
+        ``metas['full_scan']``, see
+        :func:`AzureODM.Planner.check_full_scan`
+
+        :raises AzureODM.Planner.FullScanError: if a full scan is rejected
         """
         if self._targeted_entity is None:
             raise Exception('you must call select before call go')
-        return self._targeted_entity.find(
+        entity = self._targeted_entity
+        plan = self._check_full_scan()
+        route = self._route(plan)
+        if route == 'findOne':
+            found = entity.findOne(plan.keys[0][0], plan.keys[0][1],
+                                   select=self._select)
+            return [] if found is None else [found][:self._limit]
+        if route == 'multi_get':
+            return entity._find_keys(plan.keys,
+                                     select=self._select,
+                                     limit=self._limit,
+                                     tracking=self._tracking)
+        if route == 'parallel':
+            return list(entity.iterate_parallel(
+                filter=self.filter,
+                select=self._select,
+                limit=self._limit,
+                workers=entity.metas['parallel_scan'],
+                ordered=True,
+                tracking=self._tracking,
+            ))
+        return entity.find(
+            filter=self.filter,
+            select=self._select,
+            limit=self._limit,
+            tracking=self._tracking,
+        )
+
+    def iterator(self, page_size=None, prefetch=None):
+        """will call :attr:`_targeted_entity` 's :func:`Entity.iterate`
+
+        the lazy version of :func:`go`, entities are fetched one page at a
+        time following the continuation tokens, a full scan is checked the
+        same as :func:`go`
+
+        :param int page_size: ``top`` of each request
+        :param int prefetch: number of pages fetched ahead in background
+        :returns: generator of :class:`Entity`
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call iterator')
+        self._check_full_scan()
+        return self._targeted_entity.iterate(
+            filter=self.filter,
+            select=self._select,
+            limit=self._limit,
+            page_size=page_size,
+            prefetch=prefetch,
+            tracking=self._tracking,
+        )
+
+    def __iter__(self):
+        return self.iterator()
+
+    def parallel(self, workers=4, splits=None, ordered=False,
+                 page_size=None, key='PartitionKey'):
+        """will call :attr:`_targeted_entity` 's
+        :func:`Entity.iterate_parallel`
+
+        the ``PartitionKey`` ranges of :func:`go` are scanned concurrently,
+        for the full table scans and exports, use ``key='RowKey'`` to split
+        a single partition, e.g.
+        ``where(PartitionKey='tenant').parallel(8, key='RowKey')``
+
+        :param int workers: the number of concurrent ranges
+        :param splits: a list of ``key`` boundaries, or the number of
+            ranges to discover by sampling
+        :param bool ordered: yield in ``(PartitionKey, RowKey)`` order, the
+            same as :func:`iterator`
+        :param int page_size: ``top`` of each request
+        :param str key: ``PartitionKey`` or ``RowKey``
+        :returns: generator of :class:`Entity`
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call parallel')
+        return self._targeted_entity.iterate_parallel(
+            filter=self.filter,
+            select=self._select,
+            limit=self._limit,
+            page_size=page_size,
+            workers=workers,
+            splits=splits,
+            ordered=ordered,
+            key=key,
+            tracking=self._tracking,
+        )
+
+    def values(self, *fields, page_size=None, prefetch=None):
+        """will call :attr:`_targeted_entity` 's
+        :func:`Entity.iterate_values`, only ``fields`` are selected and no
+        entity is created
+
+        :param fields: the field names, default the fields of
+            :func:`select`
+        :param int page_size: ``top`` of each request
+        :param int prefetch: number of pages fetched ahead in background
+        :returns: generator of ``dict``
+        """
+        kwargs = self._values_kwargs(fields, kind='dict')
+        return self._targeted_entity.iterate_values(
+            page_size=page_size, prefetch=prefetch, **kwargs)
+
+    def values_list(self, *fields, flat=False, named=False, page_size=None,
+                    prefetch=None):
+        """same as :func:`values`, but yield tuples
+
+        :param bool flat: yield the value itself, there has to be only one
+            field
+        :param bool named: yield ``namedtuple`` s
+        :raises ValueError: if flat and named are both True
+        :returns: generator of ``tuple``
+        """
+        kwargs = self._values_kwargs(fields, kind=self._tuple_kind(
+            flat=flat, named=named))
+        return self._targeted_entity.iterate_values(
+            page_size=page_size, prefetch=prefetch, **kwargs)
+
+    async def avalues(self, *fields, page_size=None):
+        """the async version of :func:`values`, will call
+        :attr:`_targeted_entity` 's :func:`Entity.aiterate_values`
+
+        :returns: async generator of ``dict``
+        """
+        kwargs = self._values_kwargs(fields, kind='dict')
+        async for row in self._targeted_entity.aiterate_values(
+                page_size=page_size, **kwargs):
+            yield row
+
+    async def avalues_list(self, *fields, flat=False, named=False,
+                           page_size=None):
+        """the async version of :func:`values_list`
+
+        :returns: async generator of ``tuple``
+        """
+        kwargs = self._values_kwargs(fields, kind=self._tuple_kind(
+            flat=flat, named=named))
+        async for row in self._targeted_entity.aiterate_values(
+                page_size=page_size, **kwargs):
+            yield row
+
+    def aggregate(self, group_by=None, page_size=None, prefetch=None,
+                  **aggregations):
+        """will call :attr:`_targeted_entity` 's :func:`Entity.aggregate`,
+        e.g. ``aggregate(sum='bytes', max='latency', group_by='PartitionKey')``
+
+        :param group_by: None, a field name or a list of field names
+        :param int page_size: ``top`` of each request
+        :param int prefetch: number of pages fetched ahead in background
+        :param aggregations: ``operation=field`` or
+            ``operation=[field, ..]``, operation is one of ``count``,
+            ``sum``, ``min``, ``max`` and ``avg``
+        :returns: see :func:`AzureODM.Aggregate.Aggregation.result`
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call aggregate')
+        return self._targeted_entity.aggregate(
+            aggregations,
+            group_by=group_by,
+            filter=self.filter,
+            limit=self._limit,
+            page_size=page_size,
+            prefetch=prefetch,
+        )
+
+    async def aaggregate(self, group_by=None, page_size=None,
+                         **aggregations):
+        """the async version of :func:`aggregate`"""
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call aaggregate')
+        return await self._targeted_entity.aaggregate(
+            aggregations,
+            group_by=group_by,
+            filter=self.filter,
+            limit=self._limit,
+            page_size=page_size,
+        )
+
+    def count(self):
+        """will call :attr:`_targeted_entity` 's
+        :func:`Entity.count_entities`, stops at :func:`limit` if set
+
+        :returns: the number of matching entities
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call count')
+        return self._targeted_entity.count_entities(
+            filter=self.filter,
+            limit=self._limit,
+        )
+
+    def exists(self):
+        """will call :attr:`_targeted_entity` 's :func:`Entity.has_entities`
+
+        :returns: True if any entity matches
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call exists')
+        return self._targeted_entity.has_entities(filter=self.filter)
+
+    async def acount(self):
+        """the async version of :func:`count`"""
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call acount')
+        return await self._targeted_entity.acount_entities(
+            filter=self.filter,
+            limit=self._limit,
+        )
+
+    async def aexists(self):
+        """the async version of :func:`exists`"""
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call aexists')
+        return await self._targeted_entity.ahas_entities(filter=self.filter)
+
+    def keys(self, page_size=None, prefetch=None):
+        """stream the ``(PartitionKey, RowKey)`` of the entities, only the
+        keys are selected, same as ``values_list('PartitionKey', 'RowKey')``
+
+        :param int page_size: ``top`` of each request
+        :param int prefetch: number of pages fetched ahead in background
+        :returns: generator of ``(PartitionKey, RowKey)``
+        """
+        return self.values_list('PartitionKey', 'RowKey',
+                                page_size=page_size, prefetch=prefetch)
+
+    def akeys(self, page_size=None):
+        """the async version of :func:`keys`
+
+        :returns: async generator of ``(PartitionKey, RowKey)``
+        """
+        return self.avalues_list('PartitionKey', 'RowKey',
+                                 page_size=page_size)
+
+    @staticmethod
+    def _tuple_kind(flat, named):
+        """the ``kind`` of :func:`Entity.iterate_values` for
+        :func:`values_list`"""
+        if flat is True and named is True:
+            raise ValueError('flat and named cannot be both True')
+        if flat is True:
+            return 'flat'
+        if named is True:
+            return 'named'
+        return 'tuple'
+
+    def _values_kwargs(self, fields, kind):
+        """the kwargs of :func:`Entity.iterate_values`"""
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call values')
+        if len(fields) == 0:
+            if self._select is None or self._select == '*':
+                fields = list(self._targeted_entity._f)
+            else:
+                fields = self._select.split(',')
+        return {
+            'fields': list(fields),
+            'kind': kind,
+            'filter': self.filter,
+            'limit': self._limit,
+        }
+
+    def to_columns(self, page_size=None, prefetch=None):
+        """will call :attr:`_targeted_entity` 's :func:`Entity.columns`
+
+        the pages are stored column by column without creating any entity
+
+        :param int page_size: ``top`` of each request
+        :param int prefetch: number of pages fetched ahead in background
+        :returns: :class:`AzureODM.Columns.EntityColumns`
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call to_columns')
+        return self._targeted_entity.columns(
+            filter=self.filter,
+            select=self._select,
+            limit=self._limit,
+            page_size=page_size,
+            prefetch=prefetch,
+        )
+
+    async def ago(self):
+        """the async version of :func:`go`, will call
+        :attr:`_targeted_entity` 's :func:`Entity.afind`, the point and
+        multi-point queries and the full scans are handled the same as
+        :func:`go`
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call ago')
+        entity = self._targeted_entity
+        plan = self._check_full_scan()
+        route = self._route(plan)
+        if route == 'findOne':
+            found = await entity.afindOne(plan.keys[0][0], plan.keys[0][1],
+                                          select=self._select)
+            return [] if found is None else [found][:self._limit]
+        if route == 'multi_get':
+            return await entity._afind_keys(plan.keys,
+                                            select=self._select,
+                                            limit=self._limit,
+                                            tracking=self._tracking)
+        return await entity.afind(
+            filter=self.filter,
+            select=self._select,
+            limit=self._limit,
+            tracking=self._tracking,
+        )
+
+    def aiterator(self, page_size=None):
+        """the async version of :func:`iterator`, will call
+        :attr:`_targeted_entity` 's :func:`Entity.aiterate`
+
+        :param int page_size: ``top`` of each request
+        :returns: async generator of :class:`Entity`
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call aiterator')
+        self._check_full_scan()
+        return self._targeted_entity.aiterate(
+            filter=self.filter,
+            select=self._select,
+            limit=self._limit,
+            page_size=page_size,
+            tracking=self._tracking,
+        )
+
+    def __aiter__(self):
+        return self.aiterator()
+
+    async def ato_columns(self, page_size=None):
+        """the async version of :func:`to_columns`, will call
+        :attr:`_targeted_entity` 's :func:`Entity.acolumns`
+        """
+        if self._targeted_entity is None:
+            raise Exception('you must call select before call ato_columns')
+        return await self._targeted_entity.acolumns(
             filter=self.filter,
             select=self._select,
             limit=self._limit,
+            page_size=page_size,
         )
@@ -2,10 +2,13 @@
     Service
 """
 from azure.storage import TableService
+from .AsyncService import AsyncTableService
 __all__ = ['connect_table_service', 'set_table_service',
-           'get_table_service', 'reset_table_service']
+           'get_table_service', 'reset_table_service',
+           'get_async_table_service']
 
 _table_service = None
+_async_table_service = None
 
 
 def connect_table_service(account_name, account_access_key):
@@ -34,6 +37,17 @@ def set_table_service(ts):
     _table_service = ts
 
 
+def get_async_table_service():
+    """the :class:`AsyncTableService` wrapping :func:`get_table_service`"""
+    global _async_table_service
+    ts = get_table_service()
+    if _async_table_service is None or _async_table_service.ts is not ts:
+        _async_table_service = AsyncTableService(ts)
+    return _async_table_service
+
+
 def reset_table_service():
     global _table_service
+    global _async_table_service
     _table_service = None
+    _async_table_service = None
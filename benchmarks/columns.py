@@ -0,0 +1,36 @@
+"""
+    benchmark the columnar results against hydrating entities
+
+    python benchmarks/columns.py
+"""
+import sys
+import os
+from array import array
+from timeit import repeat
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from AzureODM.Columns import EntityColumns
+from hydrate import Post, ROWS, raw_entities
+
+
+def hydrated(raws):
+    entities = Post._hydrate_many(raws)
+    return (array('d', [e.score for e in entities]),
+            array('q', [e.views for e in entities]))
+
+
+def columnar(raws):
+    columns = EntityColumns(Post)
+    columns.extend(raws)
+    return columns['score'], columns['views']
+
+
+def main():
+    raws = raw_entities()
+    for name, fn in [('hydrate + arrays', hydrated),
+                     ('EntityColumns', columnar)]:
+        best = min(repeat(lambda: fn(raws), number=1, repeat=15))
+        print('{:16} {:.1f} us/row'.format(name, best / ROWS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+    benchmark the hydration of query results against the generic path
+
+    python benchmarks/hydrate.py
+"""
+import sys
+import os
+from datetime import datetime, timezone
+from timeit import timeit
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from azure.storage import Entity as AzureTableEntity
+from AzureODM.Entity import Entity
+from AzureODM.Fields import (
+    KeyField, StringField, FloatField, IntField, BooleanField, DateField,
+    JSONField)
+
+ROWS = 10000
+
+
+class Post(Entity):
+    metas = {
+        'table_name': 'posts'
+    }
+    PartitionKey = KeyField()
+    RowKey = KeyField()
+    title = StringField()
+    score = FloatField()
+    views = IntField()
+    published = BooleanField()
+    created = DateField()
+    tags = JSONField()
+
+
+class CompactPost(Entity):
+    metas = {
+        'table_name': 'posts',
+        'compact': True
+    }
+    PartitionKey = KeyField()
+    RowKey = KeyField()
+    title = StringField()
+    score = FloatField()
+    views = IntField()
+    published = BooleanField()
+    created = DateField()
+    tags = JSONField()
+
+
+class PlainPost(Entity):
+    metas = {
+        'table_name': 'posts'
+    }
+    PartitionKey = KeyField()
+    RowKey = KeyField()
+    title = StringField()
+    score = FloatField()
+    views = IntField()
+    published = BooleanField()
+    created = DateField()
+
+
+def generic_hydrate(entity, raw_entity, is_partial=False):
+    """the generic path replaced by the generated hydrator: a new instance
+    set up like the original ``Entity.__init__`` and the loop of the
+    original ``Entity._populate_with_dict`` looking every key up in
+    :attr:`Entity._f`"""
+    self = object.__new__(entity)
+    if not isinstance(self.metas['table_name'], str):
+        raise AttributeError('no table_name meta provided')
+    if not self._table_name_re.search(self.metas['table_name']):
+        raise ValueError('table_name is not in valid format, {}'.format(
+            self.metas['table_name']))
+    d = self.__dict__
+    d['_is_new'] = True
+    d['_is_changed'] = False
+    d['_is_partial'] = False
+    d['_saved_copy'] = {}
+    d['_saved_etag'] = None
+    d['_dirty'] = None
+    d.update(dict.fromkeys(self._f))
+    dic = raw_entity
+    if not isinstance(dic, (dict, AzureTableEntity)):
+        raise TypeError('dic is not a dict, {}'.format(dic))
+    if isinstance(dic, AzureTableEntity):
+        dic = dic.__dict__
+    valid_fields_count = 0
+    etagged = False
+    for key, value in dic.items():
+        if key in self._f:
+            if self._f[key].require_serializing:
+                if isinstance(value, self._f[key].serialized_type):
+                    d[key] = self._f[key].deserialize(value)
+                else:
+                    raise TypeError('expect {}, but got {}'.format(
+                        self._f[key].serialized_type.__name__, value))
+            else:
+                if not isinstance(value, self._f[key]._type):
+                    raise TypeError('expect {} for key {}, but got {}'.format(
+                        self._f[key]._type.__name__, key,
+                        value.__class__.__name__))
+                if isinstance(value, datetime) and value.tzinfo is None:
+                    value = value.replace(tzinfo=timezone.utc)
+                d[key] = value
+                valid_fields_count += 1
+        elif key == 'etag':
+            self._saved_etag = value
+            etagged = True
+    if valid_fields_count == len(self._f):
+        self._is_partial = False
+    else:
+        self._is_partial = is_partial
+    if etagged is False:
+        self._is_changed = self._check_chagned()
+    else:
+        self._is_new = False
+        self._is_changed = False
+        for field in self._f:
+            self._saved_copy[field] = d[field]
+    return self
+
+
+def raw_entities():
+    raws = []
+    for i in range(ROWS):
+        raw = AzureTableEntity()
+        raw.PartitionKey = 'p{}'.format(i // 100)
+        raw.RowKey = 'r{}'.format(i)
+        raw.Timestamp = datetime(2014, 1, 1)
+        raw.etag = 'W/"datetime\'2014-01-01T00%3A00%3A00Z\'"'
+        raw.title = 'title {}'.format(i)
+        raw.score = i / 3
+        raw.views = i
+        raw.published = i % 2 == 0
+        raw.created = datetime(2014, 1, 1)
+        raw.tags = '["a", "b"]'
+        raws.append(raw)
+    return raws
+
+
+def timed(fns, rounds=15):
+    """the best of ``rounds`` runs of each function, in us/row, the runs
+    are interleaved so a noisy machine slows every function alike"""
+    best = dict.fromkeys(fns, float('inf'))
+    for _ in range(rounds):
+        for name, fn in fns.items():
+            best[name] = min(best[name], timeit(fn, number=1))
+    return {name: elapsed / ROWS * 1e6 for name, elapsed in best.items()}
+
+
+def main():
+    raws = raw_entities()
+    for entity, label in ((Post, 'with a JSON field'),
+                          (PlainPost, 'without a JSON field')):
+        print('{} ({} fields)'.format(label, len(entity._f)))
+        results = timed({
+            'generic': lambda: [generic_hydrate(entity, raw)
+                                for raw in raws],
+            '_hydrate': lambda: [entity._hydrate(raw) for raw in raws],
+            '_hydrate_many': lambda: entity._hydrate_many(raws),
+            'read only': lambda: entity._hydrate_many(raws, tracking=False),
+        })
+        generic = results.pop('generic')
+        print('  generic       {:.1f} us/row'.format(generic))
+        for name, elapsed in results.items():
+            print('  {:13} {:.1f} us/row, {:.1f}x'.format(
+                name, elapsed, generic / elapsed))
+    results = timed({
+        'generic': lambda: [generic_hydrate(Post, raw) for raw in raws],
+        'compact': lambda: CompactPost._hydrate_many(raws),
+    })
+    print('compact       {:.1f} us/row, {:.1f}x'.format(
+        results['compact'], results['generic'] / results['compact']))
+    for entity in (Post, CompactPost):
+        for tracking in (True, False):
+            print('{:11} tracking={!s:5} {:.0f} bytes/row'.format(
+                entity.__name__, tracking,
+                allocated(entity, raws, tracking) / ROWS))
+
+
+def allocated(entity, raws, tracking):
+    """bytes allocated by the hydrated entities"""
+    entity._hydrate_many(raws[:1], tracking=tracking)
+    tracemalloc.start()
+    entities = entity._hydrate_many(raws, tracking=tracking)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del entities
+    return size
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+    benchmark the preparation of saves (validate, serialize and check changes)
+
+    python benchmarks/serialize.py
+"""
+import sys
+import os
+from timeit import repeat
+sys.path.insert(0, os.path.dirname(__file__))
+from hydrate import Post, raw_entities, ROWS
+
+
+def main():
+    entities = [Post._hydrate(raw) for raw in raw_entities()]
+    for entity in entities:
+        entity.score += 1
+
+    def pre_save():
+        # what :func:`Entity.save` does before the request
+        for entity in entities:
+            entity_dict = entity._pre_save()
+            if entity_dict is None:
+                entity_dict = entity._to_dict()
+    elapsed = min(repeat(pre_save, number=1, repeat=15))
+    print('save preparation {:.1f} us/row'.format(elapsed / ROWS * 1e6))
+
+
+if __name__ == '__main__':
+    main()
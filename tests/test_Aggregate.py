@@ -0,0 +1,110 @@
+"""
+    test_Aggregate
+"""
+import pytest
+import asyncio
+from AzureODM.Entity import Entity
+from AzureODM.Fields import KeyField, FloatField, IntField, DateField
+from AzureODM.Aggregate import Aggregation
+
+
+@pytest.fixture()
+def fake_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol'
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        bytes = IntField()
+        latency = FloatField()
+        d = DateField()
+
+    return FakeEntity
+
+
+RAWS = [
+    {'PartitionKey': 'p1', 'RowKey': 'r1', 'bytes': 10, 'latency': 1.0},
+    {'PartitionKey': 'p1', 'RowKey': 'r2', 'bytes': 20, 'latency': 3.0},
+    {'PartitionKey': 'p2', 'RowKey': 'r1', 'bytes': 5},
+]
+
+
+class Test_Aggregation:
+
+    """test Aggregation"""
+
+    def test_fields(self, fake_entity):
+        aggregation = Aggregation(
+            fake_entity, {'sum': 'bytes', 'max': ['latency', 'bytes']},
+            group_by='PartitionKey')
+        assert aggregation.fields == ('PartitionKey', 'bytes', 'latency')
+
+    def test_raises(self, fake_entity):
+        with pytest.raises(ValueError) as e:
+            Aggregation(fake_entity, {'median': 'bytes'})
+        assert 'unknown aggregation, median' in str(e)
+        with pytest.raises(ValueError):
+            Aggregation(fake_entity, {})
+        with pytest.raises(KeyError):
+            Aggregation(fake_entity, {'sum': 'lol'})
+        with pytest.raises(KeyError):
+            Aggregation(fake_entity, {'sum': 'bytes'}, group_by='lol')
+        with pytest.raises(TypeError) as e:
+            Aggregation(fake_entity, {'avg': 'd'})
+        assert 'avg of d is not numeric' in str(e)
+        Aggregation(fake_entity, {'min': 'd', 'count': 'RowKey'})
+
+    def test_fold(self, fake_entity):
+        aggregation = Aggregation(
+            fake_entity, {'count': 'latency', 'sum': 'bytes',
+                          'min': 'latency', 'max': 'bytes', 'avg': 'latency'})
+        assert aggregation.fields == ('latency', 'bytes')
+        aggregation.add([(1.0, 10), (3.0, 20)])
+        aggregation.add([(None, 5)])
+        assert aggregation.result() == {
+            'latency__count': 2, 'bytes__sum': 35, 'latency__min': 1.0,
+            'bytes__max': 20, 'latency__avg': 2.0}
+
+    def test_empty(self, fake_entity):
+        aggregation = Aggregation(fake_entity, {'count': 'bytes',
+                                                'avg': 'bytes'})
+        assert aggregation.result() == {'bytes__count': 0,
+                                        'bytes__avg': None}
+
+    def test_group_by(self, fake_entity):
+        aggregation = Aggregation(fake_entity, {'sum': 'bytes'},
+                                  group_by=['PartitionKey', 'RowKey'])
+        aggregation.add([('p1', 'r1', 1), ('p1', 'r1', 2), ('p2', 'r1', 3)])
+        assert aggregation.result() == {('p1', 'r1'): {'bytes__sum': 3},
+                                        ('p2', 'r1'): {'bytes__sum': 3}}
+
+
+class Test_QuerySet_aggregate:
+
+    """test Entity.aggregate and QuerySet.aggregate"""
+
+    def test_aggregate(self, fake_entity, monkeypatch):
+        class TS:
+
+            def query_entities(self, **kwargs):
+                self.kwargs = kwargs
+                return RAWS
+        ts = TS()
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        result = fake_entity.select().where(PartitionKey__ge='p1').aggregate(
+            sum='bytes', max='latency', group_by='PartitionKey')
+        assert result == {
+            'p1': {'bytes__sum': 30, 'latency__max': 3.0},
+            'p2': {'bytes__sum': 5, 'latency__max': None}}
+        assert ts.kwargs['select'] == 'PartitionKey,bytes,latency'
+        assert ts.kwargs['filter'] == "PartitionKey ge 'p1'"
+
+    def test_aaggregate(self, fake_entity, monkeypatch):
+        class ATS:
+
+            async def query_entities(self, **kwargs):
+                return RAWS
+        monkeypatch.setattr('AzureODM.Entity.get_async_table_service', ATS)
+        result = asyncio.run(fake_entity.select().aaggregate(avg='bytes'))
+        assert result == {'bytes__avg': 35 / 3}
@@ -0,0 +1,170 @@
+"""
+    test_AsyncService
+"""
+import pytest
+import asyncio
+import base64
+from azure import WindowsAzureMissingResourceError
+from azure.storage import TableService
+from AzureODM.AsyncService import AsyncTableService
+
+ENTITY_XML = (
+    b'<?xml version="1.0" encoding="utf-8" standalone="yes"?>'
+    b'<entry xmlns:d="http://schemas.microsoft.com/ado/2007/08/dataservices"'
+    b' xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/'
+    b'metadata" m:etag="W/&quot;datetime\'2014\'&quot;"'
+    b' xmlns="http://www.w3.org/2005/Atom">'
+    b'<id>x</id><title /><updated>2014-01-01T00:00:00Z</updated>'
+    b'<author><name /></author><content type="application/xml">'
+    b'<m:properties><d:PartitionKey>p1</d:PartitionKey>'
+    b'<d:RowKey>r1</d:RowKey><d:f m:type="Edm.Double">1.5</d:f>'
+    b'</m:properties></content></entry>')
+
+
+class FakeServer:
+
+    """a keep-alive HTTP/1.1 server replying with ``responses``"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.requests = []
+        self.connections = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self.serve, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve(self, reader, writer):
+        self.connections += 1
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line == b'\r\n':
+                    break
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(
+                int(headers.get('content-length', 0)))
+            self.requests.append((request_line.decode(), headers, body))
+            status, response_headers, response_body = self.handler(
+                request_line.decode())
+            await asyncio.sleep(0.01)
+            writer.write(
+                'HTTP/1.1 {}\r\n'.format(status).encode() +
+                ''.join('{}: {}\r\n'.format(k, v)
+                        for k, v in response_headers).encode() +
+                'Content-Length: {}\r\n\r\n'.format(
+                    len(response_body)).encode() +
+                response_body)
+            await writer.drain()
+        writer.close()
+
+
+def make_ats(port):
+    ts = TableService('acc', base64.b64encode(b'key').decode(),
+                      protocol='http')
+    ts._get_host = lambda: '127.0.0.1:{}'.format(port)
+    return AsyncTableService(ts)
+
+
+def run(handler, coroutine_fn):
+    async def main():
+        server = FakeServer(handler)
+        port = await server.start()
+        ats = make_ats(port)
+        try:
+            return server, await coroutine_fn(ats)
+        finally:
+            await ats.close()
+            server.server.close()
+    return asyncio.run(main())
+
+
+class Test_AsyncTableService:
+
+    """test AsyncTableService"""
+
+    def test_get_entity(self):
+        def handler(request_line):
+            return '200 OK', [('Content-Type', 'application/atom+xml')], \
+                ENTITY_XML
+
+        server, entity = run(handler, lambda ats: ats.get_entity(
+            table_name='lolol', partition_key='p1', row_key='r1', select=''))
+        assert entity.PartitionKey == 'p1'
+        assert entity.f == 1.5
+        assert entity.etag == 'W/"datetime\'2014\'"'
+        request_line, headers, _ = server.requests[0]
+        assert request_line.startswith(
+            "GET /lolol(PartitionKey='p1',RowKey='r1')")
+        assert headers['authorization'].startswith('SharedKey acc:')
+        assert headers['user-agent'] == 'pyazure/0.8.0'
+
+    def test_merge_entity_return_etag(self):
+        def handler(request_line):
+            return '204 No Content', [('ETag', 'W/"new"')], b''
+
+        server, result = run(handler, lambda ats: ats.merge_entity(
+            table_name='lolol', partition_key='p1', row_key='r1',
+            entity={'PartitionKey': 'p1', 'RowKey': 'r1', 'f': 1.5}))
+        assert result == {'etag': 'W/"new"'}
+        request_line, headers, body = server.requests[0]
+        assert request_line.startswith('MERGE ')
+        assert int(headers['content-length']) == len(body)
+
+    def test_raise_WindowsAzureMissingResourceError(self):
+        def handler(request_line):
+            return '404 Not Found', [], b'not found'
+
+        with pytest.raises(WindowsAzureMissingResourceError):
+            run(handler, lambda ats: ats.get_entity(
+                table_name='lolol', partition_key='p1', row_key='r1'))
+
+    def test_concurrent_requests_reuse_connections(self):
+        def handler(request_line):
+            return '200 OK', [], ENTITY_XML
+
+        async def many(ats):
+            ats.max_connections = 5
+            await asyncio.gather(*[ats.get_entity(
+                table_name='lolol', partition_key='p1', row_key=str(i))
+                for i in range(20)])
+            # the second round should only use the idle connections
+            await asyncio.gather(*[ats.get_entity(
+                table_name='lolol', partition_key='p1', row_key=str(i))
+                for i in range(5)])
+
+        server, _ = run(handler, many)
+        assert len(server.requests) == 25
+        assert server.connections == 5
+
+    def test_close_connection_if_cancelled(self, monkeypatch):
+        from AzureODM import AsyncService
+        connect = AsyncService._connect
+        writers = []
+
+        async def recorded_connect(idle, key):
+            reader, writer, reused = await connect(idle, key)
+            writers.append(writer)
+            return reader, writer, reused
+        monkeypatch.setattr(AsyncService, '_connect', recorded_connect)
+
+        def handler(request_line):
+            return '200 OK', [], ENTITY_XML
+
+        async def cancelled(ats):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(ats.get_entity(
+                    table_name='lolol', partition_key='p1', row_key='r1'),
+                    timeout=0.005)
+            return ats._get_pool()[1]
+
+        server, idle = run(handler, cancelled)
+        assert len(writers) == 1
+        assert writers[0].is_closing()
+        assert sum(len(connections) for connections in idle.values()) == 0
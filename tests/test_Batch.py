@@ -0,0 +1,297 @@
+"""
+    test_Batch
+"""
+import pytest
+from AzureODM.Batch import (
+    BatchWriter, BatchError, _parse_batch_response, MAX_BATCH_SIZE)
+from AzureODM.Entity import Entity
+from AzureODM.Fields import KeyField, FloatField
+from azure import WindowsAzureConflictError
+
+SUCCESS_BODY = """--batchresponse_1
+Content-Type: multipart/mixed; boundary=changesetresponse_1
+
+--changesetresponse_1
+Content-Type: application/http
+Content-Transfer-Encoding: binary
+
+HTTP/1.1 201 Created
+Content-ID: 1
+ETag: W/"datetime'2014-01-01T00%3A00%3A00.1Z'"
+
+--changesetresponse_1
+Content-Type: application/http
+Content-Transfer-Encoding: binary
+
+HTTP/1.1 204 No Content
+Content-ID: 2
+ETag: W/"datetime'2014-01-01T00%3A00%3A00.2Z'"
+
+--changesetresponse_1--
+--batchresponse_1--
+"""
+
+FAILED_BODY = """--batchresponse_1
+Content-Type: multipart/mixed; boundary=changesetresponse_1
+
+--changesetresponse_1
+Content-Type: application/http
+Content-Transfer-Encoding: binary
+
+HTTP/1.1 409 Conflict
+Content-ID: 2
+
+<?xml version="1.0" encoding="utf-8" standalone="yes"?>
+<error><code>EntityAlreadyExists</code>
+<message xml:lang="en-US">1:The specified entity already exists.</message>
+</error>
+--changesetresponse_1--
+--batchresponse_1--
+"""
+
+
+class FakeBatchClient:
+
+    """return the response body like
+    :func:`azure.storage.batchclient._BatchClient.commit_batch_requests`"""
+
+    def __init__(self, ts):
+        self.ts = ts
+
+    def commit_batch_requests(self):
+        if len(self.ts.bodies) > 0:
+            return self.ts.bodies.pop(0).encode('utf-8')
+        return self.ts._success_body(len(self.ts.batches[-1])).encode(
+            'utf-8')
+
+
+class FakeTS:
+
+    """record the batches, every operation returns None like the SDK does
+    when a batch is started, copies share the records"""
+
+    def __init__(self, bodies=None):
+        self.batches = []
+        self.bodies = bodies or []
+        #: the services the operations are sent to
+        self.services = []
+        self._batchclient = None
+
+    def begin_batch(self):
+        assert self._batchclient is None
+        self._batchclient = FakeBatchClient(self)
+        self.batches.append([])
+
+    def commit_batch(self):
+        # the SDK drops the response body
+        self._batchclient.commit_batch_requests()
+        self._batchclient = None
+
+    def cancel_batch(self):
+        self._batchclient = None
+
+    def _success_body(self, count):
+        body = ''
+        for i in range(count):
+            body += 'HTTP/1.1 204 No Content\nETag: etag{}\n'.format(i)
+        return body
+
+    def _record(self, name, kwargs):
+        assert self._batchclient is not None
+        self.services.append(self)
+        self.batches[-1].append((name, kwargs['entity']['RowKey']))
+
+    def insert_entity(self, **kwargs):
+        self._record('insert', kwargs)
+
+    def insert_or_replace_entity(self, **kwargs):
+        self._record('insert_or_replace', kwargs)
+
+    def insert_or_merge_entity(self, **kwargs):
+        self._record('insert_or_merge', kwargs)
+
+    def merge_entity(self, **kwargs):
+        self._record('merge', kwargs)
+
+    def update_entity(self, **kwargs):
+        self._record('replace', kwargs)
+
+
+@pytest.fixture()
+def fake_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol'
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        f = FloatField()
+
+    return FakeEntity
+
+
+class Test__parse_batch_response:
+
+    """test _parse_batch_response"""
+
+    def test_empty(self):
+        assert _parse_batch_response(b'') == []
+
+    def test_success(self):
+        responses = _parse_batch_response(SUCCESS_BODY.encode('utf-8'))
+        assert responses == [
+            (201, 'W/"datetime\'2014-01-01T00%3A00%3A00.1Z\'"', None),
+            (204, 'W/"datetime\'2014-01-01T00%3A00%3A00.2Z\'"', None)
+        ]
+
+    def test_failed(self):
+        responses = _parse_batch_response(FAILED_BODY)
+        assert responses == [
+            (409, None, '1:The specified entity already exists.')
+        ]
+
+
+class Test_BatchWriter:
+
+    """test BatchWriter"""
+
+    def test_raises_if_mode_invalid(self):
+        with pytest.raises(ValueError) as e:
+            BatchWriter(mode='upsert', ts=FakeTS())
+        assert 'invalid mode, upsert' in str(e)
+
+    def test_group_by_PartitionKey(self, fake_entity):
+        ts = FakeTS()
+        with BatchWriter(ts=ts) as writer:
+            writer.save(fake_entity(PartitionKey='p1', RowKey='r1'))
+            writer.save(fake_entity(PartitionKey='p2', RowKey='r1'))
+            writer.save(fake_entity(PartitionKey='p1', RowKey='r2'))
+        assert ts.batches == [
+            [('insert', 'r1'), ('insert', 'r2')],
+            [('insert', 'r1')]
+        ]
+
+    def test_batch_on_a_copy_of_ts(self, fake_entity):
+        ts = FakeTS()
+        with BatchWriter(ts=ts) as writer:
+            writer.save(fake_entity(PartitionKey='p1', RowKey='r1'))
+            writer.save(fake_entity(PartitionKey='p2', RowKey='r1'))
+        # the shared service never starts a batch
+        assert ts._batchclient is None
+        assert len(ts.services) == 2
+        assert ts not in ts.services
+        assert ts.services[0] is not ts.services[1]
+
+    def test_chunk_by_MAX_BATCH_SIZE(self, fake_entity):
+        ts = FakeTS()
+        with BatchWriter(ts=ts) as writer:
+            for i in range(MAX_BATCH_SIZE + 1):
+                writer.save(fake_entity(PartitionKey='p1', RowKey=str(i)))
+            # the first chunk is committed without waiting for flush
+            assert len(ts.batches) == 1
+        assert [len(b) for b in ts.batches] == [MAX_BATCH_SIZE, 1]
+
+    def test_duplicated_RowKey_starts_new_batch(self, fake_entity):
+        ts = FakeTS()
+        with BatchWriter(mode='insert_or_replace', ts=ts) as writer:
+            writer.save(fake_entity(PartitionKey='p1', RowKey='r1'))
+            writer.save(fake_entity(PartitionKey='p1', RowKey='r1'))
+        assert ts.batches == [
+            [('insert_or_replace', 'r1')],
+            [('insert_or_replace', 'r1')]
+        ]
+
+    def test_keep_save_operation(self, fake_entity):
+        ts = FakeTS()
+        saved = fake_entity(PartitionKey='p1', RowKey='r2', f=1.0)
+        saved._after_save({'etag': 'old'})
+        saved.f = 2.0
+        unchanged = fake_entity(PartitionKey='p1', RowKey='r3', f=1.0)
+        unchanged._after_save({'etag': 'old'})
+        with BatchWriter(ts=ts) as writer:
+            assert writer.save(
+                fake_entity(PartitionKey='p1', RowKey='r1')) is True
+            assert writer.save(saved) is True
+            assert writer.save(unchanged) is False
+        assert ts.batches == [[('insert', 'r1'), ('replace', 'r2')]]
+
+    def test_after_save_update_status(self, fake_entity):
+        ts = FakeTS(bodies=[SUCCESS_BODY])
+        e1 = fake_entity(PartitionKey='p1', RowKey='r1', f=1.0)
+        e2 = fake_entity(PartitionKey='p1', RowKey='r2', f=2.0)
+        with BatchWriter(ts=ts) as writer:
+            writer.save(e1)
+            writer.save(e2)
+        assert e1._is_new is False
+        assert e1._is_changed is False
+        assert e1._saved_etag == 'W/"datetime\'2014-01-01T00%3A00%3A00.1Z\'"'
+        assert e1._saved_copy['f'] == 1.0
+        assert e2._saved_etag == 'W/"datetime\'2014-01-01T00%3A00%3A00.2Z\'"'
+
+    def test_raises_BatchError_with_failures(self, fake_entity):
+        ts = FakeTS(bodies=[FAILED_BODY])
+        e1 = fake_entity(PartitionKey='p1', RowKey='r1')
+        e2 = fake_entity(PartitionKey='p1', RowKey='r2')
+        with pytest.raises(BatchError) as e:
+            with BatchWriter(ts=ts) as writer:
+                writer.save(e1)
+                writer.save(e2)
+        failures = e.value.failures
+        assert [f[0] for f in failures] == [e1, e2]
+        assert isinstance(failures[0][1], WindowsAzureConflictError)
+        assert '1:The specified entity already exists.' in str(failures[0][1])
+        assert e1._is_new is True
+        assert e2._is_new is True
+
+    def test_exception_in_block_discards_pending(self, fake_entity):
+        ts = FakeTS()
+        with pytest.raises(MemoryError):
+            with BatchWriter(ts=ts) as writer:
+                writer.save(fake_entity(PartitionKey='p1', RowKey='r1'))
+                raise MemoryError('lol')
+        assert ts.batches == []
+
+    def test_validate_before_queue(self, fake_entity):
+        ts = FakeTS()
+        with pytest.raises(TypeError):
+            with BatchWriter(ts=ts) as writer:
+                writer.save(fake_entity(PartitionKey='p1', RowKey='r1',
+                                        f='1'))
+        assert ts.batches == []
+
+
+class Test_Entity_save_many:
+
+    """test Entity.save_many"""
+
+    def test_return_results_in_order(self, fake_entity):
+        ts = FakeTS()
+        unchanged = fake_entity(PartitionKey='p1', RowKey='r3')
+        unchanged._after_save({'etag': 'old'})
+        entities = [
+            fake_entity(PartitionKey='p1', RowKey='r1'),
+            unchanged,
+            fake_entity(PartitionKey='p2', RowKey='r2'),
+        ]
+        results = fake_entity.save_many(entities, ts=ts)
+        assert results == [True, False, True]
+        assert entities[0]._saved_etag == 'etag0'
+        assert entities[2]._saved_etag == 'etag0'
+
+    def test_mode(self, fake_entity):
+        ts = FakeTS()
+        fake_entity.save_many(
+            [fake_entity(PartitionKey='p1', RowKey='r1')],
+            mode='insert_or_merge', ts=ts)
+        assert ts.batches == [[('insert_or_merge', 'r1')]]
+
+    def test_raises_BatchError_with_results(self, fake_entity):
+        ts = FakeTS(bodies=[FAILED_BODY])
+        entities = [
+            fake_entity(PartitionKey='p1', RowKey='r1'),
+            fake_entity(PartitionKey='p2', RowKey='r2'),
+        ]
+        with pytest.raises(BatchError) as e:
+            fake_entity.save_many(entities, ts=ts)
+        assert e.value.results == [False, True]
+        assert len(e.value.failures) == 1
@@ -0,0 +1,397 @@
+"""
+    test_Cache
+"""
+import pytest
+import asyncio
+from azure import WindowsAzureMissingResourceError, WindowsAzureConflictError
+from AzureODM.Entity import Entity
+from AzureODM.Fields import KeyField, FloatField, StringField
+from AzureODM.Cache import EntityCache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTS:
+
+    """stores raw entities, bumps the etag on every write"""
+
+    def __init__(self):
+        self.calls = []
+        self.stored = {}
+        self.version = 0
+
+    def put(self, entity):
+        self.version += 1
+        raw = dict(entity, etag='e{}'.format(self.version))
+        self.stored[(raw['PartitionKey'], raw['RowKey'])] = raw
+        return raw['etag']
+
+    def get_entity(self, **kwargs):
+        self.calls.append(('get_entity', kwargs))
+        key = (kwargs['partition_key'], kwargs['row_key'])
+        if key not in self.stored:
+            raise WindowsAzureMissingResourceError('not found')
+        raw = self.stored[key]
+        if kwargs['select'] != '*':
+            return {'PartitionKey': key[0], 'etag': raw['etag']}
+        return dict(raw)
+
+    def update_entity(self, **kwargs):
+        self.calls.append(('update_entity', kwargs))
+        return {'etag': self.put(kwargs['entity'])}
+
+    def merge_entity(self, **kwargs):
+        self.calls.append(('merge_entity', kwargs))
+        key = (kwargs['partition_key'], kwargs['row_key'])
+        merged = dict(self.stored[key])
+        merged.update((k, v) for k, v in kwargs['entity'].items()
+                      if v is not None)
+        return {'etag': self.put(merged)}
+
+    def delete_entity(self, **kwargs):
+        self.calls.append(('delete_entity', kwargs))
+        del self.stored[(kwargs['partition_key'], kwargs['row_key'])]
+
+
+class FakeATS:
+
+    def __init__(self, ts):
+        self.ts = ts
+
+    async def get_entity(self, **kwargs):
+        return self.ts.get_entity(**kwargs)
+
+    async def delete_entity(self, **kwargs):
+        return self.ts.delete_entity(**kwargs)
+
+
+@pytest.fixture()
+def clock():
+    return Clock()
+
+
+@pytest.fixture()
+def fake_entity(clock):
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol',
+            'cache': {'max_size': 2, 'ttl': 10, 'clock': clock}
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        f = FloatField()
+
+    return FakeEntity
+
+
+@pytest.fixture()
+def ts():
+    ts = FakeTS()
+    ts.put({'PartitionKey': 'p1', 'RowKey': 'r1', 'f': 1.0})
+    ts.put({'PartitionKey': 'p1', 'RowKey': 'r2', 'f': 2.0})
+    ts.put({'PartitionKey': 'p1', 'RowKey': 'r3', 'f': 3.0})
+    return ts
+
+
+def get_calls(ts):
+    return [kwargs['select'] for name, kwargs in ts.calls
+            if name == 'get_entity']
+
+
+class Test_EntityCache:
+
+    """test EntityCache"""
+
+    def test_invalid_args(self):
+        with pytest.raises(TypeError):
+            EntityCache(max_size='1')
+        with pytest.raises(ValueError):
+            EntityCache(max_size=0)
+        with pytest.raises(TypeError):
+            EntityCache(ttl='1')
+
+    def test_lru_eviction(self):
+        cache = EntityCache(max_size=2)
+        cache.set('a', {'etag': 'a'})
+        cache.set('b', {'etag': 'b'})
+        # ``a`` becomes the most recently used
+        assert cache.get('a') == ({'etag': 'a'}, False)
+        cache.set('c', {'etag': 'c'})
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert len(cache) == 2
+
+    def test_ttl(self, clock):
+        cache = EntityCache(ttl=10, clock=clock)
+        cache.set('a', {'etag': 'a'})
+        clock.now = 9.9
+        assert cache.get('a') == ({'etag': 'a'}, False)
+        clock.now = 10
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_revalidate_keep_expired(self, clock):
+        cache = EntityCache(ttl=10, revalidate=True, clock=clock)
+        cache.set('a', {'etag': 'a'})
+        clock.now = 10
+        assert cache.get('a') == ({'etag': 'a'}, True)
+        cache.touch('a')
+        assert cache.get('a') == ({'etag': 'a'}, False)
+
+    def test_evict_clear(self):
+        cache = EntityCache()
+        cache.set('a', {'etag': 'a'})
+        cache.set('b', {'etag': 'b'})
+        cache.evict('a')
+        cache.evict('missing')
+        assert cache.get('a') is None
+        cache.clear()
+        assert len(cache) == 0
+
+
+class Test_Entity_cache:
+
+    """test the cache of Entity.findOne"""
+
+    def test_disabled_by_default(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+        assert FakeEntity._get_cache() is None
+
+    def test_cache_per_class(self, fake_entity):
+        cache = fake_entity._get_cache()
+        assert isinstance(cache, EntityCache)
+        assert cache.max_size == 2
+        assert fake_entity._get_cache() is cache
+
+    def test_pluggable(self):
+        cache = EntityCache()
+
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol',
+                'cache': cache
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+        assert FakeEntity._get_cache() is cache
+
+    def test_hit(self, fake_entity, ts):
+        e1 = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        e2 = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert get_calls(ts) == ['*']
+        assert e1 is not e2
+        assert e2.f == 1.0
+        assert e2._is_new is False
+        assert e2._is_changed is False
+        assert e2._saved_etag == 'e1'
+        # changing an instance doesn't change the cached copy
+        e2.f = 5.0
+        e3 = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert e3.f == 1.0
+
+    def test_hit_with_unset_field(self, clock, ts):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol',
+                'cache': {'ttl': 10, 'clock': clock}
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f = FloatField()
+            note = StringField()
+        FakeEntity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        entity = FakeEntity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert get_calls(ts) == ['*']
+        assert entity.f == 1.0
+        assert entity.note is None
+
+    def test_select_not_cached(self, fake_entity, ts):
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        fake_entity.findOne(partition_key='p1', row_key='r1', select='f',
+                            ts=ts)
+        assert get_calls(ts) == ['*', 'f']
+
+    def test_missing_not_cached(self, fake_entity, ts):
+        assert fake_entity.findOne(
+            partition_key='p1', row_key='missing', ts=ts) is None
+        assert len(fake_entity._get_cache()) == 0
+
+    def test_lru_and_ttl(self, fake_entity, ts, clock):
+        for row_key in ('r1', 'r2', 'r3'):
+            fake_entity.findOne(partition_key='p1', row_key=row_key, ts=ts)
+        # r1 was evicted
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert get_calls(ts) == ['*'] * 4
+        clock.now = 10
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert get_calls(ts) == ['*'] * 5
+
+    def test_revalidate_unchanged(self, fake_entity, ts, clock):
+        fake_entity._get_cache().revalidate = True
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        clock.now = 10
+        entity = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert entity.f == 1.0
+        assert get_calls(ts) == ['*', 'PartitionKey']
+        # fresh again
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert get_calls(ts) == ['*', 'PartitionKey']
+
+    def test_revalidate_changed(self, fake_entity, ts, clock):
+        fake_entity._get_cache().revalidate = True
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        ts.put({'PartitionKey': 'p1', 'RowKey': 'r1', 'f': 9.0})
+        clock.now = 10
+        entity = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert entity.f == 9.0
+        assert get_calls(ts) == ['*', 'PartitionKey', '*']
+
+    def test_save_update_cache(self, fake_entity, ts, monkeypatch):
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        entity = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        entity.f = 7.0
+        assert entity.save() is True
+        cached = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert cached.f == 7.0
+        assert cached._saved_etag == entity._saved_etag
+        assert get_calls(ts) == ['*']
+
+    def test_save_with_none_evict(self, fake_entity, ts):
+        entity = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        entity.f = None
+        entity._after_save({'etag': 'lol'})
+        assert fake_entity._get_cache().get(('p1', 'r1')) is None
+
+    def test_partial_save_evict(self, fake_entity, ts):
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        partial = fake_entity.findOne(partition_key='p1', row_key='r1',
+                                      select='f', ts=ts)
+        assert partial._is_partial is True
+        partial._after_save({'etag': 'lol'})
+        assert fake_entity._get_cache().get(('p1', 'r1')) is None
+
+    def test_delete_evict(self, fake_entity, ts):
+        entity = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        entity.delete(ts=ts)
+        assert fake_entity.findOne(
+            partition_key='p1', row_key='r1', ts=ts) is None
+        assert get_calls(ts) == ['*', '*']
+
+    def test_async(self, fake_entity, ts, clock):
+        fake_entity._get_cache().revalidate = True
+        ats = FakeATS(ts)
+
+        async def main():
+            e1 = await fake_entity.afindOne(
+                partition_key='p1', row_key='r1', ts=ats)
+            e2 = await fake_entity.afindOne(
+                partition_key='p1', row_key='r1', ts=ats)
+            clock.now = 10
+            e3 = await fake_entity.afindOne(
+                partition_key='p1', row_key='r1', ts=ats)
+            await e3.adelete(ts=ats)
+            return e1, e2, e3
+        e1, e2, e3 = asyncio.run(main())
+        assert e1 is not e2
+        assert e3.f == 1.0
+        assert get_calls(ts) == ['*', 'PartitionKey']
+        assert len(fake_entity._get_cache()) == 0
+
+
+class Test_Entity_negative_cache:
+
+    """test caching the keys not found"""
+
+    @pytest.fixture()
+    def fake_entity(self, clock):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol',
+                'cache': {'ttl': 10, 'negative_ttl': 1, 'clock': clock}
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f = FloatField()
+
+        return FakeEntity
+
+    def test_invalid_negative_ttl(self):
+        with pytest.raises(TypeError):
+            EntityCache(negative_ttl='1')
+
+    def test_set_missing(self, clock):
+        cache = EntityCache(revalidate=True, negative_ttl=1, clock=clock)
+        cache.set_missing('a')
+        assert cache.get('a') == (None, False)
+        cache.touch('a')
+        clock.now = 1
+        # never revalidated
+        assert cache.get('a') is None
+        EntityCache().set_missing('a')
+
+    def test_missing_cached(self, fake_entity, ts, clock):
+        for _ in range(3):
+            assert fake_entity.findOne(
+                partition_key='p1', row_key='missing', ts=ts) is None
+        assert get_calls(ts) == ['*']
+        clock.now = 1
+        fake_entity.findOne(partition_key='p1', row_key='missing', ts=ts)
+        assert get_calls(ts) == ['*', '*']
+
+    @pytest.mark.parametrize('operation', [
+        'insert', 'insert_or_replace', 'insert_or_merge'])
+    def test_insert_evict(self, fake_entity, ts, operation):
+        fake_entity.findOne(partition_key='p1', row_key='new', ts=ts)
+
+        def save(**kwargs):
+            return {'etag': ts.put(kwargs['entity'])}
+        setattr(ts, operation + '_entity', save)
+        entity = fake_entity(PartitionKey='p1', RowKey='new', f=4.0)
+        getattr(entity, 'save_' + operation)(ts=ts)
+        found = fake_entity.findOne(partition_key='p1', row_key='new', ts=ts)
+        assert found.f == 4.0
+        assert get_calls(ts) == ['*', '*']
+
+    def test_insert_conflict_evict(self, fake_entity, ts):
+        fake_entity._get_cache().set_missing(('p1', 'r1'))
+
+        def insert_entity(**kwargs):
+            raise WindowsAzureConflictError('lol')
+        ts.insert_entity = insert_entity
+        entity = fake_entity(PartitionKey='p1', RowKey='r1', f=4.0)
+        with pytest.raises(WindowsAzureConflictError):
+            entity.save_insert(ts=ts)
+        assert fake_entity.findOne(
+            partition_key='p1', row_key='r1', ts=ts).f == 1.0
+
+    def test_revalidate_deleted(self, fake_entity, ts, clock):
+        fake_entity._get_cache().revalidate = True
+        fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        del ts.stored[('p1', 'r1')]
+        clock.now = 10
+        for _ in range(2):
+            assert fake_entity.findOne(
+                partition_key='p1', row_key='r1', ts=ts) is None
+        assert get_calls(ts) == ['*', 'PartitionKey']
+
+    def test_async(self, fake_entity, ts):
+        ats = FakeATS(ts)
+
+        async def main():
+            for _ in range(2):
+                assert await fake_entity.afindOne(
+                    partition_key='p1', row_key='missing', ts=ats) is None
+        asyncio.run(main())
+        assert get_calls(ts) == ['*']
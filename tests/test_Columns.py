@@ -0,0 +1,168 @@
+"""
+    test_Columns
+"""
+import pytest
+import asyncio
+from array import array
+from datetime import datetime, timezone
+from azure import HeaderDict
+from azure.storage import Entity as AzureTableEntity
+from AzureODM.Entity import Entity
+from AzureODM.Fields import (
+    KeyField, StringField, FloatField, IntField, BooleanField, DateField,
+    JSONField)
+from AzureODM.Columns import EntityColumns
+
+
+@pytest.fixture()
+def fake_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol'
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        s = StringField()
+        f = FloatField()
+        i = IntField()
+        b = BooleanField()
+        d = DateField()
+        j = JSONField()
+
+    return FakeEntity
+
+
+def raw(row_key, **kwargs):
+    dic = {'PartitionKey': 'p1', 'RowKey': row_key, 's': 'lol', 'f': 1.5,
+           'i': 2, 'b': True, 'd': datetime(1970, 1, 1, 0, 0, 1),
+           'j': '[1]', 'etag': 'e', 'Timestamp': datetime(2014, 1, 1)}
+    dic.update(kwargs)
+    return dic
+
+
+class FakePage(list):
+
+    """a page returned by query_entities with continuation tokens"""
+
+    def __init__(self, entities, next_row_key=None):
+        super().__init__(entities)
+        if next_row_key is not None:
+            self.x_ms_continuation = HeaderDict({
+                'nextpartitionkey': 'p1',
+                'nextrowkey': next_row_key
+            })
+
+
+class FakeTS:
+
+    def __init__(self):
+        self.calls = []
+
+    def query_entities(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs['next_partition_key'] is None:
+            return FakePage([raw('r1'), raw('r2')], 'r3')
+        return FakePage([raw('r3', f=None)])
+
+
+class FakeATS(FakeTS):
+
+    async def query_entities(self, **kwargs):
+        return super().query_entities(**kwargs)
+
+
+class Test_EntityColumns:
+
+    """test EntityColumns"""
+
+    def test_storage(self, fake_entity):
+        columns = EntityColumns(fake_entity)
+        assert columns.fields == (
+            'PartitionKey', 'RowKey', 's', 'f', 'i', 'b', 'd', 'j')
+        assert columns['f'].typecode == 'd'
+        assert columns['i'].typecode == 'q'
+        assert columns['b'].typecode == 'b'
+        assert columns['d'].typecode == 'q'
+        assert columns['s'] == []
+        assert columns['j'] == []
+        assert len(columns) == 0
+
+    def test_undefined_field(self, fake_entity):
+        with pytest.raises(KeyError) as e:
+            EntityColumns(fake_entity, fields=['PartitionKey', 'lol'])
+        assert 'field is not defined, lol' in str(e)
+
+    def test_extend(self, fake_entity):
+        columns = EntityColumns(fake_entity)
+        azure_entity = AzureTableEntity()
+        azure_entity.__dict__.update(raw('r2', f=None, s=None))
+        columns.extend([raw('r1'), azure_entity])
+        columns.extend([raw('r3', d=datetime(
+            1970, 1, 1, 0, 0, 2, tzinfo=timezone.utc))])
+        assert len(columns) == 3
+        assert columns['RowKey'] == ['r1', 'r2', 'r3']
+        assert columns['f'] == array('d', [1.5, 0.0, 1.5])
+        assert columns.validity('f') == bytearray([1, 0, 1])
+        assert columns['s'] == ['lol', None, 'lol']
+        assert columns['s'][0] is columns['s'][2]
+        assert columns['i'] == array('q', [2, 2, 2])
+        assert columns['b'] == array('b', [1, 1, 1])
+        assert columns['d'] == array('q', [1000000, 1000000, 2000000])
+        assert columns['j'] == [[1], [1], [1]]
+
+    def test_type_error(self, fake_entity):
+        columns = EntityColumns(fake_entity)
+        with pytest.raises(TypeError) as e:
+            columns.extend([raw('r1', f='1.5')])
+        assert 'expect float for key f, but got str' in str(e)
+        with pytest.raises(TypeError) as e:
+            columns.extend([raw('r1', j=1)])
+        assert 'expect value to be str for deserialization' in str(e)
+        with pytest.raises(TypeError) as e:
+            columns.extend(['lol'])
+        assert 'dic is not a dict' in str(e)
+
+    def test_to_numpy(self, fake_entity):
+        numpy = pytest.importorskip('numpy')
+        columns = EntityColumns(fake_entity)
+        columns.extend([raw('r1'), raw('r2', f=None)])
+        assert columns.to_numpy('f').tolist() == [1.5, 0.0]
+        assert columns.to_numpy('f', masked=True).count() == 1
+        assert columns.to_numpy('d')[0] == numpy.datetime64(
+            '1970-01-01T00:00:01')
+        assert columns.to_numpy('j').dtype == object
+
+
+class Test_Entity_columns:
+
+    """test Entity.columns and QuerySet.to_columns"""
+
+    def test_follow_continuation(self, fake_entity):
+        ts = FakeTS()
+        columns = fake_entity.columns(page_size=2, ts=ts)
+        assert len(ts.calls) == 2
+        assert columns['RowKey'] == ['r1', 'r2', 'r3']
+        assert columns.validity('f') == bytearray([1, 1, 0])
+
+    def test_select(self, fake_entity):
+        ts = FakeTS()
+        columns = fake_entity.columns(select='PartitionKey,RowKey, f',
+                                      ts=ts)
+        assert columns.fields == ('PartitionKey', 'RowKey', 'f')
+        assert ts.calls[0]['select'] == 'PartitionKey,RowKey, f'
+
+    def test_queryset(self, fake_entity, monkeypatch):
+        ts = FakeTS()
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        columns = fake_entity.select(['i']).where(
+            PartitionKey='p1').limit(2).to_columns(prefetch=1)
+        assert columns.fields == ('i', 'PartitionKey', 'RowKey')
+        assert ts.calls[0]['filter'] == "PartitionKey eq 'p1'"
+        assert len(columns) == 2
+
+    def test_async(self, fake_entity, monkeypatch):
+        ts = FakeATS()
+        monkeypatch.setattr('AzureODM.Entity.get_async_table_service',
+                            lambda: ts)
+        columns = asyncio.run(fake_entity.select().ato_columns())
+        assert columns['RowKey'] == ['r1', 'r2', 'r3']
@@ -0,0 +1,258 @@
+"""
+    test_Compiler
+"""
+import pytest
+from datetime import datetime, timezone
+from azure.storage import Entity as AzureTableEntity
+from AzureODM.Entity import Entity
+from AzureODM.Fields import (
+    GenericField, KeyField, FloatField, DateField, JSONField)
+from AzureODM.Compiler import compile_populator, compile_projector
+
+
+@pytest.fixture()
+def fake_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol'
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        f = FloatField()
+        d = DateField()
+        j = JSONField()
+        g = GenericField(_type=object)
+
+    return FakeEntity
+
+
+def raw(**kwargs):
+    dic = {'PartitionKey': 'p1', 'RowKey': 'r1', 'f': 1.5,
+           'd': datetime(2014, 1, 1), 'j': '{"a": 1}', 'g': 'lol',
+           'etag': 'e1', 'Timestamp': datetime(2014, 1, 2)}
+    dic.update(kwargs)
+    return dic
+
+
+class Test_compile_populator:
+
+    """test compile_populator"""
+
+    def test_populators_compiled_once(self, fake_entity):
+        assert fake_entity._populators is None
+        populators = fake_entity._get_populators()
+        assert fake_entity._get_populators() is populators
+        fake_entity()._cache_fields(re_cache=True)
+        assert fake_entity._populators is None
+
+    def test_raises_schema_error(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+        with pytest.raises(AttributeError):
+            FakeEntity._hydrate_many([raw()])
+
+    def test_hydrate_many(self, fake_entity):
+        azure_entity = AzureTableEntity()
+        azure_entity.__dict__.update(raw(RowKey='r2'))
+        entities = fake_entity._hydrate_many([raw(), azure_entity])
+        assert [e.RowKey for e in entities] == ['r1', 'r2']
+        e = entities[0]
+        assert isinstance(e, fake_entity)
+        assert e.f == 1.5
+        assert e.d == datetime(2014, 1, 1, tzinfo=timezone.utc)
+        assert e.j == {'a': 1}
+        assert e.g == 'lol'
+        assert e._saved_etag == 'e1'
+        assert e._is_new is False
+        assert e._is_changed is False
+        assert e._is_partial is False
+        assert e._saved_copy == {
+            'PartitionKey': 'p1', 'RowKey': 'r1', 'f': 1.5,
+            'd': datetime(2014, 1, 1, tzinfo=timezone.utc), 'j': {'a': 1},
+            'g': 'lol'}
+        assert e._saved_copy is not entities[1]._saved_copy
+        assert not hasattr(e, 'Timestamp')
+
+    def test_same_as_populate_with_dict(self, fake_entity):
+        for dic, is_partial in [(raw(), False),
+                                (raw(), True),
+                                ({'PartitionKey': 'p1', 'f': 2.0}, True),
+                                ({'PartitionKey': 'p1', 'f': 2.0}, False)]:
+            expected = fake_entity()
+            expected._populate_with_dict(dic=dict(dic), is_partial=is_partial)
+            hydrated = fake_entity._hydrate_many([dic], is_partial)[0]
+            assert hydrated.__dict__ == expected.__dict__
+
+    def test_hydrate_many_read_only(self, fake_entity):
+        tracked, read_only = [fake_entity._hydrate_many(
+            [raw(), {'PartitionKey': 'p1', 'f': 2.0}], tracking=tracking)
+            for tracking in (True, False)]
+        for e, expected in zip(read_only, tracked):
+            assert e._read_only is True
+            assert e._saved_copy is None
+            for name in fake_entity._f:
+                assert e.__dict__[name] == expected.__dict__[name]
+        assert tracked[0]._read_only is False
+        assert read_only[0]._is_new is False
+        assert read_only[0]._saved_etag == 'e1'
+        assert read_only[1]._is_new is True
+        assert read_only[1]._is_partial is False
+
+    def test_partial(self, fake_entity):
+        e = fake_entity._hydrate_many(
+            [{'PartitionKey': 'p1', 'RowKey': 'r1', 'f': 1.0, 'etag': 'e'}],
+            is_partial=True)[0]
+        assert e._is_partial is True
+        assert e.d is None
+
+    def test_without_etag(self, fake_entity):
+        e = fake_entity._hydrate_many([{'PartitionKey': 'p1'}])[0]
+        assert e._is_new is True
+        assert e._is_changed is True
+        assert e._saved_copy == {}
+
+    def test_raises_type_error(self, fake_entity):
+        with pytest.raises(TypeError) as e:
+            fake_entity._hydrate_many([raw(f='1.5')])
+        assert 'expect float for key f, but got str' in str(e)
+        with pytest.raises(TypeError) as e:
+            fake_entity._hydrate_many([raw(j=1)])
+        assert 'expect value to be str for deserialization' in str(e)
+        with pytest.raises(TypeError) as e:
+            fake_entity._hydrate_many(['lol'])
+        assert 'dic is not a dict' in str(e)
+
+    def test_call_overridden_init(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.lol = True
+
+        e = FakeEntity._hydrate_many([raw()])[0]
+        assert e.lol is True
+        assert e.RowKey == 'r1'
+
+    def test_field_names_not_identifiers(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+        setattr(FakeEntity, "it's", FloatField())
+        FakeEntity._compile_schema()
+        populate, hydrate_many, _ = compile_populator(FakeEntity)
+        e = hydrate_many([raw(**{"it's": 1.0})], False)[0]
+        assert e.__dict__["it's"] == 1.0
+
+
+class Test_compile_serializer:
+
+    """test compile_serializer"""
+
+    def test_serializers_compiled_once(self, fake_entity):
+        assert fake_entity._serializers is None
+        serializers = fake_entity._get_serializers()
+        assert fake_entity._get_serializers() is serializers
+        assert serializers[0] is not Entity._prepare
+
+    def test_prepare_same_as_generic(self, fake_entity):
+        e = fake_entity._hydrate(raw())
+        for changes in [{}, {'f': 2.5}, {'j': {'a': 2}}, {'g': None}]:
+            for name, value in changes.items():
+                setattr(e, name, value)
+            assert e._get_serializers()[0](e) == e._prepare()
+
+    def test_to_dict(self, fake_entity):
+        e = fake_entity(PartitionKey='p1', j=[1])
+        assert e._to_dict() == {
+            'PartitionKey': 'p1', 'RowKey': None, 'f': None, 'd': None,
+            'j': '[1]', 'g': None}
+
+    def test_required(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f = FloatField(required=True)
+        e = FakeEntity(PartitionKey='p1', RowKey='r1')
+        with pytest.raises(ValueError) as error:
+            e._pre_save()
+        assert 'f is required' in str(error)
+        e._is_partial = True
+        assert e._pre_save() == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                                 'f': None}
+        e.RowKey = None
+        with pytest.raises(ValueError) as error:
+            e._pre_save()
+        assert 'RowKey is required' in str(error)
+
+    def test_type_error(self, fake_entity):
+        e = fake_entity(PartitionKey='p1', RowKey='r1', j='[]')
+        with pytest.raises(TypeError) as error:
+            e._pre_save()
+        assert 'j is not type: (list, dict)' in str(error)
+
+    def test_save_serialize_once(self, fake_entity, monkeypatch):
+        class TS:
+
+            def insert_entity(self, **kwargs):
+                self.entity = kwargs['entity']
+                saved = dict((k, v) for k, v in kwargs['entity'].items()
+                             if v is not None)
+                return dict(saved, etag='e1')
+        ts = TS()
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        e = fake_entity(PartitionKey='p1', RowKey='r1', j={'a': 1})
+        monkeypatch.setattr(e, '_to_dict', None)
+        assert e.save() is True
+        assert ts.entity['j'] == '{"a": 1}'
+
+
+class Test_compile_projector:
+
+    """test compile_projector"""
+
+    def test_kinds(self, fake_entity):
+        raws = [raw(), {'PartitionKey': 'p2', 'RowKey': 'r2'}]
+        project = compile_projector(fake_entity, ('RowKey', 'j', 'd'))
+        assert project(raws) == [
+            {'RowKey': 'r1', 'j': {'a': 1},
+             'd': datetime(2014, 1, 1, tzinfo=timezone.utc)},
+            {'RowKey': 'r2', 'j': None, 'd': None}]
+        project = compile_projector(fake_entity, ('RowKey', 'f'), 'tuple')
+        assert project(raws) == [('r1', 1.5), ('r2', None)]
+        project = compile_projector(fake_entity, ('RowKey', 'f'), 'named')
+        row = project(raws)[0]
+        assert (row.RowKey, row.f) == ('r1', 1.5)
+        project = compile_projector(fake_entity, ('RowKey',), 'flat')
+        assert project(raws) == ['r1', 'r2']
+
+    def test_raises(self, fake_entity):
+        with pytest.raises(KeyError) as e:
+            compile_projector(fake_entity, ('lol',))
+        assert 'field is not defined, lol' in str(e)
+        with pytest.raises(ValueError) as e:
+            compile_projector(fake_entity, ('f', 'j'), 'flat')
+        assert 'flat has to be used with exactly one field' in str(e)
+        with pytest.raises(ValueError):
+            compile_projector(fake_entity, ('f',), 'lol')
+        project = compile_projector(fake_entity, ('f',))
+        with pytest.raises(TypeError) as e:
+            project([raw(f='1.5')])
+        assert 'expect float for key f, but got str' in str(e)
+
+    def test_projectors_compiled_once(self, fake_entity):
+        project = fake_entity._get_projector(('f',), 'flat')
+        assert fake_entity._get_projector(('f',), 'flat') is project
+        assert fake_entity._get_projector(('f',), 'tuple') is not project
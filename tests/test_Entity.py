@@ -2,10 +2,14 @@
     test_Entity
 """
 import pytest
+import time
+import pickle
+import asyncio
 from AzureODM.Fields import (
     GenericField, FloatField, KeyField, DateField, JSONField)
-from AzureODM.Entity import Entity
-from azure import WindowsAzureMissingResourceError
+from AzureODM.Entity import Entity, _prefetch
+from azure import (
+    WindowsAzureMissingResourceError, WindowsAzureConflictError, HeaderDict)
 
 
 class Test___cache_fields:
@@ -209,18 +213,52 @@ class Test_init:
         assert FakeEntity.metas['table_name'] == 't1'
         assert FakeEntity2.metas['table_name'] == 't2'
 
-    def test_call___cache_fields(self, monkeypatch):
-        def fake_cache_fields(*args, **kwargs):
-            raise Exception('called _cache_fields')
-        monkeypatch.setattr(Entity, '_cache_fields', fake_cache_fields)
+    def test_inherit_fields(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 't1'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f1 = FloatField()
+            f2 = FloatField()
 
+        class FakeEntity2(FakeEntity):
+            metas = {
+                'table_name': 't2'
+            }
+            f2 = None
+            f3 = FloatField()
+        assert FakeEntity2._schema_error is None
+        assert FakeEntity2._field_names == ('PartitionKey', 'RowKey', 'f1',
+                                            'f3')
+        e = FakeEntity2(PartitionKey='p1', RowKey='r1', f1=1.0)
+        assert e._to_dict() == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                                'f1': 1.0, 'f3': None}
+        assert FakeEntity._field_names == ('PartitionKey', 'RowKey', 'f1',
+                                           'f2')
+
+    def test_compile_schema_once_when_class_defined(self, monkeypatch):
         class FakeEntity(Entity):
             metas = {
                 'table_name': 'ab123'
             }
-        with pytest.raises(Exception) as e:
-            FakeEntity()
-        assert 'called _cache_fields' in str(e)
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f1 = FloatField()
+
+        assert FakeEntity._field_names == ('PartitionKey', 'RowKey', 'f1')
+        assert FakeEntity._schema_error is None
+
+        def fake_compile_schema(*args, **kwargs):
+            raise Exception('called _compile_schema')
+        monkeypatch.setattr(Entity, '_compile_schema', fake_compile_schema)
+        monkeypatch.setattr(Entity, '_cache_fields', fake_compile_schema)
+        e = FakeEntity(f1=1.0)
+        assert (e.PartitionKey, e.RowKey, e.f1) == (None, None, 1.0)
+        assert e._is_new is True
+        assert e._saved_copy == {}
+        assert e._saved_copy is not FakeEntity()._saved_copy
 
     def test_parse_kwargs_and_wont_validate_type(self):
         class FakeEntity(Entity):
@@ -353,6 +391,243 @@ class Test__check_chagned:
         assert s1._check_chagned() is False
 
 
+class Test_dirty_tracking:
+
+    """test the assignments recorded by the fields"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'ab14'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f1 = FloatField()
+            f2 = FloatField()
+            j = JSONField()
+        return FakeEntity
+
+    @pytest.fixture()
+    def saved_entity(self, fake_entity):
+        return fake_entity._hydrate({
+            'PartitionKey': 'p1', 'RowKey': 'r1', 'f1': 1.0, 'f2': 2.0,
+            'j': '[1]', 'etag': 'e1'})
+
+    def test_record_assignments(self, fake_entity):
+        s1 = fake_entity(PartitionKey='p1')
+        assert s1._dirty is None
+        s1.f1 = 1.0
+        s1.f1 = 2.0
+        s1.j = []
+        assert s1._dirty == {'f1', 'j'}
+        assert s1.f1 == 2.0
+        assert isinstance(fake_entity.f1, FloatField)
+        assert fake_entity.f1.name == 'f1'
+        s1._copy_into_saved()
+        assert s1._dirty is None
+
+    def test_changed_fields(self, fake_entity, saved_entity):
+        assert fake_entity(PartitionKey='p1')._changed_fields() is None
+        assert saved_entity._changed_fields() == []
+        saved_entity.f1 = 1.0
+        assert saved_entity._changed_fields() == []
+        saved_entity.f2 = 3.0
+        assert saved_entity._changed_fields() == ['f2']
+
+    def test__pre_save_only_compare_assigned(self, saved_entity):
+        # not assigned, not compared
+        saved_entity.__dict__['f1'] = 5.0
+        saved_entity._pre_save()
+        assert saved_entity._is_changed is False
+        saved_entity.f2 = 2.0
+        saved_entity._pre_save()
+        assert saved_entity._is_changed is False
+        saved_entity.f2 = 3.0
+        saved_entity._pre_save()
+        assert saved_entity._is_changed is True
+
+    def test_populate_without_etag_is_saved(self, saved_entity,
+                                            monkeypatch):
+        class TS:
+
+            def update_entity(self, **kwargs):
+                self.entity = kwargs['entity']
+                return {'etag': 'e2'}
+        ts = TS()
+        saved_entity._populate_with_dict({'f1': 5.0})
+        assert saved_entity._dirty == {'f1'}
+        assert saved_entity._is_changed is True
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        assert saved_entity.save() is True
+        assert ts.entity['f1'] == 5.0
+        assert saved_entity._saved_etag == 'e2'
+
+    def test_merge_send_changed_fields(self, saved_entity):
+        class TS:
+
+            def merge_entity(self, **kwargs):
+                self.entity = kwargs['entity']
+                return {'etag': 'e2'}
+
+            def insert_or_merge_entity(self, **kwargs):
+                return self.merge_entity(**kwargs)
+        ts = TS()
+        saved_entity.j = [2]
+        saved_entity.save_merge(ts=ts)
+        assert ts.entity == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                             'j': '[2]'}
+        saved_entity.save_insert_or_merge(ts=ts)
+        assert ts.entity == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                             'j': '[2]'}
+        saved_entity._after_save({'etag': 'e2'})
+        saved_entity.save_merge(ts=ts)
+        assert ts.entity == {'PartitionKey': 'p1', 'RowKey': 'r1'}
+
+    def test_merge_new_entity_send_all(self, fake_entity):
+        s1 = fake_entity(PartitionKey='p1', RowKey='r1', f1=1.0)
+        method, kwargs = s1._save_request('insert_or_merge')
+        assert kwargs['entity'] == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                                    'f1': 1.0, 'f2': None, 'j': None}
+
+    def test_replace_send_all(self, saved_entity):
+        saved_entity.f1 = 3.0
+        method, kwargs = saved_entity._save_request('replace')
+        assert kwargs['entity'] == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                                    'f1': 3.0, 'f2': 2.0, 'j': '[1]'}
+
+
+class CompactEntity(Entity):
+
+    """pickled by reference, it has to be defined in the module"""
+    metas = {
+        'table_name': 'ab15',
+        'compact': True
+    }
+    PartitionKey = KeyField()
+    RowKey = KeyField()
+    f1 = FloatField()
+
+
+class Test_compact:
+
+    """test metas['compact']"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'ab15',
+                'compact': True
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f1 = FloatField()
+            j = JSONField()
+        return FakeEntity
+
+    def test_slots(self, fake_entity):
+        compact = fake_entity._compact_class
+        assert compact is not None
+        assert issubclass(compact, fake_entity)
+        assert compact.__name__ == 'FakeEntity'
+        assert '_is_new' in compact.__slots__
+        assert compact._compact_class is compact
+        assert compact._entity_class is fake_entity
+        assert Entity._compact_class is None
+
+    def test_init(self, fake_entity):
+        s1 = fake_entity(PartitionKey='p1', f1=1.0)
+        assert type(s1) is fake_entity._compact_class
+        assert isinstance(s1, fake_entity)
+        assert s1.PartitionKey == 'p1'
+        assert s1.f1 == 1.0
+        assert s1.j is None
+        assert s1._is_new is True
+        assert s1._read_only is False
+        assert s1._saved_copy == {}
+        assert s1._to_dict() == {'PartitionKey': 'p1', 'RowKey': None,
+                                 'f1': 1.0, 'j': None}
+        with pytest.raises(KeyError):
+            fake_entity(lol=1)
+
+    def test_hydrate_and_save(self, fake_entity):
+        s1, s2 = fake_entity._hydrate_many([
+            {'PartitionKey': 'p1', 'RowKey': 'r1', 'f1': 1.0, 'j': '[1]',
+             'etag': 'e1'},
+            {'PartitionKey': 'p1', 'RowKey': 'r2'}])
+        assert type(s1) is fake_entity._compact_class
+        assert s1.j == [1]
+        assert s1._is_new is False
+        assert s1._saved_etag == 'e1'
+        assert s1._saved_copy['f1'] == 1.0
+        assert s2._is_new is True
+        assert s2.f1 is None
+        assert s1._pre_save()['j'] == '[1]'
+        assert s1._is_changed is False
+        assert s1._changed_fields() == []
+        s1.f1 = 2.0
+        assert s1._changed_fields() == ['f1']
+        s1._pre_save()
+        assert s1._is_changed is True
+        method, kwargs = s1._save_request('merge')
+        assert kwargs['entity'] == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                                    'f1': 2.0}
+        s1._after_save({'etag': 'e2'})
+        assert s1._changed_fields() == []
+        s3 = fake_entity._hydrate_many([{'PartitionKey': 'p1'}],
+                                       tracking=False)[0]
+        assert s3._read_only is True
+        assert s3._saved_copy is None
+
+    def test_pickle(self):
+        s1 = CompactEntity._hydrate_many([
+            {'PartitionKey': 'p1', 'RowKey': 'r1', 'f1': 1.0,
+             'etag': 'e1'}])[0]
+        s1.f1 = 2.0
+        for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1):
+            s2 = pickle.loads(pickle.dumps(s1, protocol=protocol))
+            assert type(s2) is CompactEntity._compact_class
+            assert s2._to_dict() == s1._to_dict()
+            assert s2._saved_etag == 'e1'
+            assert s2._saved_copy == {'PartitionKey': 'p1', 'RowKey': 'r1',
+                                      'f1': 1.0}
+            assert s2._changed_fields() == ['f1']
+
+    def test_share_class_state(self, fake_entity):
+        compact = fake_entity._compact_class
+        assert compact._get_populators() is fake_entity._get_populators()
+        assert compact._get_serializers() is fake_entity._get_serializers()
+        fake_entity.metas['cache'] = {}
+        assert compact._get_cache() is fake_entity._get_cache()
+        assert '_cache' not in compact.__dict__
+
+    def test_re_cache(self, fake_entity):
+        s1 = fake_entity(PartitionKey='p1')
+        compact = fake_entity._compact_class
+        fake_entity.f2 = FloatField()
+        s1._cache_fields(re_cache=True)
+        assert fake_entity._compact_class is not compact
+        assert fake_entity._compact_class._entity_class is fake_entity
+        assert s1.PartitionKey is None
+        s1.f2 = 1.0
+        assert s1._to_dict()['f2'] == 1.0
+        assert 'f2' in fake_entity(f2=1.0)._to_dict()
+
+    def test_field_names_have_to_be_identifiers(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'ab15',
+                'compact': True
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+        setattr(FakeEntity, "it's", FloatField())
+        FakeEntity._compile_schema()
+        assert FakeEntity._compact_class is None
+        with pytest.raises(ValueError) as e:
+            FakeEntity()
+        assert 'has to be an identifier' in str(e)
+
+
 class Test__populate_with_dict:
 
     """test _populate_with_dict"""
@@ -923,28 +1198,53 @@ class Test__pre_save:
 
         return FakeEntity()
 
-    def fake_validate(*args, **kwargs):
-        raise MemoryError('called fake_validate')
+    def test_validate(self, fake_entity):
+        fake_entity.PartitionKey = 1.0
+        with pytest.raises(TypeError) as e:
+            fake_entity._pre_save()
+        assert 'PartitionKey is not type: str' in str(e)
+        fake_entity.PartitionKey = None
+        with pytest.raises(ValueError) as e:
+            fake_entity._pre_save()
+        assert 'PartitionKey is required' in str(e)
 
-    def fake_validate_pass(*args, **kwargs):
-        pass
+    def test_check_changed_and_return_dict(self, fake_entity):
+        fake_entity.PartitionKey = 'p1'
+        fake_entity.RowKey = 'r1'
+        assert fake_entity._pre_save() == {
+            'PartitionKey': 'p1', 'RowKey': 'r1'}
+        assert fake_entity._is_changed is True
+        fake_entity._copy_into_saved()
+        fake_entity._pre_save()
+        assert fake_entity._is_changed is False
 
-    def fake_check_changed(*args, **kwargs):
-        raise MemoryError('called fake_check_changed')
+    def test_call_overridden__validate_and__check_changed(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+            def _validate(self):
+                raise MemoryError('called fake_validate')
 
-    def test_call__validate(self, fake_entity, monkeypatch):
-        monkeypatch.setattr(fake_entity, '_validate', self.fake_validate)
         with pytest.raises(MemoryError) as e:
-            fake_entity._pre_save()
+            FakeEntity()._pre_save()
         assert 'called fake_validate' in str(e)
 
-    def test_call__check_changed(self, fake_entity, monkeypatch):
-        monkeypatch.setattr(fake_entity, '_validate', self.fake_validate_pass)
-        monkeypatch.setattr(fake_entity,
-                            '_check_chagned',
-                            self.fake_check_changed)
+        class FakeEntity2(FakeEntity):
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+            def _validate(self):
+                pass
+
+            def _check_chagned(self):
+                raise MemoryError('called fake_check_changed')
+
         with pytest.raises(MemoryError) as e:
-            fake_entity._pre_save()
+            FakeEntity2()._pre_save()
         assert 'called fake_check_changed' in str(e)
 
 
@@ -1645,3 +1945,372 @@ class Test__create_table:
 
         fake_entity._created_table = True
         fake_entity._create_table(ts=fake_ts)
+
+
+class FakePage(list):
+
+    """a page returned by query_entities with continuation tokens"""
+
+    def __init__(self, entities, next_partition_key=None, next_row_key=None):
+        super().__init__(entities)
+        if next_partition_key is not None:
+            self.x_ms_continuation = HeaderDict({
+                'nextpartitionkey': next_partition_key,
+                'nextrowkey': next_row_key
+            })
+
+
+class Test_iterate:
+
+    """test iterate()"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+        return FakeEntity
+
+    @pytest.fixture()
+    def fake_ts(self):
+        class TS:
+
+            def __init__(self):
+                self.calls = []
+
+            def query_entities(self, **kwargs):
+                self.calls.append(kwargs)
+                if kwargs['next_partition_key'] is None:
+                    return FakePage([{'PartitionKey': 'p1', 'RowKey': 'r1'},
+                                     {'PartitionKey': 'p1', 'RowKey': 'r2'}],
+                                    'p2', 'r3')
+                assert kwargs['next_partition_key'] == 'p2'
+                assert kwargs['next_row_key'] == 'r3'
+                return FakePage([{'PartitionKey': 'p2', 'RowKey': 'r3'}])
+        return TS()
+
+    def test_TypeError_raises(self, fake_entity):
+        with pytest.raises(TypeError) as e:
+            fake_entity.iterate(page_size='1', ts={})
+        assert 'page_size has to be None or int, ' in str(e)
+
+    def test_lazy(self, fake_entity, fake_ts):
+        entities = fake_entity.iterate(ts=fake_ts)
+        assert fake_ts.calls == []
+        first = next(entities)
+        assert first.RowKey == 'r1'
+        assert len(fake_ts.calls) == 1
+
+    def test_follow_continuation(self, fake_entity, fake_ts):
+        entities = list(fake_entity.iterate(page_size=2, ts=fake_ts))
+        assert [e.RowKey for e in entities] == ['r1', 'r2', 'r3']
+        assert [c['top'] for c in fake_ts.calls] == [2, 2]
+        for entity in entities:
+            assert isinstance(entity, fake_entity)
+            assert entity._is_partial is False
+
+    def test_limit_stops_early(self, fake_entity, fake_ts):
+        entities = list(fake_entity.iterate(limit=2, ts=fake_ts))
+        assert [e.RowKey for e in entities] == ['r1', 'r2']
+        assert len(fake_ts.calls) == 1
+        assert fake_ts.calls[0]['top'] == 2
+
+    def test_page_size_capped(self, fake_entity, fake_ts):
+        list(fake_entity.iterate(page_size=5000, ts=fake_ts))
+        assert fake_ts.calls[0]['top'] == Entity.MAX_PAGE_SIZE
+
+    def test_find_follow_continuation(self, fake_entity, fake_ts):
+        entities = fake_entity.find(ts=fake_ts)
+        assert isinstance(entities, list)
+        assert [e.RowKey for e in entities] == ['r1', 'r2', 'r3']
+
+    def test_read_only(self, fake_entity, fake_ts):
+        entities = fake_entity.find(tracking=False, ts=fake_ts)
+        assert [e.RowKey for e in entities] == ['r1', 'r2', 'r3']
+        e = entities[0]
+        assert e._read_only is True
+        assert e._saved_copy is None
+        e.RowKey = 'r4'
+        with pytest.raises(Exception) as error:
+            e.save()
+        assert 'trying to save a read only entity' in str(error)
+        with pytest.raises(Exception) as error:
+            e.save_replace(ts=fake_ts)
+        assert 'trying to save a read only entity' in str(error)
+
+    def test_queryset_read_only(self, fake_entity, fake_ts, monkeypatch):
+        monkeypatch.setattr('AzureODM.Entity.get_table_service',
+                            lambda: fake_ts)
+        assert all(e._read_only for e in fake_entity.select().read_only())
+        assert not any(e._read_only for e in fake_entity.select().go())
+
+
+class Test__prefetch:
+
+    """test _prefetch and iterate(prefetch=)"""
+
+    def test_yield_in_order(self):
+        assert list(_prefetch(iter(range(10)), size=2)) == list(range(10))
+
+    def test_bounded_buffer(self):
+        produced = []
+
+        def pages():
+            for i in range(10):
+                produced.append(i)
+                yield i
+        prefetched = _prefetch(pages(), size=2)
+        assert next(prefetched) == 0
+        time.sleep(0.2)
+        # 1 consumed, 2 buffered, 1 blocked in put
+        assert len(produced) <= 4
+        prefetched.close()
+
+    def test_reraise(self):
+        def pages():
+            yield 1
+            raise MemoryError('lol')
+        prefetched = _prefetch(pages(), size=2)
+        assert next(prefetched) == 1
+        with pytest.raises(MemoryError):
+            next(prefetched)
+
+    def test_iterate_prefetch(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+        class TS:
+
+            def query_entities(self, **kwargs):
+                if kwargs['next_partition_key'] is None:
+                    return FakePage([{'PartitionKey': 'p1', 'RowKey': 'r1'}],
+                                    'p2', 'r2')
+                return FakePage([{'PartitionKey': 'p2', 'RowKey': 'r2'}])
+
+        entities = FakeEntity.iterate(prefetch=1, ts=TS())
+        assert [e.RowKey for e in entities] == ['r1', 'r2']
+
+    def test_raise_if_prefetch_not_int(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+        with pytest.raises(TypeError) as e:
+            FakeEntity.iterate(prefetch='1', ts={})
+        assert 'prefetch has to be None or int, ' in str(e)
+
+
+class Test_async:
+
+    """test afindOne, afind, aiterate, asave, adelete"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f = FloatField()
+
+        return FakeEntity
+
+    @pytest.fixture()
+    def fake_ats(self):
+        class ATS:
+
+            def __init__(self):
+                self.calls = []
+
+            async def get_entity(self, **kwargs):
+                self.calls.append(('get_entity', kwargs))
+                if kwargs['row_key'] == 'missing':
+                    raise WindowsAzureMissingResourceError('lol')
+                return {'RowKey': kwargs['row_key'], 'f': 1.5, 'etag': 'e1'}
+
+            async def query_entities(self, **kwargs):
+                self.calls.append(('query_entities', kwargs))
+                if kwargs['next_partition_key'] is None:
+                    return FakePage([{'PartitionKey': 'p1', 'RowKey': 'r1'}],
+                                    'p2', 'r2')
+                return FakePage([{'PartitionKey': 'p2', 'RowKey': 'r2'}])
+
+            async def insert_entity(self, **kwargs):
+                self.calls.append(('insert_entity', kwargs))
+                if kwargs['entity']['RowKey'] == 'conflict':
+                    raise WindowsAzureConflictError('lol')
+                return dict(kwargs['entity'], etag='e2')
+
+            async def update_entity(self, **kwargs):
+                self.calls.append(('update_entity', kwargs))
+                return {'etag': 'e3'}
+
+            async def delete_entity(self, **kwargs):
+                self.calls.append(('delete_entity', kwargs))
+        return ATS()
+
+    def test_afindOne(self, fake_entity, fake_ats):
+        entity = asyncio.run(fake_entity.afindOne(
+            partition_key='p1', row_key='r1', select='RowKey,f', ts=fake_ats))
+        assert isinstance(entity, fake_entity)
+        assert entity.PartitionKey == 'p1'
+        assert entity.f == 1.5
+        assert entity._saved_etag == 'e1'
+        assert fake_ats.calls[0][1]['select'] == 'RowKey,f'
+
+    def test_afindOne_return_None_when_not_found(self, fake_entity, fake_ats):
+        assert asyncio.run(fake_entity.afindOne(
+            partition_key='p1', row_key='missing', ts=fake_ats)) is None
+
+    def test_afindOne_raise_if_select_not_string(self, fake_entity,
+                                                 fake_ats):
+        with pytest.raises(TypeError) as e:
+            asyncio.run(fake_entity.afindOne(
+                partition_key='p1', row_key='r1', select=None, ts=fake_ats))
+        assert 'select is not a string' in str(e)
+
+    def test_afind_follow_continuation(self, fake_entity, fake_ats):
+        entities = asyncio.run(fake_entity.afind(ts=fake_ats))
+        assert [e.RowKey for e in entities] == ['r1', 'r2']
+        assert fake_ats.calls[1][1]['next_partition_key'] == 'p2'
+
+    def test_async_for_QuerySet(self, fake_entity, fake_ats, monkeypatch):
+        monkeypatch.setattr('AzureODM.Entity.get_async_table_service',
+                            lambda: fake_ats)
+
+        async def collect():
+            return [e.RowKey async for e in fake_entity.select()]
+        assert asyncio.run(collect()) == ['r1', 'r2']
+
+    def test_asave_insert(self, fake_entity, fake_ats):
+        entity = fake_entity(PartitionKey='p1', RowKey='r1', f=1.0)
+        assert asyncio.run(entity.asave(ts=fake_ats)) is True
+        assert fake_ats.calls[0][0] == 'insert_entity'
+        assert entity._is_new is False
+        assert entity._saved_etag == 'e2'
+
+    def test_asave_replace(self, fake_entity, fake_ats):
+        entity = fake_entity(PartitionKey='p1', RowKey='r1', f=1.0)
+        entity._after_save({'etag': 'e1'})
+        assert asyncio.run(entity.asave(ts=fake_ats)) is False
+        entity.f = 2.0
+        assert asyncio.run(entity.asave(ts=fake_ats)) is True
+        assert fake_ats.calls[0][0] == 'update_entity'
+        assert fake_ats.calls[0][1]['partition_key'] == 'p1'
+        assert entity._saved_etag == 'e3'
+
+    def test_asave_ignore_conflict(self, fake_entity, fake_ats):
+        entity = fake_entity(PartitionKey='p1', RowKey='conflict')
+        with pytest.raises(WindowsAzureConflictError):
+            asyncio.run(entity.asave(ts=fake_ats))
+        assert asyncio.run(
+            entity.asave(ignore_conflict=True, ts=fake_ats)) is False
+
+    def test_adelete(self, fake_entity, fake_ats):
+        entity = fake_entity(PartitionKey='p1', RowKey='r1')
+        with pytest.raises(Exception) as e:
+            asyncio.run(entity.adelete(ts=fake_ats))
+        assert 'trying to delete a none saved entity' in str(e)
+        asyncio.run(entity.adelete(force_delete=True, ts=fake_ats))
+        assert fake_ats.calls == [('delete_entity', {
+            'table_name': 'lolol',
+            'partition_key': 'p1',
+            'row_key': 'r1'
+        })]
+
+
+class Test_findMany:
+
+    """test findMany"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            f = FloatField()
+
+        return FakeEntity
+
+    @pytest.fixture()
+    def fake_ts(self):
+        class TS:
+
+            def __init__(self):
+                self.filters = []
+                self.stored = {}
+
+            def query_entities(self, **kwargs):
+                self.filters.append(kwargs['filter'])
+                assert kwargs['select'] == 'f,PartitionKey,RowKey'
+                return [dict(PartitionKey=pk, RowKey=rk, f=f)
+                        for (pk, rk), f in self.stored.items()
+                        if "PartitionKey eq '{}'".format(pk)
+                        in kwargs['filter'] and
+                        "RowKey eq '{}'".format(rk) in kwargs['filter']]
+        return TS()
+
+    def test_raise_if_select_not_string(self, fake_entity):
+        with pytest.raises(TypeError) as e:
+            fake_entity.findMany([('p1', 'r1')], select=None, ts={})
+        assert 'select is not a string' in str(e)
+
+    def test_return_in_order_None_if_missing(self, fake_entity, fake_ts):
+        fake_ts.stored = {('p1', 'r1'): 1.0, ('p2', 'r2'): 2.0,
+                          ('p1', 'r3'): 3.0}
+        keys = [('p2', 'r2'), ('p1', 'missing'), ('p1', 'r1'), ('p1', 'r3')]
+        entities = fake_entity.findMany(keys, select='f', ts=fake_ts)
+        assert entities[1] is None
+        assert [(e.PartitionKey, e.RowKey, e.f)
+                for e in entities if e is not None] == [
+            ('p2', 'r2', 2.0), ('p1', 'r1', 1.0), ('p1', 'r3', 3.0)]
+        assert isinstance(entities[0], fake_entity)
+        # one query per partition
+        assert len(fake_ts.filters) == 2
+
+    def test_inherited_fields(self, fake_entity, fake_ts):
+        class FakeEntity2(fake_entity):
+            metas = {
+                'table_name': 'lolol2'
+            }
+        fake_ts.stored = {('p1', 'r1'): 1.0, ('p2', 'r2'): 2.0}
+        entities = FakeEntity2.findMany([('p1', 'r1'), ('p2', 'r2')],
+                                        select='f', ts=fake_ts)
+        assert [e.f for e in entities] == [1.0, 2.0]
+        assert isinstance(entities[0], FakeEntity2)
+        assert FakeEntity2.select().where(PartitionKey='p1').andWhere(
+            f__gt=1.0).filter == "PartitionKey eq 'p1' and f gt 1.0"
+
+    def test_respect_max_comparisons(self, fake_entity, fake_ts):
+        keys = [('p1', 'r{}'.format(i)) for i in range(40)]
+        fake_ts.stored = dict((key, 1.0) for key in keys)
+        entities = fake_entity.findMany(
+            keys, select='f', max_workers=4, ts=fake_ts)
+        assert [e.RowKey for e in entities] == [k[1] for k in keys]
+        assert len(fake_ts.filters) == 3
+        for filter in fake_ts.filters:
+            assert filter.count(' eq ') <= Entity.MAX_FILTER_COMPARISONS
+
+    def test_respect_max_filter_length(self, fake_entity):
+        keys = [('p1', 'r' * 500 + str(i)) for i in range(10)]
+        filters = fake_entity._multi_get_filters(keys)
+        assert len(filters) > 1
+        for filter in filters:
+            assert len(filter) <= Entity.MAX_FILTER_LENGTH
+        assert sum(f.count('RowKey eq') for f in filters) == 10
+
+    def test_filter_format(self, fake_entity):
+        assert fake_entity._multi_get_filters(
+            [('p1', 'r1'), ('p1', 'r2'), ('p1', 'r1')]) == [
+            "(PartitionKey eq 'p1' and (RowKey eq 'r1' or RowKey eq 'r2'))"]
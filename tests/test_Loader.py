@@ -0,0 +1,378 @@
+"""
+    test_Loader
+"""
+import pytest
+import asyncio
+import time
+from threading import Thread, Lock
+from AzureODM.Entity import Entity
+from AzureODM.Fields import KeyField, FloatField
+from AzureODM.Loader import FindOneLoader, SingleFlight
+
+STORED = {('p1', 'r1'): 1.0, ('p1', 'r2'): 2.0, ('p2', 'r3'): 3.0}
+
+
+def _query(kwargs):
+    return [dict(PartitionKey=pk, RowKey=rk, f=f, etag='e')
+            for (pk, rk), f in STORED.items()
+            if "PartitionKey eq '{}'".format(pk) in kwargs['filter'] and
+            "RowKey eq '{}'".format(rk) in kwargs['filter']]
+
+
+class FakeTS:
+
+    def __init__(self):
+        self.calls = []
+        self.lock = Lock()
+
+    def get_entity(self, **kwargs):
+        with self.lock:
+            self.calls.append(('get_entity', kwargs))
+        key = (kwargs['partition_key'], kwargs['row_key'])
+        return dict(PartitionKey=key[0], RowKey=key[1], f=STORED[key],
+                    etag='e')
+
+    def query_entities(self, **kwargs):
+        with self.lock:
+            self.calls.append(('query_entities', kwargs))
+        return _query(kwargs)
+
+
+class FakeATS:
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_entity(self, **kwargs):
+        self.calls.append(('get_entity', kwargs))
+        key = (kwargs['partition_key'], kwargs['row_key'])
+        return dict(PartitionKey=key[0], RowKey=key[1], f=STORED[key],
+                    etag='e')
+
+    async def query_entities(self, **kwargs):
+        self.calls.append(('query_entities', kwargs))
+        return _query(kwargs)
+
+
+@pytest.fixture()
+def fake_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol',
+            'find_one_batch_window': 0.05
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        f = FloatField()
+
+    return FakeEntity
+
+
+class Test_FindOneLoader:
+
+    """test FindOneLoader"""
+
+    def test_disabled_by_default(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+        assert FakeEntity._get_find_one_loader() is None
+
+    def test_loader_per_class(self, fake_entity):
+        loader = fake_entity._get_find_one_loader()
+        assert isinstance(loader, FindOneLoader)
+        assert loader.window == 0.05
+        assert fake_entity._get_find_one_loader() is loader
+
+    def test_batch_concurrent_threads(self, fake_entity):
+        ts = FakeTS()
+        keys = [('p1', 'r1'), ('p1', 'r2'), ('p2', 'r3'), ('p1', 'missing'),
+                ('p1', 'r1')]
+        results = [None] * len(keys)
+
+        def find(i):
+            results[i] = fake_entity.findOne(
+                partition_key=keys[i][0], row_key=keys[i][1], ts=ts)
+        threads = [Thread(target=find, args=(i,)) for i in range(len(keys))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # one query per partition instead of one request per key
+        assert len(ts.calls) == 2
+        assert all(name == 'query_entities' for name, _ in ts.calls)
+        assert results[3] is None
+        assert [results[i].f for i in (0, 1, 2, 4)] == [1.0, 2.0, 3.0, 1.0]
+        # every caller gets its own instance
+        assert results[0] is not results[4]
+        assert results[0]._is_new is False
+
+    def test_single_lookup_use_get_entity(self, fake_entity):
+        ts = FakeTS()
+        entity = fake_entity.findOne(partition_key='p1', row_key='r2', ts=ts)
+        assert entity.f == 2.0
+        assert [name for name, _ in ts.calls] == ['get_entity']
+
+    def test_max_batch_size_dispatch_at_once(self, fake_entity):
+        ts = FakeTS()
+        loader = fake_entity._get_find_one_loader()
+        loader.max_batch_size = 1
+        entity = fake_entity.findOne(partition_key='p1', row_key='r1', ts=ts)
+        assert entity.f == 1.0
+        assert loader._timer is None
+
+    def test_exception_to_every_caller(self, fake_entity):
+        class TS:
+
+            def query_entities(self, **kwargs):
+                raise MemoryError('lol')
+        ts = TS()
+        errors = []
+
+        def find(row_key):
+            try:
+                fake_entity.findOne(
+                    partition_key='p1', row_key=row_key, ts=ts)
+            except MemoryError as e:
+                errors.append(e)
+        threads = [Thread(target=find, args=(r,)) for r in ('r1', 'r2')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(errors) == 2
+
+    def test_hydrate_error_only_fails_its_lookup(self, fake_entity):
+        class TS(FakeTS):
+
+            def query_entities(self, **kwargs):
+                rows = super().query_entities(**kwargs)
+                for row in rows:
+                    if row['RowKey'] == 'r1':
+                        row['f'] = 'lol'
+                return rows
+        ts = TS()
+        results = {}
+
+        def find(row_key):
+            try:
+                results[row_key] = fake_entity.findOne(
+                    partition_key='p1', row_key=row_key, ts=ts)
+            except TypeError as e:
+                results[row_key] = e
+        # daemon threads, a caller blocked forever doesn't block the tests
+        threads = [Thread(target=find, args=(r,), daemon=True)
+                   for r in ('r1', 'r2')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        assert isinstance(results['r1'], TypeError)
+        assert results['r2'].f == 2.0
+
+    def test_async_hydrate_error_only_fails_its_lookup(self, fake_entity):
+        class ATS(FakeATS):
+
+            async def query_entities(self, **kwargs):
+                rows = await super().query_entities(**kwargs)
+                for row in rows:
+                    if row['RowKey'] == 'r1':
+                        row['f'] = 'lol'
+                return rows
+        ats = ATS()
+
+        async def main():
+            return await asyncio.wait_for(asyncio.gather(
+                fake_entity.afindOne(partition_key='p1', row_key='r1',
+                                     ts=ats),
+                fake_entity.afindOne(partition_key='p1', row_key='r2',
+                                     ts=ats),
+                return_exceptions=True), timeout=5)
+        results = asyncio.run(main())
+        assert isinstance(results[0], TypeError)
+        assert results[1].f == 2.0
+
+    def test_batch_one_loop_iteration(self, fake_entity):
+        ats = FakeATS()
+
+        async def main():
+            return await asyncio.gather(
+                fake_entity.afindOne(partition_key='p1', row_key='r1',
+                                     ts=ats),
+                fake_entity.afindOne(partition_key='p1', row_key='r2',
+                                     ts=ats),
+                fake_entity.afindOne(partition_key='p2', row_key='r3',
+                                     ts=ats),
+                fake_entity.afindOne(partition_key='p2', row_key='missing',
+                                     ts=ats))
+        results = asyncio.run(main())
+        assert [r.f for r in results[:3]] == [1.0, 2.0, 3.0]
+        assert results[3] is None
+        assert [name for name, _ in ats.calls] == [
+            'query_entities', 'query_entities']
+
+
+class SlowTS(FakeTS):
+
+    def get_entity(self, **kwargs):
+        time.sleep(0.05)
+        return super().get_entity(**kwargs)
+
+    def query_entities(self, **kwargs):
+        time.sleep(0.05)
+        return super().query_entities(**kwargs)
+
+
+class SlowATS(FakeATS):
+
+    async def get_entity(self, **kwargs):
+        await asyncio.sleep(0.01)
+        return await super().get_entity(**kwargs)
+
+    async def query_entities(self, **kwargs):
+        await asyncio.sleep(0.01)
+        return await super().query_entities(**kwargs)
+
+
+@pytest.fixture()
+def coalesced_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol',
+            'coalesce_reads': True
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        f = FloatField()
+
+    return FakeEntity
+
+
+def run_threads(target, n):
+    results = [None] * n
+
+    def run(i):
+        results[i] = target()
+    threads = [Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class Test_SingleFlight:
+
+    """test SingleFlight"""
+
+    def test_disabled_by_default(self, fake_entity):
+        assert fake_entity._get_single_flight() is None
+
+    def test_single_flight_per_class(self, coalesced_entity):
+        single_flight = coalesced_entity._get_single_flight()
+        assert isinstance(single_flight, SingleFlight)
+        assert coalesced_entity._get_single_flight() is single_flight
+
+    def test_not_cached_after_finished(self):
+        single_flight = SingleFlight()
+        assert single_flight.do('k', lambda: 1) == 1
+        assert single_flight.do('k', lambda: 2) == 2
+        assert single_flight._calls == {}
+
+    def test_findOne_one_request(self, coalesced_entity):
+        ts = SlowTS()
+        results = run_threads(lambda: coalesced_entity.findOne(
+            partition_key='p1', row_key='r1', ts=ts), 5)
+        assert len(ts.calls) == 1
+        assert [r.f for r in results] == [1.0] * 5
+        # every caller gets its own instance
+        assert len(set(id(r) for r in results)) == 5
+        results[0].f = 5.0
+        assert results[1].f == 1.0
+
+    def test_different_select_not_coalesced(self, coalesced_entity):
+        ts = SlowTS()
+        selects = iter(['*', 'f'])
+        run_threads(lambda: coalesced_entity.findOne(
+            partition_key='p1', row_key='r1', select=next(selects), ts=ts), 2)
+        assert len(ts.calls) == 2
+
+    def test_find_one_query(self, coalesced_entity):
+        ts = SlowTS()
+        filter = "PartitionKey eq 'p1' and RowKey eq 'r2'"
+        results = run_threads(lambda: coalesced_entity.find(
+            filter=filter, ts=ts), 4)
+        assert len(ts.calls) == 1
+        assert [[e.f for e in r] for r in results] == [[2.0]] * 4
+        assert results[0][0] is not results[1][0]
+
+    def test_exception_to_every_caller(self, coalesced_entity):
+        class TS:
+
+            def __init__(self):
+                self.calls = 0
+
+            def get_entity(self, **kwargs):
+                self.calls += 1
+                time.sleep(0.05)
+                raise MemoryError('lol')
+        ts = TS()
+        errors = []
+
+        def find():
+            try:
+                coalesced_entity.findOne(
+                    partition_key='p1', row_key='r1', ts=ts)
+            except MemoryError as e:
+                errors.append(e)
+        run_threads(find, 3)
+        assert ts.calls == 1
+        assert len(errors) == 3
+
+    def test_async_one_request(self, coalesced_entity):
+        ats = SlowATS()
+
+        async def main():
+            return await asyncio.gather(*[coalesced_entity.afindOne(
+                partition_key='p1', row_key='r1', ts=ats) for _ in range(3)])
+        results = asyncio.run(main())
+        assert [r.f for r in results] == [1.0] * 3
+        assert len(set(id(r) for r in results)) == 3
+        assert [name for name, _ in ats.calls] == ['get_entity']
+
+    def test_async_find_one_query(self, coalesced_entity):
+        ats = SlowATS()
+        filter = "PartitionKey eq 'p2' and RowKey eq 'r3'"
+
+        async def main():
+            return await asyncio.gather(*[coalesced_entity.afind(
+                filter=filter, ts=ats) for _ in range(3)])
+        results = asyncio.run(main())
+        assert [[e.f for e in r] for r in results] == [[3.0]] * 3
+        assert [name for name, _ in ats.calls] == ['query_entities']
+
+    def test_async_cancel_leader(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return 'lol'
+
+        async def main():
+            leader = asyncio.ensure_future(single_flight.ado('k', fn))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(single_flight.ado('k', fn))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await asyncio.wait_for(follower, timeout=5)
+        assert asyncio.run(main()) == 'lol'
+        assert calls == [1]
+        assert all(len(pending) == 0
+                   for pending in single_flight._async_calls.values())
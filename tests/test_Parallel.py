@@ -0,0 +1,331 @@
+"""
+    test_Parallel
+"""
+import pytest
+import re
+from threading import Lock
+from azure import HeaderDict
+from AzureODM.Entity import Entity
+from AzureODM.Fields import KeyField, IntField
+from AzureODM.Parallel import (
+    key_ranges, range_filter, sample_splits, scan_segments, merge_segments)
+
+comparison_re = re.compile(
+    r"(PartitionKey|RowKey|i) (eq|ne|ge|gt|le|lt) ('(?:[^']|'')*'|\d+)")
+operators = {
+    'eq': lambda a, b: a == b,
+    'ne': lambda a, b: a != b,
+    'ge': lambda a, b: a >= b,
+    'gt': lambda a, b: a > b,
+    'le': lambda a, b: a <= b,
+    'lt': lambda a, b: a < b,
+}
+
+
+def matches(filter, row):
+    """every comparison in ``filter`` is ANDed"""
+    for name, operator, value in comparison_re.findall(filter or ''):
+        if value.startswith("'"):
+            value = value[1:-1].replace("''", "'")
+        else:
+            value = int(value)
+        if not operators[operator](row[name], value):
+            return False
+    return True
+
+
+class FakePage(list):
+
+    def __init__(self, entities, next_key=None):
+        super().__init__(entities)
+        if next_key is not None:
+            self.x_ms_continuation = HeaderDict({
+                'nextpartitionkey': next_key[0],
+                'nextrowkey': next_key[1]
+            })
+
+
+class FakeTS:
+
+    """a table of sorted rows, at most ``max_page_size`` rows a page"""
+
+    def __init__(self, keys, max_page_size=3):
+        self.rows = [{'PartitionKey': p, 'RowKey': r, 'i': i, 'etag': 'e'}
+                     for i, (p, r) in enumerate(sorted(keys))]
+        self.max_page_size = max_page_size
+        self.calls = []
+        self.lock = Lock()
+
+    def query_entities(self, table_name, filter, select, top,
+                       next_partition_key, next_row_key):
+        with self.lock:
+            self.calls.append({'filter': filter, 'select': select,
+                               'top': top})
+        rows = [row for row in self.rows
+                if (next_partition_key is None or
+                    (row['PartitionKey'], row['RowKey']) >=
+                    (next_partition_key, next_row_key))]
+        size = self.max_page_size if top is None else min(
+            top, self.max_page_size)
+        page = []
+        for index, row in enumerate(rows):
+            if len(page) == size:
+                return FakePage(page, (row['PartitionKey'], row['RowKey']))
+            if matches(filter, row):
+                page.append(dict(row))
+        return FakePage(page)
+
+
+@pytest.fixture()
+def fake_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol'
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        i = IntField()
+
+    return FakeEntity
+
+
+@pytest.fixture()
+def keys():
+    return [('p{:02}'.format(p), 'r{}'.format(r))
+            for p in range(40) for r in range(3)]
+
+
+class Test_key_ranges:
+
+    """test key_ranges and range_filter"""
+
+    def test_key_ranges(self):
+        assert key_ranges([]) == [(None, None)]
+        assert key_ranges(['d', 'b', 'b']) == [
+            (None, 'b'), ('b', 'd'), ('d', None)]
+        with pytest.raises(TypeError) as e:
+            key_ranges(['a', 1])
+        assert 'boundary is not a str, 1' in str(e)
+
+    def test_range_filter(self):
+        assert range_filter(None) is None
+        assert range_filter('', lower='a') == "PartitionKey ge 'a'"
+        assert range_filter(
+            "i eq 1 or i eq 2", 'RowKey', "it's", 'z') == \
+            "(i eq 1 or i eq 2) and RowKey ge 'it''s' and RowKey lt 'z'"
+
+
+class Test_sample_splits:
+
+    """test sample_splits"""
+
+    def test_splits(self, fake_entity, keys):
+        ts = FakeTS(keys)
+        splits = sample_splits(fake_entity, 4, ts=ts)
+        assert 1 < len(splits) <= 3
+        assert splits == sorted(splits)
+        partition_keys = set(key[0] for key in keys)
+        assert all(split in partition_keys for split in splits)
+        assert all(call['select'] == 'PartitionKey' and call['top'] == 1
+                   for call in ts.calls)
+
+    def test_filter(self, fake_entity, keys):
+        ts = FakeTS(keys)
+        splits = sample_splits(fake_entity, 4, filter="PartitionKey ge 'p20'",
+                               ts=ts)
+        assert len(splits) > 1
+        assert all(split > 'p20' for split in splits)
+
+    def test_long_shared_prefix(self, fake_entity):
+        prefix = 'tenant-' + 'x' * 50 + '-'
+        keys = [(prefix + '{:03}'.format(p), 'r') for p in range(100)]
+        ts = FakeTS(keys)
+        splits = sample_splits(fake_entity, 4, ts=ts)
+        assert len(splits) == 3
+        assert all(split.startswith(prefix) for split in splits)
+        # the shared prefix isn't walked a character at a time
+        assert len(ts.calls) <= 40
+
+    def test_nothing_to_split(self, fake_entity):
+        assert sample_splits(fake_entity, 4, ts=FakeTS([])) == []
+        assert sample_splits(fake_entity, 4, ts=FakeTS([('p', 'r')])) == []
+        assert sample_splits(fake_entity, 1, ts=FakeTS([])) == []
+
+    def test_raises(self, fake_entity):
+        with pytest.raises(TypeError):
+            sample_splits(fake_entity, '4')
+        with pytest.raises(ValueError):
+            sample_splits(fake_entity, 0)
+
+
+class Test_scan_segments:
+
+    """test scan_segments"""
+
+    def test_all_items(self):
+        segments = [lambda i=i: iter(range(i * 10, i * 10 + 10))
+                    for i in range(5)]
+        assert sorted(scan_segments(segments, workers=3)) == list(range(50))
+
+    def test_empty(self):
+        assert list(scan_segments([])) == []
+
+    def test_raises(self):
+        def fail():
+            yield 1
+            raise ValueError('lol')
+        with pytest.raises(ValueError) as e:
+            list(scan_segments([fail, lambda: iter([2])]))
+        assert 'lol' in str(e)
+
+    def test_close(self):
+        pulled = []
+
+        def forever():
+            while True:
+                pulled.append(1)
+                yield 1
+        items = scan_segments([forever], buffer_size=1)
+        assert next(items) == 1
+        items.close()
+        count = len(pulled)
+        assert count <= 4
+
+
+class Test_merge_segments:
+
+    """test merge_segments"""
+
+    def test_interleaved(self):
+        segments = [lambda i=i: ([n] for n in range(i, 60, 3))
+                    for i in range(3)]
+        assert list(merge_segments(segments, key=lambda n: n,
+                                   buffer_size=1)) == list(range(60))
+
+    def test_starts_share_workers(self):
+        segments = [lambda i=i: iter([[i * 10 + 1, i * 10 + 2],
+                                      [i * 10 + 3]])
+                    for i in range(4)]
+        merged = merge_segments(segments, key=lambda n: n, workers=1,
+                                buffer_size=1, starts=[0, 10, 20, 30])
+        assert list(merged) == [
+            n for i in range(4) for n in (i * 10 + 1, i * 10 + 2,
+                                          i * 10 + 3)]
+
+    def test_raises(self):
+        def fail():
+            yield [1]
+            raise ValueError('lol')
+        with pytest.raises(ValueError) as e:
+            list(merge_segments([fail, lambda: iter([[2]])],
+                                key=lambda n: n))
+        assert 'lol' in str(e)
+        with pytest.raises(ValueError):
+            list(merge_segments([fail], key=lambda n: n, starts=[]))
+
+
+class Test_iterate_parallel:
+
+    """test Entity.iterate_parallel and QuerySet.parallel"""
+
+    def test_explicit_splits(self, fake_entity, keys):
+        ts = FakeTS(keys)
+        entities = list(fake_entity.iterate_parallel(
+            splits=['p10', 'p20'], workers=2, ts=ts))
+        assert sorted((e.PartitionKey, e.RowKey) for e in entities) == \
+            sorted(keys)
+        filters = sorted(set(call['filter'] for call in ts.calls))
+        assert filters == [
+            "PartitionKey ge 'p10' and PartitionKey lt 'p20'",
+            "PartitionKey ge 'p20'",
+            "PartitionKey lt 'p10'"]
+
+    def test_ordered_with_sampled_splits(self, fake_entity, keys):
+        ts = FakeTS(keys)
+        entities = list(fake_entity.iterate_parallel(
+            workers=3, ordered=True, tracking=False, ts=ts))
+        assert [(e.PartitionKey, e.RowKey) for e in entities] == keys
+        assert entities[0]._read_only is True
+        assert any(call['top'] == 1 for call in ts.calls)
+
+    def test_ordered_select(self, fake_entity, keys):
+        ts = FakeTS(keys)
+        entities = list(fake_entity.iterate_parallel(
+            select='i', workers=2, splits=['p10', 'p30'], ordered=True,
+            ts=ts))
+        assert [e.i for e in entities] == list(range(len(keys)))
+        assert ts.calls[0]['select'] == 'i,PartitionKey,RowKey'
+
+    def test_filter_and_limit(self, fake_entity, keys):
+        ts = FakeTS(keys)
+        entities = list(fake_entity.iterate_parallel(
+            filter='i ge 30', limit=5, splits=['p20'], ordered=True,
+            ts=ts))
+        assert [e.i for e in entities] == [30, 31, 32, 33, 34]
+        assert all(call['filter'].startswith('(i ge 30) and ')
+                   for call in ts.calls)
+
+    def test_raises(self, fake_entity):
+        ts = FakeTS([])
+        with pytest.raises(TypeError):
+            fake_entity.iterate_parallel(workers='2', ts=ts)
+        with pytest.raises(ValueError):
+            fake_entity.iterate_parallel(workers=0, ts=ts)
+        with pytest.raises(TypeError):
+            fake_entity.iterate_parallel(splits='p1', ts=ts)
+        with pytest.raises(TypeError):
+            fake_entity.iterate_parallel(filter=1, ts=ts)
+
+    def test_queryset(self, fake_entity, keys, monkeypatch):
+        ts = FakeTS(keys)
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        entities = list(fake_entity.select().where(
+            PartitionKey__lt='p05').parallel(
+                workers=2, splits=['p02'], ordered=True))
+        assert [(e.PartitionKey, e.RowKey) for e in entities] == keys[:15]
+        assert [(e.PartitionKey, e.RowKey) for e in entities] == [
+            (e.PartitionKey, e.RowKey) for e in
+            fake_entity.select().where(PartitionKey__lt='p05').iterator()]
+        with pytest.raises(Exception) as e:
+            from AzureODM.QuerySet import QuerySet
+            QuerySet().parallel()
+        assert 'you must call select before call parallel' in str(e)
+
+
+class Test_row_key_ranges:
+
+    """test splitting the RowKey space of a single partition"""
+
+    @pytest.fixture()
+    def hot_keys(self):
+        return [('cold', 'r0')] + [
+            ('hot', '{:04}'.format(r)) for r in range(0, 1000, 9)]
+
+    def test_sample_splits(self, fake_entity, hot_keys):
+        ts = FakeTS(hot_keys)
+        splits = sample_splits(fake_entity, 4, filter="PartitionKey eq 'hot'",
+                               key='RowKey', ts=ts)
+        assert len(splits) == 3
+        assert all(call['select'] == 'RowKey' for call in ts.calls)
+
+    def test_queryset(self, fake_entity, hot_keys, monkeypatch):
+        ts = FakeTS(hot_keys)
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        query = fake_entity.select().where(PartitionKey='hot')
+        entities = list(query.parallel(
+            workers=3, splits=['0300', '0600'], ordered=True, key='RowKey'))
+        assert [(e.PartitionKey, e.RowKey) for e in entities] == hot_keys[1:]
+        assert "(PartitionKey eq 'hot') and RowKey ge '0300' and " \
+            "RowKey lt '0600'" in [call['filter'] for call in ts.calls]
+
+    def test_sampled_unordered(self, fake_entity, hot_keys):
+        ts = FakeTS(hot_keys)
+        entities = list(fake_entity.iterate_parallel(
+            filter="PartitionKey eq 'hot'", workers=4, key='RowKey', ts=ts))
+        assert sorted((e.PartitionKey, e.RowKey) for e in entities) == \
+            hot_keys[1:]
+
+    def test_raises(self, fake_entity):
+        with pytest.raises(ValueError) as e:
+            fake_entity.iterate_parallel(key='i', ts=FakeTS([]))
+        assert 'key has to be PartitionKey or RowKey, i' in str(e)
@@ -0,0 +1,218 @@
+"""
+    test_Planner
+"""
+import pytest
+import asyncio
+from AzureODM.Entity import Entity
+from AzureODM.Fields import KeyField, FloatField
+from AzureODM.QuerySet import Q
+from AzureODM.Planner import (
+    plan_query, check_full_scan, FullScanWarning, FullScanError, POINT,
+    MULTI_POINT, PARTITION, RANGE, SCAN, UNKNOWN)
+
+
+@pytest.fixture()
+def fake_entity():
+    class FakeEntity(Entity):
+        metas = {
+            'table_name': 'lolol'
+        }
+        PartitionKey = KeyField()
+        RowKey = KeyField()
+        f = FloatField()
+
+    return FakeEntity
+
+
+class Test_plan_query:
+
+    """test plan_query"""
+
+    def test_point(self, fake_entity):
+        plan = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey='r1').plan()
+        assert plan.kind == POINT
+        assert plan.keys == [('p1', 'r1')]
+        assert plan.partition_keys == ['p1']
+        plan = fake_entity.select().where(
+            Q(PartitionKey='p1') & Q(RowKey='r1')).plan()
+        assert plan.kind == POINT
+
+    def test_multi_point(self, fake_entity):
+        plan = fake_entity.select().where(
+            PartitionKey__in=['p2', 'p1']).andWhere(
+            Q(RowKey='r1') | Q(RowKey='r2')).plan()
+        assert plan.kind == MULTI_POINT
+        assert plan.keys == [('p1', 'r1'), ('p1', 'r2'), ('p2', 'r1'),
+                             ('p2', 'r2')]
+        plan = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey__in=['r1', 'r2']).andWhere(RowKey='r2').plan()
+        assert plan.keys == [('p1', 'r2')]
+        assert plan.kind == POINT
+
+    def test_partition(self, fake_entity):
+        for query in [
+                fake_entity.select().where(PartitionKey='p1'),
+                fake_entity.select().where(PartitionKey='p1').andWhere(
+                    RowKey__ge='r1'),
+                fake_entity.select().where(PartitionKey='p1').andWhere(
+                    RowKey='r1').andWhere(f=1.0)]:
+            plan = query.plan()
+            assert plan.kind == PARTITION
+            assert plan.partition_keys == ['p1']
+
+    def test_range(self, fake_entity):
+        plan = fake_entity.select().where(PartitionKey__ge='p1').plan()
+        assert plan.kind == RANGE
+        assert plan.partition_keys is None
+        plan = fake_entity.select().where(
+            PartitionKey__in=['p1', 'p2']).andWhere(f__gt=1.0).plan()
+        assert plan.kind == RANGE
+        assert plan.partition_keys == ['p1', 'p2']
+
+    def test_scan(self, fake_entity):
+        for query in [
+                fake_entity.select(),
+                fake_entity.select().where(f=1.0),
+                fake_entity.select().where(RowKey='r1'),
+                fake_entity.select().where(PartitionKey__ne='p1'),
+                fake_entity.select().where(f=1.0).notWhere(f=2.0),
+                fake_entity.select().where(PartitionKey='p1').orWhere(
+                    f=1.0),
+                fake_entity.select().where(
+                    Q(PartitionKey='p1') | Q(RowKey='r1'))]:
+            assert query.plan().kind == SCAN
+
+    def test_or(self, fake_entity):
+        plan = fake_entity.select().where(PartitionKey='p1').orWhere(
+            PartitionKey='p2').plan()
+        assert plan.kind == RANGE
+        assert plan.partition_keys == ['p1', 'p2']
+        plan = fake_entity.select().where(
+            (Q(PartitionKey='p1') & Q(RowKey='r1')) |
+            (Q(PartitionKey='p2') & Q(RowKey='r2'))).plan()
+        assert plan.kind == MULTI_POINT
+        assert plan.keys == [('p1', 'r1'), ('p2', 'r2')]
+        # and binds tighter than or
+        plan = fake_entity.select().where(PartitionKey='p1').andWhere(
+            f=1.0).orWhere(PartitionKey='p1').andWhere(RowKey__lt='r1').plan()
+        assert plan.kind == PARTITION
+        assert plan.partition_keys == ['p1']
+        plan = fake_entity.select().where(PartitionKey__gt='p1').orWhere(
+            PartitionKey='p0').plan()
+        assert plan.kind == RANGE
+        assert plan.partition_keys is None
+
+    def test_unknown(self, fake_entity):
+        plan = fake_entity.select().where(PartitionKey='p1').notWhere(
+            RowKey='r1').plan()
+        assert plan.kind == UNKNOWN
+        assert fake_entity.select().where(PartitionKey='p1').notWhere(
+            RowKey='r1').explain()['scan'] == 'unknown'
+
+    def test_plan_nodes(self):
+        assert plan_query([]).kind == SCAN
+        assert plan_query([('where', Q(PartitionKey='p1'))]).kind == \
+            PARTITION
+
+
+class Test_explain:
+
+    """test QuerySet.explain"""
+
+    def test_point(self, fake_entity):
+        assert fake_entity.select(['f']).where(PartitionKey='p1').andWhere(
+            RowKey='r1').explain() == {
+            'filter': "PartitionKey eq 'p1' and RowKey eq 'r1'",
+            'scan': 'point',
+            'plan': POINT,
+            'route': 'findOne',
+            'partitions': 1,
+            'keys': 1,
+            'fields': ['f', 'PartitionKey', 'RowKey'],
+        }
+        explained = fake_entity.select().where(
+            PartitionKey__in=['p1', 'p2']).andWhere(
+            RowKey='r1').read_only().explain()
+        assert explained['scan'] == 'point'
+        assert explained['route'] == 'multi_get'
+        assert explained['partitions'] == 2
+        assert explained['keys'] == 2
+
+    def test_full(self, fake_entity):
+        explained = fake_entity.select().where(f__gt=1.0).explain()
+        assert explained['filter'] == 'f gt 1.0'
+        assert explained['scan'] == 'full'
+        assert explained['route'] == 'query'
+        assert explained['partitions'] is None
+        assert explained['fields'] == ['PartitionKey', 'RowKey', 'f']
+        assert fake_entity.select().explain()['filter'] is None
+        fake_entity.metas['parallel_scan'] = 4
+        assert fake_entity.select().explain()['route'] == 'parallel'
+
+    def test_partition_and_range(self, fake_entity):
+        explained = fake_entity.select().where(PartitionKey='p1').explain()
+        assert (explained['scan'], explained['partitions']) == (
+            'partition', 1)
+        explained = fake_entity.select().where(
+            PartitionKey__lt='p1').explain()
+        assert (explained['scan'], explained['partitions']) == (
+            'range', None)
+
+    def test_raises(self):
+        from AzureODM.QuerySet import QuerySet
+        with pytest.raises(Exception) as e:
+            QuerySet().explain()
+        assert 'you must call select before call explain' in str(e)
+
+
+class Test_full_scan_policy:
+
+    """test metas['full_scan']"""
+
+    @pytest.fixture()
+    def fake_ts(self, monkeypatch):
+        class TS:
+
+            def query_entities(self, **kwargs):
+                return [{'PartitionKey': 'p1', 'RowKey': 'r1'}]
+        ts = TS()
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        return ts
+
+    def test_allow(self, fake_entity, fake_ts, recwarn):
+        assert len(fake_entity.select().where(f=1.0).go()) == 1
+        assert len(recwarn) == 0
+
+    def test_warn(self, fake_entity, fake_ts):
+        fake_entity.metas['full_scan'] = 'warn'
+        with pytest.warns(FullScanWarning) as record:
+            assert len(fake_entity.select().where(f=1.0).go()) == 1
+        assert 'full table scan of lolol, filter: f eq 1.0' in str(
+            record[0].message)
+        assert record[0].filename == __file__
+        with pytest.warns(FullScanWarning):
+            list(fake_entity.select().iterator())
+
+    def test_log(self, fake_entity, fake_ts, caplog):
+        fake_entity.metas['full_scan'] = 'log'
+        fake_entity.select().go()
+        assert 'full table scan of lolol, filter: None' in caplog.text
+
+    def test_reject(self, fake_entity, fake_ts):
+        fake_entity.metas['full_scan'] = 'reject'
+        with pytest.raises(FullScanError):
+            fake_entity.select().where(RowKey='r1').go()
+        with pytest.raises(FullScanError):
+            asyncio.run(fake_entity.select().ago())
+        assert len(fake_entity.select().where(PartitionKey='p1').go()) == 1
+        assert len(fake_entity.select().where(PartitionKey='p1').orWhere(
+            PartitionKey='p2').go()) == 1
+        assert len(fake_entity.select().where(PartitionKey='p1').notWhere(
+            f=1.0).go()) == 1
+
+    def test_invalid_policy(self, fake_entity):
+        fake_entity.metas['full_scan'] = 'lol'
+        with pytest.raises(ValueError) as e:
+            check_full_scan(fake_entity, plan_query([]))
+        assert 'full_scan has to be one of' in str(e)
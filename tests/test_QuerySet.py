@@ -4,8 +4,10 @@
 from AzureODM.QuerySet import (
     QuerySet, obj_to_query_value, Q, QCombination, AndOperator, OrOperator)
 from AzureODM.Entity import Entity
-from AzureODM.Fields import GenericField, FloatField, KeyField
+from AzureODM.Fields import GenericField, FloatField, KeyField, JSONField
 import pytest
+import asyncio
+from azure import HeaderDict
 import re
 from datetime import datetime, timezone
 regex = re.compile(QuerySet.cmp_exp)
@@ -115,6 +117,7 @@ class Test_Q:
         query_string = a.compile(entity=fake_entity)
         expected = "(RowKey eq 123 or RowKey eq 124 or RowKey eq '412')"
         assert query_string == expected
+        assert a.compile(entity=fake_entity) == expected
 
 
 class Test_obj_to_query_value:
@@ -122,6 +125,7 @@ class Test_obj_to_query_value:
     """test obj_to_query_value"""
     @pytest.mark.parametrize('obj,expected', [
         ('thisisgood', "'thisisgood'"),
+        ("it's", "'it''s'"),
         (123456, '123456'),
         (123.456, '123.456'),
         (True, 'true'),
@@ -330,3 +334,313 @@ class Test_go:
         with pytest.raises(MemoryError) as e:
             q.go()
         assert 'called fake_find' in str(e)
+
+
+class Test_go_routing:
+
+    """test go routes the queries by plan"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+        return FakeEntity
+
+    @pytest.fixture()
+    def fake_ts(self, monkeypatch):
+        class TS:
+
+            def __init__(self):
+                self.calls = []
+
+            def get_entity(self, **kwargs):
+                self.calls.append(('get_entity', kwargs))
+                return {'PartitionKey': kwargs['partition_key'],
+                        'RowKey': kwargs['row_key'], 'etag': 'e'}
+
+            def query_entities(self, **kwargs):
+                self.calls.append(('query_entities', kwargs))
+                return [{'PartitionKey': 'p1', 'RowKey': 'r2', 'etag': 'e'},
+                        {'PartitionKey': 'p1', 'RowKey': 'r1', 'etag': 'e'}]
+        ts = TS()
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        return ts
+
+    def test_point(self, fake_entity, monkeypatch):
+        def fake_find_one(partition_key, row_key, select):
+            assert (partition_key, row_key, select) == ('p1', 'r1', '*')
+            return 'found'
+        monkeypatch.setattr(fake_entity, 'findOne', fake_find_one)
+        q = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey='r1')
+        assert q.go() == ['found']
+        monkeypatch.setattr(fake_entity, 'findOne', lambda *args, **kw: None)
+        assert q.go() == []
+
+    def test_read_only_point(self, fake_entity, fake_ts):
+        entities = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey='r1').read_only().go()
+        assert [c[0] for c in fake_ts.calls] == ['get_entity']
+        assert entities[0].RowKey == 'r1'
+        assert entities[0]._read_only is True
+
+    def test_multi_point(self, fake_entity, fake_ts):
+        entities = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey__in=['r2', 'r1', 'r3']).limit(5).go()
+        assert [e.RowKey for e in entities] == ['r1', 'r2']
+        assert [c[0] for c in fake_ts.calls] == ['query_entities']
+        assert fake_ts.calls[0][1]['filter'] == (
+            "(PartitionKey eq 'p1' and "
+            "(RowKey eq 'r1' or RowKey eq 'r2' or RowKey eq 'r3'))")
+        entities = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey__in=['r2', 'r1']).limit(1).go()
+        assert [e.RowKey for e in entities] == ['r1']
+
+    def test_partition_not_routed(self, fake_entity, fake_ts):
+        fake_entity.select().where(PartitionKey='p1').go()
+        assert fake_ts.calls[0][1]['filter'] == "PartitionKey eq 'p1'"
+
+    def test_parallel_scan(self, fake_entity, fake_ts, monkeypatch):
+        def fake_iterate_parallel(**kwargs):
+            assert kwargs['workers'] == 4
+            assert kwargs['ordered'] is True
+            return iter(['lol'])
+        monkeypatch.setattr(fake_entity, 'iterate_parallel',
+                            fake_iterate_parallel)
+        assert len(fake_entity.select().go()) == 2
+        fake_entity.metas['parallel_scan'] = 4
+        assert fake_entity.select().go() == ['lol']
+        assert len(fake_entity.select().where(PartitionKey='p1').go()) == 2
+
+    def test_async(self, fake_entity, monkeypatch):
+        class ATS:
+
+            async def get_entity(self, **kwargs):
+                return {'PartitionKey': kwargs['partition_key'],
+                        'RowKey': kwargs['row_key'], 'etag': 'e'}
+
+            async def query_entities(self, **kwargs):
+                return [{'PartitionKey': 'p1', 'RowKey': 'r1', 'etag': 'e'}]
+        monkeypatch.setattr('AzureODM.Entity.get_async_table_service',
+                            lambda: ATS())
+        q = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey='r1')
+        assert asyncio.run(q.ago())[0].RowKey == 'r1'
+        q = fake_entity.select().where(PartitionKey='p1').andWhere(
+            RowKey__in=['r1', 'r2'])
+        assert [e.RowKey for e in asyncio.run(q.ago())] == ['r1']
+        assert asyncio.run(q.read_only().ago())[0]._read_only is True
+
+
+class Test_iterator:
+
+    """test iterator"""
+
+    def test_raise_if__target_entity_is_None(self):
+        q = QuerySet()
+        with pytest.raises(Exception) as e:
+            q.iterator()
+        assert 'you must call select before call iterator' in str(e)
+
+    def test_call_and_return__targeted_entity_iterate(self, monkeypatch):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+        def fake_iterate(*args, **kwargs):
+            assert kwargs['filter'] == "PartitionKey eq 'lol'"
+            assert kwargs['select'] == '*'
+            assert kwargs['limit'] == 10
+            assert kwargs['page_size'] == 5
+            return iter(['e1', 'e2'])
+        monkeypatch.setattr(FakeEntity, 'iterate', fake_iterate)
+        q = FakeEntity.select().where(PartitionKey='lol').limit(10)
+        assert list(q.iterator(page_size=5)) == ['e1', 'e2']
+
+    def test_iter(self, monkeypatch):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+        def fake_iterate(*args, **kwargs):
+            assert kwargs['page_size'] is None
+            return iter(['e1', 'e2'])
+        monkeypatch.setattr(FakeEntity, 'iterate', fake_iterate)
+        assert [e for e in FakeEntity.select()] == ['e1', 'e2']
+
+
+class Test_values:
+
+    """test values and values_list"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+            j = JSONField()
+
+        return FakeEntity
+
+    @pytest.fixture()
+    def fake_ts(self, monkeypatch):
+        class TS:
+
+            def query_entities(self, **kwargs):
+                self.kwargs = kwargs
+                return [{'PartitionKey': 'p1', 'RowKey': 'r1', 'j': '[1]'},
+                        {'PartitionKey': 'p1', 'RowKey': 'r2'}]
+        ts = TS()
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        return ts
+
+    def test_raise_if__target_entity_is_None(self):
+        with pytest.raises(Exception) as e:
+            QuerySet().values('RowKey')
+        assert 'you must call select before call values' in str(e)
+
+    def test_values(self, fake_entity, fake_ts):
+        q = fake_entity.select().where(PartitionKey='p1').limit(5)
+        assert list(q.values('RowKey', 'j')) == [
+            {'RowKey': 'r1', 'j': [1]}, {'RowKey': 'r2', 'j': None}]
+        assert fake_ts.kwargs['select'] == 'RowKey,j'
+        assert fake_ts.kwargs['filter'] == "PartitionKey eq 'p1'"
+        assert fake_ts.kwargs['top'] == 5
+
+    def test_default_fields(self, fake_entity, fake_ts):
+        rows = list(fake_entity.select(['j']).values_list())
+        assert rows == [([1], 'p1', 'r1'), (None, 'p1', 'r2')]
+        assert fake_ts.kwargs['select'] == 'j,PartitionKey,RowKey'
+        rows = list(fake_entity.select().values_list())
+        assert rows[0] == ('p1', 'r1', [1])
+
+    def test_values_list(self, fake_entity, fake_ts):
+        q = fake_entity.select()
+        assert list(q.values_list('RowKey', flat=True)) == ['r1', 'r2']
+        assert list(q.values_list('RowKey', named=True))[0].RowKey == 'r1'
+        with pytest.raises(ValueError):
+            q.values_list('RowKey', flat=True, named=True)
+
+    def test_keys(self, fake_entity, fake_ts):
+        q = fake_entity.select(['j']).where(PartitionKey='p1')
+        assert list(q.keys(page_size=2)) == [('p1', 'r1'), ('p1', 'r2')]
+        assert fake_ts.kwargs['select'] == 'PartitionKey,RowKey'
+        assert fake_ts.kwargs['filter'] == "PartitionKey eq 'p1'"
+        assert fake_ts.kwargs['top'] == 2
+
+    def test_avalues(self, fake_entity, monkeypatch):
+        class ATS:
+
+            async def query_entities(self, **kwargs):
+                return [{'PartitionKey': 'p1', 'RowKey': 'r1'}]
+        monkeypatch.setattr('AzureODM.Entity.get_async_table_service',
+                            lambda: ATS())
+
+        async def collect():
+            q = fake_entity.select()
+            return ([row async for row in q.avalues('RowKey')],
+                    [row async for row in q.avalues_list('RowKey')],
+                    [row async for row in q.akeys()])
+        assert asyncio.run(collect()) == (
+            [{'RowKey': 'r1'}], [('r1',)], [('p1', 'r1')])
+
+
+class Test_count_and_exists:
+
+    """test count and exists"""
+    @pytest.fixture()
+    def fake_entity(self):
+        class FakeEntity(Entity):
+            metas = {
+                'table_name': 'lolol'
+            }
+            PartitionKey = KeyField()
+            RowKey = KeyField()
+
+        return FakeEntity
+
+    @pytest.fixture()
+    def pages(self):
+        class Page(list):
+
+            def __init__(self, entities, next_partition_key=None):
+                super().__init__(entities)
+                if next_partition_key is not None:
+                    self.x_ms_continuation = HeaderDict({
+                        'nextpartitionkey': next_partition_key,
+                        'nextrowkey': 'r'})
+        return {None: Page([], 'p1'),
+                'p1': Page([{'PartitionKey': 'p1'}] * 3, 'p2'),
+                'p2': Page([{'PartitionKey': 'p2'}] * 2)}
+
+    @pytest.fixture()
+    def fake_ts(self, pages, monkeypatch):
+        class TS:
+
+            def __init__(self):
+                self.calls = []
+
+            def query_entities(self, **kwargs):
+                self.calls.append(kwargs)
+                page = pages[kwargs['next_partition_key']]
+                top = kwargs['top']
+                if top is not None and len(page) > top:
+                    trimmed = type(page)(page[:top])
+                    trimmed.__dict__.update(page.__dict__)
+                    return trimmed
+                return page
+        ts = TS()
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', lambda: ts)
+        return ts
+
+    def test_count(self, fake_entity, fake_ts):
+        assert fake_entity.select().where(PartitionKey='p1').count() == 5
+        assert [c['select'] for c in fake_ts.calls] == ['PartitionKey'] * 3
+        assert fake_ts.calls[0]['filter'] == "PartitionKey eq 'p1'"
+
+    def test_count_stops_at_limit(self, fake_entity, fake_ts):
+        assert fake_entity.select().limit(4).count() == 4
+        assert [c['top'] for c in fake_ts.calls] == [4, 4, 1]
+
+    def test_exists(self, fake_entity, fake_ts):
+        assert fake_entity.select().exists() is True
+        assert [c['top'] for c in fake_ts.calls] == [1, 1]
+        assert fake_ts.calls[0]['select'] == 'PartitionKey'
+
+    def test_not_exists(self, fake_entity, monkeypatch):
+        class TS:
+
+            def query_entities(self, **kwargs):
+                return []
+        monkeypatch.setattr('AzureODM.Entity.get_table_service', TS)
+        assert fake_entity.select().exists() is False
+        assert fake_entity.select().count() == 0
+
+    def test_raise_if__target_entity_is_None(self):
+        with pytest.raises(Exception) as e:
+            QuerySet().count()
+        assert 'you must call select before call count' in str(e)
+
+    def test_async(self, fake_entity, pages, monkeypatch):
+        class ATS:
+
+            async def query_entities(self, **kwargs):
+                return pages[kwargs['next_partition_key']]
+        monkeypatch.setattr('AzureODM.Entity.get_async_table_service', ATS)
+
+        async def run():
+            q = fake_entity.select()
+            return await q.acount(), await q.aexists()
+        assert asyncio.run(run()) == (5, True)